@@ -0,0 +1,78 @@
+'''
+Bitácora local de resultados ya ingresados en el portal (SQLite).
+Cada guardado confirmado se registra con la clave (analito, nivel, fecha, valor);
+antes de abrir el navegador, Registro.py descarta los registros que ya están en la
+bitácora, de modo que una nueva corrida solo intenta lo que falta o falló.
+'''
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+# Archivo de la bitácora (ajusta según sea necesario)
+BITACORA_PATH = './bitacora_subidas.sqlite'
+
+
+def abrir_bitacora(path=BITACORA_PATH, solo_lectura=False):
+    """Abre (o crea) la bitácora y devuelve la conexión (una por hilo o sesión).
+
+    Con solo_lectura no se crea ni se modifica nada: devuelve None si la bitácora no existe.
+    """
+    if solo_lectura:
+        if not os.path.exists(path):
+            return None
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS subidos (
+            analito   TEXT    NOT NULL,
+            nivel     INTEGER NOT NULL,
+            fecha     TEXT    NOT NULL,
+            valor     REAL    NOT NULL,
+            subido_en TEXT    NOT NULL,
+            PRIMARY KEY (analito, nivel, fecha, valor)
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+def registrar_subida(conn, analito, nivel, fecha_iso, valor):
+    """Registra un guardado confirmado; se confirma de inmediato para sobrevivir a una caída."""
+    conn.execute(
+        "INSERT OR IGNORE INTO subidos (analito, nivel, fecha, valor, subido_en) VALUES (?, ?, ?, ?, ?)",
+        (analito, int(nivel), fecha_iso, float(valor), datetime.now().isoformat(timespec='seconds')),
+    )
+    conn.commit()
+
+
+def registrar_subidas(conn, filas):
+    """Registra varios guardados confirmados [(analito, nivel, fecha_iso, valor), ...] en una transacción."""
+    ahora = datetime.now().isoformat(timespec='seconds')
+    conn.executemany(
+        "INSERT OR IGNORE INTO subidos (analito, nivel, fecha, valor, subido_en) VALUES (?, ?, ?, ?, ?)",
+        [(analito, int(nivel), fecha_iso, float(valor), ahora) for analito, nivel, fecha_iso, valor in filas],
+    )
+    conn.commit()
+
+
+def filtrar_pendientes(conn, records_df):
+    """Devuelve solo los registros de records_df que no están en la bitácora.
+
+    records_df debe tener las columnas Fecha (date), Nivel, Analito y Valor.
+    """
+    subidos = pd.read_sql_query("SELECT analito, nivel, fecha, valor FROM subidos", conn)
+    if subidos.empty or records_df.empty:
+        return records_df
+
+    claves = pd.DataFrame({
+        'analito': records_df['Analito'].to_numpy(),
+        'nivel':   records_df['Nivel'].astype('int64').to_numpy(),
+        'fecha':   [f.isoformat() for f in records_df['Fecha']],
+        'valor':   records_df['Valor'].astype('float64').to_numpy(),
+    }, index=records_df.index)
+    subidos = subidos.astype({'nivel': 'int64', 'valor': 'float64'}).assign(_subido=True)
+    marcado = claves.merge(subidos, on=['analito', 'nivel', 'fecha', 'valor'], how='left')
+    ya_subido = marcado['_subido'].fillna(False).astype(bool).to_numpy()
+    return records_df[~ya_subido]
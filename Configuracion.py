@@ -0,0 +1,204 @@
+'''
+Configuración del laboratorio: analizadores, materiales de control con sus
+lotes, mapas de códigos y nombres de nodos del portal. Se lee de CONFIG_PATH
+(JSON) y se compila una vez en tablas de búsqueda: Extraccion.py lee los exports
+de todos los analizadores (todos los materiales de un archivo en la misma pasada)
+y Registro.py sube todo con una sola sesión iniciada.
+
+Sin archivo se usan los valores de siempre: un AU480 con code_mapping,
+start_marker y stop_markers de Extraccion.py, y NIVEL_NODOS,
+ANALITOS_EXCLUIDOS_POR_NIVEL, TARGET_ANALITOS y ANALITO_MAPPING de Registro.py.
+
+Formato (ver config_laboratorio.ejemplo.json):
+  analitos        analitos a subir (null = todos los que haya en los datos)
+  nombres_portal  {nombre en la plantilla: nombre en el portal}
+  analizadores    lista de {nombre, nodo (en Quimica clínica del portal), carpeta
+                  de exports, codigos {código: [ID, analito]}, materiales}
+  materiales      lista de {nombre, inicio (marca del bloque en el export), fin
+                  (marcas de cierre), salida (carpeta de plantillas), parquet
+                  (opcional), excluidos {nivel: [analitos]}, lotes}
+  lotes           lista de {desde: 'AAAA-MM-DD' o null, nodos: {nivel: 'lote - nombre'}};
+                  a cada fecha le corresponde el lote más reciente con desde <= fecha
+
+Cada material escribe en su propia carpeta. El que usa las carpetas de siempre
+(Extraccion.folder_path y Extraccion.output_folder) conserva las claves del
+manifiesto y de la bitácora; los demás las llevan con el prefijo 'analizador/material/'.
+
+Uso: python Configuracion.py   (muestra la configuración compilada)
+'''
+import json
+import os
+import sys
+from datetime import date
+
+# Archivo de configuración (si no existe se usan los valores de los scripts)
+CONFIG_PATH = './config_laboratorio.json'
+
+
+class Material:
+    """Material de control de un analizador: bloque del export, carpetas de salida y lotes"""
+
+    def __init__(self, nombre, inicio, fin, salida, parquet, lotes, excluidos, prefijo):
+        self.nombre = nombre
+        self.inicio = inicio.upper()
+        self.fin = tuple(marca.upper() for marca in fin)
+        self.salida = salida
+        self.parquet = parquet
+        self.lotes = sorted(lotes, key=lambda lote: lote[0], reverse=True)  # [(desde, {nivel: nodo})]
+        self.excluidos = excluidos  # {nivel: set de analitos}
+        self.prefijo = prefijo
+
+    def clave(self, filename):
+        """Clave del archivo en el manifiesto de Extraccion.py"""
+        return self.prefijo + filename
+
+    def nodo(self, nivel, fecha):
+        """Nodo del portal ('lote - nombre') del nivel para el lote vigente en fecha, o None"""
+        for desde, nodos in self.lotes:
+            if desde <= fecha:
+                return nodos.get(nivel)
+        return None
+
+
+class Analizador:
+    """Analizador con su carpeta de exports, tablas de códigos y materiales"""
+
+    def __init__(self, nombre, nodo, carpeta, codigos, materiales):
+        self.nombre = nombre
+        self.nodo = nodo
+        self.carpeta = carpeta
+        self.codigos = codigos  # {código: (ID, analito)}
+        filas = sorted(codigos.values())
+        self.ids = [aid for aid, _ in filas]
+        self.nombres = [aname for _, aname in filas]
+        self.fila_por_codigo = {code: self.ids.index(aid) for code, (aid, _) in codigos.items()}
+        self.materiales = materiales
+        self.bloques = [(m.inicio, m.fin) for m in materiales]
+
+
+class Laboratorio:
+    """Configuración compilada"""
+
+    def __init__(self, analizadores, analitos, nombres_portal, archivo=None):
+        self.analizadores = analizadores
+        self.analitos = analitos
+        self.nombres_portal = nombres_portal
+        self.archivo = archivo  # None = valores por defecto
+        self.por_prefijo = {}   # prefijo -> (analizador, material)
+        for analizador in analizadores:
+            for material in analizador.materiales:
+                self.por_prefijo[material.prefijo] = (analizador, material)
+
+    def materiales(self):
+        return [material for analizador in self.analizadores for material in analizador.materiales]
+
+    def entradas(self, material, manifest):
+        """Entradas de manifest (clave -> entrada) que pertenecen a material"""
+        if material.prefijo:
+            return {k: v for k, v in manifest.items() if k.startswith(material.prefijo)}
+        otros = tuple(prefijo for prefijo in self.por_prefijo if prefijo)
+        return {k: v for k, v in manifest.items() if not (otros and k.startswith(otros))}
+
+
+def configuracion_por_defecto():
+    """La configuración de siempre, armada con las constantes de Extraccion.py y Registro.py"""
+    import Extraccion
+    import Registro
+
+    return {
+        'analitos': list(Registro.TARGET_ANALITOS),
+        'nombres_portal': dict(Registro.ANALITO_MAPPING),
+        'analizadores': [{
+            'nombre': Registro.NODO_ANALIZADOR,
+            'nodo': Registro.NODO_ANALIZADOR,
+            'carpeta': Extraccion.folder_path,
+            'codigos': {code: list(v) for code, v in Extraccion.code_mapping.items()},
+            'materiales': [{
+                'nombre': 'Multiqual',
+                'inicio': Extraccion.start_marker,
+                'fin': sorted(Extraccion.stop_markers),
+                'salida': Extraccion.output_folder,
+                'parquet': Extraccion.PARQUET_PATH,
+                'excluidos': {str(n): list(a) for n, a in Registro.ANALITOS_EXCLUIDOS_POR_NIVEL.items()},
+                'lotes': [{'desde': None, 'nodos': {str(n): nodo for n, nodo in Registro.NIVEL_NODOS.items()}}],
+            }],
+        }],
+    }
+
+
+def _mismo_directorio(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def compilar(datos, archivo=None):
+    """Valida el diccionario de configuración y arma las tablas. ValueError si algo no cuadra."""
+    import Extraccion
+
+    analizadores, salidas = [], set()
+    for a in datos.get('analizadores') or []:
+        for campo in ('nombre', 'carpeta', 'codigos', 'materiales'):
+            if not a.get(campo):
+                raise ValueError(f"al analizador {a.get('nombre', '?')!r} le falta '{campo}'")
+        materiales = []
+        for m in a['materiales']:
+            for campo in ('nombre', 'inicio', 'salida', 'lotes'):
+                if not m.get(campo):
+                    raise ValueError(f"al material {a['nombre']}/{m.get('nombre', '?')} le falta '{campo}'")
+            if any(_mismo_directorio(m['salida'], s) for s in salidas):
+                raise ValueError(f"la carpeta de salida {m['salida']!r} se repite: cada material necesita la suya")
+            salidas.add(m['salida'])
+            legado = _mismo_directorio(a['carpeta'], Extraccion.folder_path) and \
+                _mismo_directorio(m['salida'], Extraccion.output_folder)
+            lotes = []
+            for lote in m['lotes']:
+                desde = date.fromisoformat(lote['desde']) if lote.get('desde') else date.min
+                lotes.append((desde, {int(n): nodo for n, nodo in lote['nodos'].items()}))
+            materiales.append(Material(
+                nombre=m['nombre'],
+                inicio=m['inicio'],
+                fin=m.get('fin') or [],
+                salida=m['salida'],
+                parquet=m.get('parquet') or f"{m['salida'].rstrip('/')}_parquet/",
+                lotes=lotes,
+                excluidos={int(n): set(lista) for n, lista in (m.get('excluidos') or {}).items()},
+                prefijo='' if legado else f"{a['nombre']}/{m['nombre']}/",
+            ))
+        codigos = {code.upper(): (int(v[0]), v[1]) for code, v in a['codigos'].items()}
+        analizadores.append(Analizador(a['nombre'], a.get('nodo') or a['nombre'], a['carpeta'], codigos, materiales))
+    if not analizadores:
+        raise ValueError("no hay analizadores configurados")
+    return Laboratorio(analizadores, datos.get('analitos'), dict(datos.get('nombres_portal') or {}), archivo)
+
+
+def cargar(path=CONFIG_PATH):
+    """Laboratorio compilado desde path, o con los valores por defecto si el archivo no existe"""
+    if not path or not os.path.exists(path):
+        return compilar(configuracion_por_defecto())
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return compilar(json.load(f), path)
+    except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+        print(f"ERROR: configuración inválida en '{path}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def main():
+    lab = cargar()
+    print(f"Configuración: {lab.archivo or 'valores por defecto de los scripts'}")
+    print(f"Analitos a subir: {'todos' if lab.analitos is None else len(lab.analitos)}")
+    for analizador in lab.analizadores:
+        print(f"\n{analizador.nombre} (nodo '{analizador.nodo}'): exports en '{analizador.carpeta}', "
+              f"{len(analizador.codigos)} código(s)")
+        for material in analizador.materiales:
+            print(f"  {material.nombre}: bloque '{material.inicio}' hasta {list(material.fin)} -> '{material.salida}'"
+                  f"{'' if material.prefijo else ' (claves de siempre)'}")
+            for desde, nodos in material.lotes:
+                vigencia = 'siempre' if desde == date.min else f"desde {desde}"
+                print(f"    lote {vigencia}: " + "; ".join(f"N{n} {nodo}" for n, nodo in sorted(nodos.items())))
+            for nivel, analitos in sorted(material.excluidos.items()):
+                if analitos:
+                    print(f"    nivel {nivel} sin: {', '.join(sorted(analitos))}")
+
+
+if __name__ == '__main__':
+    main()
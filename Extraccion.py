@@ -1,13 +1,34 @@
 ''' 
 Codigo para procesar archivos de laboratorio y generar CSVs con analitos y niveles. genra CSVs con analitos y niveles.
 Este script procesa archivos de texto de laboratorio, extrae analitos y sus niveles, y genera archivos CSV con los datos organizados.
-en la carpeta './Plantillas/'.
+en la carpeta './Plantillas/'. Con config_laboratorio.json (Configuracion.py) se procesan todos los analizadores
+y materiales configurados, cada uno en su carpeta, leyendo cada export una sola vez.
+Los exports archivados en .zip, .tar.gz/.tgz o .gz dentro de la carpeta se leen directamente, sin extraerlos.
 '''
+import argparse
+import contextlib
+import cProfile
+import gzip
+import hashlib
+import io
+import json
 import os
+import pstats
 import sys
+import tarfile
+import time
+import tracemalloc
+import zipfile
+import numpy as np
 import pandas as pd
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from collections import Counter, deque
+from itertools import islice
+
+import Configuracion
+import KPI
 
 # 1) Mapeo de códigos a (ID, ANALITO) según la plantilla deseada
 code_mapping = {
@@ -43,137 +64,988 @@ code_mapping = {
 # 2) Regex para extraer valores “CÓDIGO – {nivel} {valor}:”
 pattern_valores = re.compile(r'([A-Z\-]+)\s*-\s*(\d)\s*([0-9]+(?:\.[0-9]+)?):')
 
-# 3) Marcas que detienen la captura (en mayúsculas)
+# 3) Marca que inicia la captura y marcas que la detienen (en mayúsculas)
+start_marker = "LYPHOCHEK-ASSAYED"
 stop_markers = {"QC1 LIQUICHEK URINE", "INMUNOLOGY N1", "HBA1C QC N1"}
 
 # 4) Carpeta donde están los archivos .txt (ajusta según sea necesario)
 folder_path = './Datos_txt/'
-if not os.path.isdir(folder_path):
-    print(f"ERROR: La ruta '{folder_path}' no existe o no es una carpeta válida.", file=sys.stderr)
-    sys.exit(1)
+output_folder = './Plantillas/'
 
-# 5) Función para procesar un único archivo .txt
-def procesar_archivo_txt(file_path):
-    with open(file_path, 'r', encoding='latin-1') as f:
-        lines = f.readlines()
-
-    # Inicializar DataFrame base con ceros
-    base_rows = []
-    for code, (aid, aname) in code_mapping.items():
-        base_rows.append({
-            'ID':       aid,
-            'ANALITO':  aname,
-            'NIVEL 1':  0.0,
-            'NIVEL 2':  0.0,
-            'NIVEL 3':  0.0
-        })
-    df = pd.DataFrame(base_rows).sort_values('ID').reset_index(drop=True)
-
-    # Extraer la fecha (sin hora ni palabra "Índice")
-    fecha_extraida = None
-    for raw_line in lines:
-        if 'NDICE' in raw_line.upper():
-            idx = raw_line.upper().find('NDICE') + len('NDICE')
-            resto = raw_line[idx:]
-            parte_fecha = resto.strip().split(' ')[0]  # e.g. "05/31/2025"
-            fecha_extraida = parte_fecha.replace('/', '_')
-            break
+# Los .txt dentro de un comprimido se identifican como 'comprimido::miembro' (p. ej. '2022.zip::2022/AU480_0105.txt')
+SEPARADOR_MIEMBRO = '::'
+
+# Procesos para el primer pase (1 = secuencial, 0 = todos los núcleos disponibles)
+NUM_WORKERS = 1
+
+# Memoria acotada: con varios procesos, archivos por tarea del pool (y 2 tareas por proceso en
+# vuelo); los registros largos y el cubo de KPIs se escriben cada ARCHIVOS_POR_TANDA archivos
+ARCHIVOS_POR_TAREA = 32
+ARCHIVOS_POR_TANDA = 500
+
+# Manifiesto de archivos ya procesados (tamaño, mtime, hash y CSV generado) para el modo incremental
+MANIFEST_PATH = './manifest_extraccion.json'
+
+# Formato de salida: 'csv' (una plantilla ancha por día), 'parquet' (dataset largo) o 'ambos'
+FORMATO_SALIDA = 'csv'
+# Dataset Parquet particionado por año con registros largos (Fecha, Nivel, Analito, Valor, Archivo)
+PARQUET_PATH = './Plantillas_parquet/'
+
+# Actualizar el cubo de KPIs (KPI.py) con cada archivo procesado
+ACTUALIZAR_KPI = True
+
+# Métricas opcionales (--metricas): reporte JSON con tiempos, bytes, líneas y coincidencias por archivo,
+# totales y percentiles. Con --perfil además cProfile del parser (PERFIL_PATH) y tracemalloc - MODIFICA SEGÚN NECESITES
+METRICAS_PATH = './metricas_extraccion.json'
+PERFIL_PATH = './perfil_extraccion.prof'
 
-    # Variables de control de bloque
-    procesando = False
+# Tablas precalculadas para el parser: fila de cada código en la salida (ordenada por ID)
+_filas_ordenadas = sorted(code_mapping.values())
+_ids = [aid for aid, _ in _filas_ordenadas]
+_nombres = [aname for _, aname in _filas_ordenadas]
+_fila_por_codigo = {code: _ids.index(aid) for code, (aid, _) in code_mapping.items()}
+_columnas_nivel = ['NIVEL 1', 'NIVEL 2', 'NIVEL 3']
 
-    # Recorrer líneas entre "LYPHOCHEK-ASSAYED" y siguiente stop_marker
-    for raw_line in lines:
+class _Contador:
+    """Itera las líneas de un export contando líneas y caracteres (solo con métricas)"""
+
+    def __init__(self, f):
+        self.f = f
+        self.lineas = 0
+        self.caracteres = 0
+
+    def __iter__(self):
+        for linea in self.f:
+            self.lineas += 1
+            self.caracteres += len(linea)
+            yield linea
+
+    def bytes(self):
+        """Bytes leídos (descomprimidos); sin un buffer binario debajo, los caracteres"""
+        try:
+            return self.f.buffer.tell()
+        except (AttributeError, OSError, ValueError):
+            return self.caracteres
+
+
+def _leer_export(f, fila_por_codigo, n_filas, bloques, metricas=None):
+    """Recorre un export una sola vez, línea por línea, y llena un arreglo por bloque.
+
+    bloques es una lista de (marca de inicio, marcas de fin) en mayúsculas; cada
+    arreglo tiene una fila por analito (según fila_por_codigo) y una columna por nivel.
+    Con metricas (dict) se agregan los conteos y tiempos del recorrido.
+    Devuelve ([arreglos], fecha_extraida).
+    """
+    medir = metricas is not None
+    if medir:
+        inicio_lectura = time.perf_counter()
+        contador = _Contador(f)
+        f = contador
+        lineas_bloque = coincidencias = fuera_de_rango = 0
+        regex_s = 0.0
+        desconocidos = Counter()
+    tablas = [np.zeros((n_filas, 3)) for _ in bloques]
+    fecha_extraida = None
+    actual = None  # Índice del bloque que se está capturando
+    # Con un solo bloque basta un 'in'; con varios, todas las marcas de inicio en una sola búsqueda
+    unico = bloques[0][0] if len(bloques) == 1 else None
+    indice_inicio = {inicio: i for i, (inicio, _) in reversed(list(enumerate(bloques)))}
+    patron_inicio = re.compile('|'.join(map(re.escape, indice_inicio)))
+
+    for raw_line in f:
         line_up = raw_line.upper()
 
-        if 'LYPHOCHEK-ASSAYED' in line_up:
-            procesando = True
-            continue
+        # Extraer la fecha (sin hora ni palabra "Índice"), solo la primera aparición
+        if fecha_extraida is None and 'NDICE' in line_up:
+            idx = line_up.find('NDICE') + len('NDICE')
+            parte_fecha = raw_line[idx:].strip().split(' ')[0]  # e.g. "05/31/2025"
+            fecha_extraida = parte_fecha.replace('/', '_')
+            if medir:
+                metricas['linea_fecha'] = contador.lineas
+
+        # Recorrer líneas entre la marca de inicio de un bloque y su siguiente marca de fin
+        if unico is not None:
+            if unico in line_up:
+                actual = 0
+                continue
+        else:
+            inicio = patron_inicio.search(line_up)
+            if inicio:
+                actual = indice_inicio[inicio.group()]
+                continue
 
-        if procesando and any(marker in line_up for marker in stop_markers):
-            procesando = False
+        if actual is None:
             continue
 
-        if not procesando:
+        if any(marker in line_up for marker in bloques[actual][1]):
+            actual = None
             continue
 
+        valores = tablas[actual]
+        if medir:
+            inicio_regex = time.perf_counter()
+            lineas_bloque += 1
         for m in pattern_valores.finditer(line_up):
-            raw_code = m.group(1).strip()
-            nivel = int(m.group(2))
-            valor = float(m.group(3))
-
-            code = raw_code.upper()
+            code = m.group(1).strip()
             if code.endswith('-C'):
                 code = code[:-2]
-            code = code.replace('-', '')
+            fila = fila_por_codigo.get(code.replace('-', ''))
+            if medir:
+                coincidencias += 1
+            if fila is None:
+                if medir:
+                    desconocidos[code.replace('-', '')] += 1
+                continue
 
-            if code not in code_mapping:
+            nivel = int(m.group(2))
+            if not 1 <= nivel <= 3:
+                if medir:
+                    fuera_de_rango += 1
                 continue
+            valores[fila, nivel - 1] = float(m.group(3))
+        if medir:
+            regex_s += time.perf_counter() - inicio_regex
+
+    if medir:
+        metricas.update(
+            bytes=contador.bytes(),
+            lineas=contador.lineas,
+            lineas_bloque=lineas_bloque,
+            coincidencias=coincidencias,
+            codigos_desconocidos=sum(desconocidos.values()),
+            desconocidos=dict(desconocidos),
+            niveles_fuera_de_rango=fuera_de_rango,
+            lectura_ms=round((time.perf_counter() - inicio_lectura) * 1000, 3),
+            regex_ms=round(regex_s * 1000, 3),
+        )
+    return tablas, fecha_extraida
 
-            analyte_id, _ = code_mapping[code]
-            fila_idx = df.index[df['ID'] == analyte_id]
-            if len(fila_idx) != 1:
-                print(f"ATENCIÓN: ID duplicado o no encontrado para '{raw_code}' en '{os.path.basename(file_path)}'.", file=sys.stderr)
+
+def _plantilla(valores, ids, nombres):
+    """Plantilla ancha (ID, ANALITO, NIVEL 1..3), o None si todo quedó en cero"""
+    if not valores.any():
+        return None
+    df = pd.DataFrame(valores, columns=_columnas_nivel)
+    df.insert(0, 'ANALITO', nombres)
+    df.insert(0, 'ID', ids)
+    return df
+
+
+def separar_miembro(ruta):
+    """(ruta del comprimido, miembro) para 'comprimido::miembro'; (ruta, None) para un .txt"""
+    archivo, separador, miembro = ruta.partition(SEPARADOR_MIEMBRO)
+    return (archivo, miembro) if separador else (ruta, None)
+
+
+def tipo_comprimido(nombre):
+    """'zip', 'tar' (.tar.gz/.tgz), 'gz' o None si nombre no es un comprimido soportado"""
+    nombre = nombre.lower()
+    if nombre.endswith('.zip'):
+        return 'zip'
+    if nombre.endswith(('.tar.gz', '.tgz')):
+        return 'tar'
+    if nombre.endswith('.gz'):
+        return 'gz'
+    return None
+
+
+def iterar_miembros(archivo, miembros):
+    """Abre los miembros pedidos de un comprimido como texto latin-1, sin extraerlos a disco.
+
+    Entrega (miembro, archivo de texto) de cada uno que exista; un .tar.gz se
+    recorre en una sola pasada, en el orden en que están guardados.
+    """
+    tipo = tipo_comprimido(archivo)
+    if tipo == 'zip':
+        with zipfile.ZipFile(archivo) as zf:
+            for miembro in miembros:
+                try:
+                    binario = zf.open(miembro)
+                except KeyError:
+                    continue
+                with binario:
+                    yield miembro, io.TextIOWrapper(binario, encoding='latin-1')
+    elif tipo == 'tar':
+        pendientes = set(miembros)
+        with tarfile.open(archivo, 'r:*') as tar:
+            for info in tar:
+                if info.name in pendientes:
+                    pendientes.discard(info.name)
+                    yield info.name, io.TextIOWrapper(tar.extractfile(info), encoding='latin-1')
+                    if not pendientes:
+                        break
+    else:
+        with gzip.open(archivo, 'rb') as binario:
+            yield miembros[0], io.TextIOWrapper(binario, encoding='latin-1')
+
+
+@contextlib.contextmanager
+def _abrir_miembro(archivo, miembro):
+    abiertos = iterar_miembros(archivo, [miembro])
+    try:
+        for _, f in abiertos:
+            yield f
+            return
+    finally:
+        abiertos.close()
+    raise FileNotFoundError(f"'{miembro}' no está en '{archivo}'")
+
+
+def abrir_export(fuente):
+    """Abre un export como texto latin-1: ruta de un .txt, 'comprimido::miembro' o un archivo ya abierto (tal cual)"""
+    if hasattr(fuente, 'read'):
+        return contextlib.nullcontext(fuente)
+    archivo, miembro = separar_miembro(fuente)
+    if miembro is None:
+        return open(fuente, 'r', encoding='latin-1')
+    return _abrir_miembro(archivo, miembro)
+
+
+# Tamaño, mtime y fecha de creación de los miembros listados: 'comprimido::miembro' -> (size, mtime, ctime)
+_miembros = {}
+
+
+def _listar_comprimido(archivo):
+    """[(miembro, (size, mtime, ctime))] de los .txt de un comprimido; para los miembros la creación es su mtime"""
+    tipo = tipo_comprimido(archivo)
+    if tipo == 'zip':
+        with zipfile.ZipFile(archivo) as zf:
+            miembros = []
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith('.txt'):
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    miembros.append((info.filename, (info.file_size, mtime, mtime)))
+            return miembros
+    if tipo == 'tar':
+        with tarfile.open(archivo, 'r:*') as tar:
+            return [(info.name, (info.size, float(info.mtime), float(info.mtime)))
+                    for info in tar if info.isfile() and info.name.lower().endswith('.txt')]
+    # .gz: un único miembro, el nombre sin la extensión; cuentan los datos del .gz
+    miembro = os.path.basename(archivo)[:-len('.gz')]
+    if not miembro.lower().endswith('.txt'):
+        return []
+    stat = os.stat(archivo)
+    return [(miembro, (stat.st_size, stat.st_mtime, stat.st_ctime))]
+
+
+def listar_exports(carpeta):
+    """Exports de carpeta en orden alfabético: sus .txt y los .txt de cada comprimido ('comprimido::miembro')"""
+    exports = []
+    for nombre in os.listdir(carpeta):
+        if nombre.lower().endswith('.txt'):
+            exports.append(nombre)
+        elif tipo_comprimido(nombre):
+            ruta = os.path.join(carpeta, nombre)
+            try:
+                miembros = _listar_comprimido(ruta)
+            except Exception as e:
+                print(f"ERROR al leer el comprimido '{nombre}': {e}", file=sys.stderr)
                 continue
+            for miembro, estado in miembros:
+                _miembros[f"{ruta}{SEPARADOR_MIEMBRO}{miembro}"] = estado
+                exports.append(f"{nombre}{SEPARADOR_MIEMBRO}{miembro}")
+    return sorted(exports)
+
+
+def estado_export(ruta):
+    """(tamaño, mtime, fecha de creación) de un .txt o de un miembro 'comprimido::miembro'"""
+    archivo, miembro = separar_miembro(ruta)
+    if miembro is None:
+        stat = os.stat(ruta)
+        return stat.st_size, stat.st_mtime, stat.st_ctime
+    if ruta not in _miembros:
+        for nombre, estado in _listar_comprimido(archivo):
+            _miembros[f"{archivo}{SEPARADOR_MIEMBRO}{nombre}"] = estado
+    if ruta not in _miembros:
+        raise FileNotFoundError(f"'{miembro}' no está en '{archivo}'")
+    return _miembros[ruta]
+
+
+# 5) Función para procesar un único archivo .txt
+def procesar_archivo_txt(file_path, metricas=None):
+    """Procesa un export del AU480 en una sola pasada, línea por línea.
+
+    Detecta la fecha ("Índice"), sigue el estado del bloque de start_marker
+    y llena un arreglo NumPy preasignado (una fila por analito, ordenado por ID).
+    El DataFrame se construye una única vez al final. file_path también puede
+    ser 'comprimido::miembro' o un archivo de texto ya abierto (ver abrir_export).
+    Con metricas (dict) se agregan los conteos y tiempos de _leer_export.
+    Devuelve (DataFrame o None si todo quedó en cero, fecha_extraida).
+    """
+    with abrir_export(file_path) as f:
+        (valores,), fecha_extraida = _leer_export(f, _fila_por_codigo, len(_ids), [(start_marker, stop_markers)],
+                                                  metricas)
+    return _plantilla(valores, _ids, _nombres), fecha_extraida
+
+
+def procesar_export(file_path, analizador, metricas=None):
+    """Procesa un export de analizador (Configuracion.Analizador) leyendo todos sus materiales a la vez.
 
-            col_name = f'NIVEL {nivel}'
-            df.at[fila_idx[0], col_name] = valor
+    Devuelve ([DataFrame o None por material], fecha_extraida).
+    """
+    with abrir_export(file_path) as f:
+        tablas, fecha_extraida = _leer_export(f, analizador.fila_por_codigo, len(analizador.ids), analizador.bloques,
+                                              metricas)
+    return [_plantilla(valores, analizador.ids, analizador.nombres) for valores in tablas], fecha_extraida
 
-    # Verificar si al menos un analito cambió de cero
-    totales = df[['NIVEL 1','NIVEL 2','NIVEL 3']].sum(axis=1)
-    if (totales == 0).all():
-        return None, fecha_extraida
 
-    return df, fecha_extraida
+def _procesar_seguro(file_path, analizador=None, medir=False):
+    """Envoltura para el pool: devuelve el error como texto en lugar de propagarlo.
 
-# 6) Primer pase: procesar todos los archivos y recolectar fechas
-resultados = []  # Lista de tuplas: (filename, DataFrame, fecha_extraida, file_path)
-for filename in os.listdir(folder_path):
-    if not filename.lower().endswith('.txt'):
-        continue
-    file_path = os.path.join(folder_path, filename)
+    Con medir, agrega un cuarto elemento: el dict de métricas del archivo.
+    """
+    metricas = {} if medir else None
+    inicio = time.perf_counter()
     try:
-        df_res, fecha = procesar_archivo_txt(file_path)
+        if analizador is None:
+            df_res, fecha = procesar_archivo_txt(file_path, metricas)
+        else:
+            df_res, fecha = procesar_export(file_path, analizador, metricas)
+        resultado = (df_res, fecha, None)
     except Exception as e:
-        print(f"ERROR al procesar '{filename}': {e}", file=sys.stderr)
-        continue
-    if df_res is None:
-        continue
-    resultados.append((filename, df_res, fecha, file_path))
-
-# 7) Contar cuántas veces aparece cada fecha
-fecha_counts = {}
-for _, _, fecha, _ in resultados:
-    if fecha:
-        fecha_counts[fecha] = fecha_counts.get(fecha, 0) + 1
-
-# 8) Segundo pase: guardar cada DataFrame con nombre ajustado
-used_plain_dates = set()
-for filename, df_res, fecha, file_path in resultados:
-    if fecha:
-        count = fecha_counts.get(fecha, 0)
-        if count > 1:
-            # Si aún no se usó la versión sin hora para esta fecha, emplear solo fecha
-            if fecha not in used_plain_dates:
-                nuevo_nombre = f"{fecha}.csv"
-                used_plain_dates.add(fecha)
-            else:
-                # Para las demás ocurrencias, agregar hora de creación
-                ctime = os.path.getctime(file_path)
-                hora = datetime.fromtimestamp(ctime).strftime('%H%M')
-                nuevo_nombre = f"{fecha}_{hora}.csv"
+        resultado = (None, None, str(e))
+    if not medir:
+        return resultado
+    metricas['procesar_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+    return resultado + (metricas,)
+
+
+def _procesar_tarea(tarea, analizador=None, medir=False):
+    """Procesa un grupo de archivos; cada comprimido se abre una sola vez para todos sus miembros.
+
+    Los miembros de un .tar.gz llegan ya leídos como (file_path, bytes, error) (ver _tareas).
+    """
+    por_archivo, leidos, file_paths = {}, {}, []
+    for item in tarea:
+        if isinstance(item, tuple):
+            file_path = item[0]
+            leidos[file_path] = item[1:]
         else:
-            # Si la fecha es única, basta con usar solo fecha
-            nuevo_nombre = f"{fecha}.csv"
-    else:
-        base_name = os.path.splitext(filename)[0]
-        nuevo_nombre = f"{base_name}.csv"
+            file_path = item
+            archivo, miembro = separar_miembro(file_path)
+            if miembro is not None:
+                por_archivo.setdefault(archivo, []).append(miembro)
+        file_paths.append(file_path)
+    resultados = {}
+    for file_path, (datos, error) in leidos.items():
+        if datos is None:
+            resultados[file_path] = (None, None, error) + (({},) if medir else ())
+        else:
+            resultados[file_path] = _procesar_seguro(io.TextIOWrapper(io.BytesIO(datos), encoding='latin-1'),
+                                                     analizador, medir)
+    for archivo, miembros in por_archivo.items():
+        try:
+            for miembro, f in iterar_miembros(archivo, miembros):
+                resultados[f"{archivo}{SEPARADOR_MIEMBRO}{miembro}"] = _procesar_seguro(f, analizador, medir)
+            error = f"no está en '{archivo}'"
+        except Exception as e:
+            error = str(e)  # Comprimido dañado: los miembros que faltan quedan con el error
+        for miembro in miembros:
+            resultados.setdefault(f"{archivo}{SEPARADOR_MIEMBRO}{miembro}",
+                                  (None, None, error) + (({},) if medir else ()))
+    return [resultados[file_path] if file_path in resultados else _procesar_seguro(file_path, analizador, medir)
+            for file_path in file_paths]
+
 
-    output_path = os.path.join( "./Plantillas/",nuevo_nombre)
+def _leer_tar(archivo, file_paths):
+    """Lee de corrido los miembros file_paths de un .tar.gz y los entrega en el orden de file_paths.
+
+    Cada uno sale como (file_path, bytes, None), o (file_path, None, error) si falta o el
+    comprimido está dañado; solo se retienen los miembros guardados antes de su turno.
+    """
+    pendientes = {separar_miembro(file_path)[1]: file_path for file_path in file_paths}
+    orden, leidos = deque(file_paths), {}
+    error = f"no está en '{archivo}'"
     try:
-        df_res.to_csv(output_path, index=False, encoding='utf-8')
-        print(f"Se generó '{nuevo_nombre}'.")
+        with tarfile.open(archivo, 'r:*') as tar:
+            for info in tar:
+                file_path = pendientes.pop(info.name, None)
+                if file_path is None:
+                    continue
+                leidos[file_path] = tar.extractfile(info).read()
+                while orden and orden[0] in leidos:
+                    file_path = orden.popleft()
+                    yield file_path, leidos.pop(file_path), None
+                if not pendientes:
+                    break
     except Exception as e:
-        print(f"ERROR al guardar '{nuevo_nombre}': {e}", file=sys.stderr)
-        continue
+        error = str(e)  # Comprimido dañado: los miembros que faltan quedan con el error
+    for file_path in orden:
+        datos = leidos.pop(file_path, None)
+        yield file_path, datos, None if datos is not None else error
+
+
+def _items(file_paths):
+    """file_paths en orden; los miembros seguidos de un mismo .tar.gz, ya leídos con _leer_tar"""
+    i = 0
+    while i < len(file_paths):
+        archivo, miembro = separar_miembro(file_paths[i])
+        if miembro is None or tipo_comprimido(archivo) != 'tar':
+            yield file_paths[i]
+            i += 1
+            continue
+        fin = i + 1
+        while fin < len(file_paths):
+            siguiente, otro = separar_miembro(file_paths[fin])
+            if siguiente != archivo or otro is None:
+                break
+            fin += 1
+        yield from _leer_tar(archivo, file_paths[i:fin])
+        i = fin
+
+
+def _tareas(file_paths, tamano):
+    """Divide file_paths en tareas de hasta tamano archivos.
+
+    Un .tar.gz solo se puede leer de corrido: sus miembros se leen aquí, a medida que
+    se piden tareas, y viajan ya leídos, así que se reparten entre los procesos en
+    tareas del mismo tamaño que los .txt sueltos y los .zip.
+    """
+    tarea = []
+    for item in _items(file_paths):
+        tarea.append(item)
+        if len(tarea) >= tamano:
+            yield tarea
+            tarea = []
+    if tarea:
+        yield tarea
+
+
+def iterar_archivos(file_paths, workers=1, analizador=None, medir=False):
+    """Procesa varios archivos, en serie o con un pool de procesos, y entrega cada resultado en cuanto está listo.
+
+    Los resultados (df, fecha, error) salen en el mismo orden que file_paths, de modo
+    que el nombrado no depende del número de procesos. Con el pool hay a lo sumo dos
+    tareas por proceso en vuelo: la memoria no crece con la cantidad de archivos.
+    Con analizador, df es la lista de plantillas de sus materiales (procesar_export).
+    Con medir, cada resultado lleva además el dict de métricas del archivo.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(file_paths) < 2:
+        for tarea in _tareas(file_paths, ARCHIVOS_POR_TAREA):
+            yield from _procesar_tarea(tarea, analizador, medir)
+        return
+
+    # Varios archivos por tarea para amortizar el costo de comunicación
+    tamano = max(1, min(len(file_paths) // (workers * 4), ARCHIVOS_POR_TAREA))
+    tareas = _tareas(file_paths, tamano)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        en_vuelo = deque(executor.submit(_procesar_tarea, tarea, analizador, medir)
+                         for tarea in islice(tareas, workers * 2))
+        while en_vuelo:
+            resultados = en_vuelo.popleft().result()
+            for tarea in islice(tareas, 1):
+                en_vuelo.append(executor.submit(_procesar_tarea, tarea, analizador, medir))
+            yield from resultados
+
+
+def procesar_archivos(file_paths, workers=1, analizador=None):
+    """Lista con los resultados de iterar_archivos, en el mismo orden que file_paths."""
+    return list(iterar_archivos(file_paths, workers, analizador))
+
+
+def _hash_archivo(file_path):
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def cargar_manifest(path=MANIFEST_PATH):
+    """Devuelve el manifiesto {filename: entrada}; vacío si no existe o está dañado."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('archivos', {})
+    except (OSError, ValueError) as e:
+        print(f"ATENCIÓN: no se pudo leer el manifiesto '{path}' ({e}); se procesará todo.", file=sys.stderr)
+        return {}
+
+
+def guardar_manifest(manifest, path=MANIFEST_PATH):
+    """Escribe el manifiesto de forma atómica (archivo temporal + reemplazo)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'archivos': manifest}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def archivo_sin_cambios(entrada, file_path, verificar_csv=True, carpeta_salida=None):
+    """Indica si file_path coincide con su entrada del manifiesto.
+
+    Tamaño y mtime iguales bastan; si solo cambió el mtime se compara el hash
+    (y se actualiza la entrada). Si el CSV generado ya no existe en carpeta_salida
+    (por defecto output_folder), se reprocesa.
+    """
+    if entrada is None:
+        return False
+    if verificar_csv and entrada.get('salida') and \
+            not os.path.exists(os.path.join(carpeta_salida or output_folder, entrada['salida'])):
+        return False
+    size, mtime, _ = estado_export(file_path)
+    if size != entrada['size']:
+        return False
+    if mtime == entrada['mtime']:
+        return True
+    # Los miembros de comprimidos no tienen hash: con otro mtime se reprocesan
+    if entrada['sha256'] is None or _hash_archivo(file_path) != entrada['sha256']:
+        return False
+    entrada['mtime'] = mtime
+    return True
+
+
+def entrada_manifest(file_path, fecha, salida):
+    """Entrada del manifiesto para file_path: tamaño, mtime, hash, fecha y CSV generado.
+
+    Para 'comprimido::miembro' no se calcula el hash (habría que descomprimirlo otra vez).
+    """
+    size, mtime, _ = estado_export(file_path)
+    archivo, miembro = separar_miembro(file_path)
+    return {
+        'path':   os.path.abspath(file_path) if miembro is None else
+                  f"{os.path.abspath(archivo)}{SEPARADOR_MIEMBRO}{miembro}",
+        'size':   size,
+        'mtime':  mtime,
+        'sha256': _hash_archivo(file_path) if miembro is None else None,
+        'fecha':  fecha,
+        'salida': salida,
+    }
+
+
+def a_registros_largos(df_res, fecha, filename):
+    """Convierte una plantilla ancha en registros largos no nulos (Fecha, Nivel, Analito, Valor, Archivo)."""
+    dia = datetime.strptime(fecha, '%m_%d_%Y').date()
+    largo = df_res.melt(id_vars=['ANALITO'], value_vars=_columnas_nivel, var_name='Nivel', value_name='Valor')
+    largo = largo[largo['Valor'] != 0]
+    return pd.DataFrame({
+        'Fecha':   dia,
+        'Nivel':   largo['Nivel'].str[-1].astype('int8').to_numpy(),
+        'Analito': largo['ANALITO'].to_numpy(),
+        'Valor':   largo['Valor'].to_numpy(),
+        'Archivo': filename,
+    })
+
+
+def marcador_parquet(filename):
+    """Fila sin valores para escribir_parquet: el lote más reciente de filename queda vacío
+    (se reprocesó sin valores o ya no está en la carpeta)"""
+    return pd.DataFrame({'Fecha': [None], 'Nivel': [None], 'Analito': [None], 'Valor': [None],
+                         'Archivo': [filename]})
+
+
+def escribir_parquet(registros, path=PARQUET_PATH):
+    """Agrega los registros de esta corrida al dataset Parquet, un fragmento por año.
+
+    Cada fragmento lleva el identificador de corrida 'Lote'; si un archivo se
+    reprocesa, al leer solo cuentan sus registros del lote más reciente. Los
+    marcadores (marcador_parquet) van a la partición anio=0.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("ERROR: el formato 'parquet' requiere pyarrow (pip install pyarrow).", file=sys.stderr)
+        sys.exit(1)
+
+    if not registros:
+        return
+    df = pd.concat(registros, ignore_index=True)
+    lote = time.time_ns()
+    df['Lote'] = lote
+    esquema = pa.schema([
+        ('Fecha', pa.date32()), ('Nivel', pa.int8()), ('Analito', pa.string()),
+        ('Valor', pa.float64()), ('Archivo', pa.string()), ('Lote', pa.int64()),
+    ])
+    anios = pd.Series([0 if pd.isna(d) else d.year for d in df['Fecha']], index=df.index)
+    for anio, df_anio in df.groupby(anios):
+        carpeta = os.path.join(path, f"anio={anio}")
+        os.makedirs(carpeta, exist_ok=True)
+        df_anio = df_anio.sort_values(['Fecha', 'Analito', 'Nivel'])
+        tabla = pa.Table.from_pandas(df_anio, schema=esquema, preserve_index=False)
+        pq.write_table(tabla, os.path.join(carpeta, f"lote-{lote}.parquet"))
+    marcados = int((anios == 0).sum())
+    print(f"Se agregaron {len(df) - marcados} registros a '{path}'"
+          + (f" ({marcados} archivo(s) sin valores o retirados)." if marcados else "."))
+
+
+def retirar_de_parquet(vigentes, path=PARQUET_PATH):
+    """Marca en el dataset los archivos que ya no están en vigentes (exports borrados de la carpeta)"""
+    if not os.path.isdir(path):
+        return
+    lotes = pd.read_parquet(path, engine='pyarrow', columns=['Archivo', 'Lote', 'anio'])
+    ultimos = lotes.sort_values('Lote').drop_duplicates('Archivo', keep='last')
+    retirados = ultimos.loc[(ultimos['anio'].astype('int64') != 0) & ~ultimos['Archivo'].isin(vigentes), 'Archivo']
+    if len(retirados):
+        escribir_parquet([marcador_parquet(filename) for filename in sorted(retirados)], path)
+
+
+class AsignadorNombres:
+    """Nombre del CSV de salida de cada archivo, decidido a medida que llegan los resultados.
+
+    La primera aparición de una fecha usa 'MM_DD_YYYY.csv' y las siguientes agregan
+    la hora de creación del archivo; los nombres ya registrados en el manifiesto
+    cuentan como usados. Un archivo modificado que conserva su fecha mantiene su
+    nombre anterior (anteriores: filename -> entrada previa).
+
+    Los resultados se pasan en orden con agregar() (o descartar() si no generan CSV).
+    Solo esperan los de una fecha cuyo nombre sin hora todavía puede conservar un
+    archivo modificado que aún no se leyó; el resto sale de inmediato.
+    """
+
+    def __init__(self, manifest, anteriores):
+        self.anteriores = anteriores
+        self.usadas = {entrada['fecha'] for entrada in manifest.values()
+                       if entrada['fecha'] and entrada['salida'] == f"{entrada['fecha']}.csv"}
+        # Archivos modificados aún sin leer que tenían el nombre sin hora de su fecha
+        self.reservantes = {filename: previa['fecha'] for filename, previa in anteriores.items()
+                            if previa['fecha'] and previa['salida'] == f"{previa['fecha']}.csv"}
+        self.reservas = Counter(self.reservantes.values())
+        self.en_espera = {}  # fecha -> [(dato, file_path)] en orden de llegada
+
+    def _liberar(self, filename):
+        fecha = self.reservantes.pop(filename, None)
+        if fecha is not None:
+            self.reservas[fecha] -= 1
+        return fecha
+
+    def _resolver(self, fecha):
+        """Nombra los resultados en espera de fecha si ya nadie puede reservar su nombre sin hora"""
+        if self.reservas[fecha]:
+            return []
+        listos = []
+        for dato, file_path in self.en_espera.pop(fecha, []):
+            if fecha not in self.usadas:
+                # Si aún no se usó la versión sin hora para esta fecha, emplear solo fecha
+                self.usadas.add(fecha)
+                listos.append((dato, f"{fecha}.csv"))
+            else:
+                # Para las demás ocurrencias, agregar hora de creación (de un miembro comprimido, su mtime)
+                ctime = estado_export(file_path)[2]
+                hora = datetime.fromtimestamp(ctime).strftime('%H%M')
+                listos.append((dato, f"{fecha}_{hora}.csv"))
+        return listos
+
+    def agregar(self, filename, fecha, file_path, dato):
+        """Suma el resultado de filename; devuelve [(dato, nombre)] de los que ya tienen nombre."""
+        liberada = self._liberar(filename)
+        listos = []
+        previa = self.anteriores.get(filename)
+        if previa and previa['salida'] and previa['fecha'] == fecha:
+            # Un archivo modificado que conserva su fecha mantiene su nombre anterior
+            if previa['salida'] == f"{fecha}.csv":
+                self.usadas.add(fecha)
+            listos.append((dato, previa['salida']))
+        elif fecha:
+            self.en_espera.setdefault(fecha, []).append((dato, file_path))
+        else:
+            base_name = os.path.splitext(os.path.basename(separar_miembro(filename)[1] or filename))[0]
+            listos.append((dato, f"{base_name}.csv"))
+        for pendiente in {liberada, fecha} - {None, ''}:
+            listos += self._resolver(pendiente)
+        return listos
+
+    def descartar(self, filename):
+        """filename no generó CSV (sin valores o con error): libera su nombre anterior."""
+        liberada = self._liberar(filename)
+        return self._resolver(liberada) if liberada is not None else []
+
+    def terminar(self):
+        """Nombra lo que quedó en espera (los archivos modificados que faltaban no generaron CSV)."""
+        for filename in list(self.reservantes):
+            self._liberar(filename)
+        return [listo for fecha in list(self.en_espera) for listo in self._resolver(fecha)]
+
+
+def asignar_nombres(manifest, anteriores, resultados):
+    """Nombre del CSV de salida de cada (filename, df, fecha, file_path) de resultados (ver AsignadorNombres)."""
+    asignador = AsignadorNombres(manifest, anteriores)
+    nombres = {}
+    for i, (filename, _, fecha, file_path) in enumerate(resultados):
+        nombres.update(asignador.agregar(filename, fecha, file_path, i))
+    nombres.update(asignador.terminar())
+    return [nombres[i] for i in range(len(resultados))]
+
+
+def eliminar_salidas_obsoletas(manifest, anteriores, carpeta=None):
+    """Elimina de carpeta (por defecto output_folder) los CSVs de archivos modificados cuya salida cambió o quedó vacía."""
+    salidas_vigentes = {entrada['salida'] for entrada in manifest.values()}
+    for filename, previa in anteriores.items():
+        if previa['salida'] and previa['salida'] not in salidas_vigentes:
+            obsoleto = os.path.join(carpeta or output_folder, previa['salida'])
+            if os.path.exists(obsoleto):
+                os.remove(obsoleto)
+                print(f"Se eliminó '{previa['salida']}' (salida anterior de '{filename}').")
+
+
+def eliminar_salidas_retiradas(previas, manifest, vigentes, carpeta=None):
+    """Elimina de carpeta (por defecto output_folder) los CSVs de exports que ya no están en la carpeta de entrada.
+
+    previas y manifest son las entradas del material antes y después de la corrida;
+    vigentes, las claves de los exports presentes. Así la carga desde CSV deja de
+    subirlos, igual que el dataset Parquet (retirar_de_parquet) y el cubo de KPIs.
+    """
+    salidas_vigentes = {entrada['salida'] for clave, entrada in manifest.items() if clave in vigentes}
+    for clave, previa in previas.items():
+        if clave in vigentes or not previa['salida'] or previa['salida'] in salidas_vigentes:
+            continue
+        retirado = os.path.join(carpeta or output_folder, previa['salida'])
+        if os.path.exists(retirado):
+            os.remove(retirado)
+            print(f"Se eliminó '{previa['salida']}' ('{clave}' ya no está en la carpeta).")
+
+
+def _sumar_ms(metricas, campo, inicio):
+    """Suma a metricas[campo] los ms transcurridos desde inicio (perf_counter); sin métricas no hace nada"""
+    if metricas is not None:
+        metricas[campo] = round(metricas.get(campo, 0) + (time.perf_counter() - inicio) * 1000, 3)
+
+
+def _percentiles(valores):
+    """p50, p90, p95, p99 y máximo de una lista de números (None si está vacía)"""
+    if not valores:
+        return None
+    p50, p90, p95, p99 = np.percentile(valores, [50, 90, 95, 99])
+    return {'p50': round(float(p50), 3), 'p90': round(float(p90), 3), 'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3), 'max': round(float(max(valores)), 3)}
+
+
+def capturar_perfil(perfil, path=PERFIL_PATH):
+    """Detiene cProfile y tracemalloc, guarda el perfil en path y resume las funciones y líneas más costosas"""
+    perfil.disable()
+    perfil.dump_stats(path)
+    _, pico = tracemalloc.get_traced_memory()
+    asignaciones = tracemalloc.take_snapshot().statistics('lineno')[:10]
+    tracemalloc.stop()
+    funciones = sorted(pstats.Stats(perfil).stats.items(), key=lambda item: item[1][2], reverse=True)[:15]
+    return {
+        'archivo': path,
+        'funciones': [{'funcion': f"{os.path.basename(archivo)}:{linea}({nombre})", 'llamadas': llamadas,
+                       'propio_s': round(propio, 4), 'acumulado_s': round(acumulado, 4)}
+                      for (archivo, linea, nombre), (_, llamadas, propio, acumulado, _) in funciones],
+        'memoria_pico_mb': round(pico / 1e6, 2),
+        'asignaciones': [{'linea': str(stat.traceback[0]), 'kb': round(stat.size / 1024, 1), 'bloques': stat.count}
+                         for stat in asignaciones],
+    }
+
+
+def reporte_metricas(metricas, segundos, workers, perfil=None):
+    """Reporte de la corrida: totales, percentiles, códigos desconocidos, archivos más lentos y métricas por archivo"""
+    ok = [m for m in metricas if m['error'] is None]
+    totales = {'archivos': len(metricas), 'errores': len(metricas) - len(ok),
+               'sin_datos': sum(1 for m in ok if not m['plantillas']),
+               'sin_fecha': sum(1 for m in ok if m['fecha'] is None)}
+    for campo in ('bytes', 'lineas', 'lineas_bloque', 'coincidencias', 'codigos_desconocidos',
+                  'niveles_fuera_de_rango'):
+        totales[campo] = sum(m.get(campo, 0) for m in metricas)
+    totales['segundos'] = round(segundos, 3)
+    totales['archivos_s'] = round(len(metricas) / segundos, 1) if segundos else None
+    totales['mb_s'] = round(totales['bytes'] / 1e6 / segundos, 2) if segundos else None
+    desconocidos = Counter()
+    for m in metricas:
+        desconocidos.update(m.get('desconocidos', {}))
+    campos = ('procesar_ms', 'lectura_ms', 'regex_ms', 'csv_ms', 'manifest_ms', 'bytes', 'lineas', 'coincidencias')
+    lentos = sorted(ok, key=lambda m: m.get('procesar_ms', 0), reverse=True)[:10]
+    return {
+        'version': 1,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'workers': workers,
+        'totales': totales,
+        'percentiles': {campo: _percentiles([m[campo] for m in ok if campo in m]) for campo in campos},
+        'desconocidos': dict(desconocidos.most_common()),
+        'mas_lentos': [{campo: m.get(campo) for campo in ('analizador', 'archivo', 'procesar_ms', 'bytes', 'lineas')}
+                       for m in lentos],
+        'perfil': perfil,
+        'archivos': metricas,
+    }
+
+
+def escribir_metricas(reporte, path=METRICAS_PATH):
+    """Guarda el reporte de métricas en path (JSON) e imprime un resumen"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=1)
+    totales, procesar = reporte['totales'], reporte['percentiles']['procesar_ms']
+    print(f"📊 Métricas: {totales['archivos']} archivo(s), {totales['bytes'] / 1e6:.1f} MB, {totales['lineas']} líneas "
+          f"en {totales['segundos']:.2f} s ({totales['archivos_s'] or 0:.1f} archivos/s, {totales['mb_s'] or 0:.2f} MB/s); "
+          f"{totales['errores']} error(es), {totales['sin_fecha']} sin fecha")
+    if procesar:
+        print(f"   Procesar por archivo: p50 {procesar['p50']:.2f} ms, p95 {procesar['p95']:.2f} ms, "
+              f"máx {procesar['max']:.2f} ms ('{reporte['mas_lentos'][0]['archivo']}')")
+    if reporte['desconocidos']:
+        print("   Códigos desconocidos: " + ", ".join(f"{code} ({n})" for code, n in
+                                                      list(reporte['desconocidos'].items())[:10]))
+    if reporte['perfil']:
+        print(f"   Perfil en '{reporte['perfil']['archivo']}' (pico de memoria "
+              f"{reporte['perfil']['memoria_pico_mb']:.1f} MB; ver con python -m pstats)")
+    print(f"📄 Reporte de métricas en '{path}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera las plantillas CSV a partir de los exports de los analizadores.")
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS,
+                        help="Procesos para el primer pase (1 = secuencial, 0 = todos los núcleos).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Procesa solo archivos nuevos o modificados según el manifiesto.")
+    parser.add_argument('--salida', choices=['csv', 'parquet', 'ambos'], default=FORMATO_SALIDA,
+                        help="Formato de salida: plantillas CSV, dataset Parquet largo o ambos.")
+    parser.add_argument('--metricas', nargs='?', const=METRICAS_PATH, default=None, metavar='RUTA',
+                        help=f"Guarda un reporte JSON con tiempos y conteos por archivo (por defecto '{METRICAS_PATH}').")
+    parser.add_argument('--perfil', action='store_true',
+                        help="Agrega al reporte cProfile y tracemalloc del parser (en serie y bastante más lento).")
+    args = parser.parse_args()
+    escribir_csv = args.salida in ('csv', 'ambos')
+    escribir_largo = args.salida in ('parquet', 'ambos')
+    medir = args.metricas is not None or args.perfil
+    if args.perfil:
+        args.metricas = args.metricas or METRICAS_PATH
+        if args.workers != 1:
+            print("--perfil: se procesa en serie para que el perfil cubra el parser.")
+            args.workers = 1
+
+    # Analizadores y materiales de Configuracion.py (sin archivo: el AU480 de siempre)
+    lab = Configuracion.cargar()
+    for analizador in lab.analizadores:
+        if not os.path.isdir(analizador.carpeta):
+            print(f"ERROR: La ruta '{analizador.carpeta}' no existe o no es una carpeta válida.", file=sys.stderr)
+            sys.exit(1)
+
+    # En modo incremental se conservan las entradas previas (incluso de archivos ya retirados
+    # de la carpeta) para que sus nombres de salida queden reservados
+    manifest_previo = cargar_manifest()  # También sin --incremental: indica los CSVs de exports retirados
+    manifest = dict(manifest_previo) if args.incremental else {}
+    # Tandas pendientes de escribir: registros largos por material y (filename, fecha, DataFrame o None)
+    # para KPI.actualizar_archivos. Se vacían cada ARCHIVOS_POR_TANDA archivos
+    registros_largos = {material: [] for material in lab.materiales()}
+    kpi_archivos = []
+    metricas_archivos = []  # Con --metricas, un dict por archivo leído
+    inicio_corrida = time.perf_counter()
+    if args.perfil:
+        tracemalloc.start()
+        perfil = cProfile.Profile()
+        perfil.enable()
+
+    def vaciar_tandas(final=False):
+        for material, registros in registros_largos.items():
+            if registros and (final or len(registros) >= ARCHIVOS_POR_TANDA):
+                escribir_parquet(registros, material.parquet)
+                registros.clear()
+        if ACTUALIZAR_KPI and kpi_archivos and (final or len(kpi_archivos) >= ARCHIVOS_POR_TANDA):
+            KPI.actualizar_archivos(kpi_archivos)
+            kpi_archivos.clear()
+
+    def guardar(material, listos):
+        """7) y 8) Guarda los resultados de material que ya tienen nombre de salida"""
+        for (filename, df_res, fecha, entrada, metricas), nuevo_nombre in listos:
+            if escribir_csv:
+                output_path = os.path.join(material.salida, nuevo_nombre)
+                try:
+                    inicio = time.perf_counter()
+                    df_res.to_csv(output_path, index=False, encoding='utf-8')
+                    _sumar_ms(metricas, 'csv_ms', inicio)
+                    print(f"Se generó '{output_path if material.prefijo else nuevo_nombre}'.")
+                except Exception as e:
+                    print(f"ERROR al guardar '{nuevo_nombre}': {e}", file=sys.stderr)
+                    continue
+            if escribir_largo:
+                try:
+                    registros_largos[material].append(a_registros_largos(df_res, fecha, filename))
+                except (TypeError, ValueError):
+                    # Sin fecha válida Registro.py tampoco podría ubicar los valores
+                    print(f"ATENCIÓN: '{filename}' no tiene fecha válida; se omite en el dataset Parquet.",
+                          file=sys.stderr)
+            manifest[material.clave(filename)] = {**entrada, 'salida': nuevo_nombre}
+            # El cubo de KPIs es el del material de siempre
+            if not material.prefijo:
+                kpi_archivos.append((filename, fecha, df_res))
+        vaciar_tandas()
+
+    for analizador in lab.analizadores:
+        materiales = analizador.materiales
+
+        # Orden alfabético para que el nombrado sea el mismo en cada corrida y con cualquier número de procesos
+        # (los .txt sueltos y los de cada comprimido, 'comprimido::miembro')
+        filenames = listar_exports(analizador.carpeta)
+
+        # Un archivo se vuelve a leer si cambió para alguno de sus materiales; se leen todos a la vez
+        anteriores = [{} for _ in materiales]  # por material: filename -> entrada previa de los que se reprocesan
+        pendientes = []
+        for filename in filenames:
+            file_path = os.path.join(analizador.carpeta, filename)
+            if all(archivo_sin_cambios(manifest.get(m.clave(filename)), file_path, escribir_csv, m.salida)
+                   for m in materiales):
+                continue
+            for material, previas in zip(materiales, anteriores):
+                if material.clave(filename) in manifest:
+                    previas[filename] = manifest.pop(material.clave(filename))
+            pendientes.append(filename)
+        if args.incremental:
+            print(f"Incremental ({analizador.nombre}): {len(pendientes)} archivo(s) nuevo(s) o modificado(s) "
+                  f"de {len(filenames)}.")
+        if escribir_csv:
+            for material in materiales:
+                os.makedirs(material.salida, exist_ok=True)
+
+        # 6) Un solo pase: cada resultado se guarda en cuanto su nombre de salida queda decidido,
+        # así que en memoria solo quedan las entradas del manifiesto
+        asignadores = [AsignadorNombres(lab.entradas(material, manifest), previas)
+                       for material, previas in zip(materiales, anteriores)]
+        file_paths = [os.path.join(analizador.carpeta, filename) for filename in pendientes]
+        for filename, file_path, (dfs, fecha, error, *medicion) in zip(
+                pendientes, file_paths, iterar_archivos(file_paths, args.workers, analizador, medir)):
+            metricas = None
+            if medir:
+                metricas = {'analizador': analizador.nombre, 'archivo': filename, 'fecha': fecha, 'error': error,
+                            'plantillas': 0 if error else sum(df is not None for df in dfs), **medicion[0]}
+                metricas_archivos.append(metricas)
+            if error is not None:
+                print(f"ERROR al procesar '{filename}': {error}", file=sys.stderr)
+                for material, asignador in zip(materiales, asignadores):
+                    guardar(material, asignador.descartar(filename))
+                continue
+            inicio = time.perf_counter()
+            entrada = entrada_manifest(file_path, fecha, None)  # el hash se calcula una vez por archivo
+            _sumar_ms(metricas, 'manifest_ms', inicio)
+            for material, previas, asignador, df_res in zip(materiales, anteriores, asignadores, dfs):
+                if df_res is None:
+                    # Se registra igual para no volver a leerlo mientras no cambie
+                    manifest[material.clave(filename)] = dict(entrada)
+                    if escribir_largo:
+                        # Si antes tuvo valores, sus filas dejan de contar
+                        registros_largos[material].append(marcador_parquet(filename))
+                    if not material.prefijo and filename in previas:
+                        kpi_archivos.append((filename, fecha, None))
+                    guardar(material, asignador.descartar(filename))
+                else:
+                    guardar(material, asignador.agregar(filename, fecha, file_path,
+                                                        (filename, df_res, fecha, entrada, metricas)))
+
+        for material, previas, asignador in zip(materiales, anteriores, asignadores):
+            guardar(material, asignador.terminar())
+            if escribir_csv:
+                eliminar_salidas_obsoletas(lab.entradas(material, manifest), previas, material.salida)
+                eliminar_salidas_retiradas(lab.entradas(material, manifest_previo), lab.entradas(material, manifest),
+                                           {material.clave(filename) for filename in filenames}, material.salida)
+            if escribir_largo:
+                registros = registros_largos[material]
+                escribir_parquet(registros, material.parquet)
+                registros.clear()
+                retirar_de_parquet(filenames, material.parquet)
+            if ACTUALIZAR_KPI and not material.prefijo:
+                # El cubo también deja de contar los exports que ya no están en la carpeta
+                KPI.actualizar_archivos(kpi_archivos, vigentes=filenames)
+                kpi_archivos.clear()
+
+    vaciar_tandas(final=True)
+    guardar_manifest(manifest)
+
+    if medir:
+        perfil_corrida = capturar_perfil(perfil) if args.perfil else None
+        reporte = reporte_metricas(metricas_archivos, time.perf_counter() - inicio_corrida,
+                                   args.workers or os.cpu_count(), perfil_corrida)
+        escribir_metricas(reporte, args.metricas)
+
 
+if __name__ == '__main__':
+    main()
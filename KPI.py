@@ -0,0 +1,261 @@
+'''
+Cubo de KPIs de control de calidad (SQLite) por analito (ID de code_mapping),
+nivel y mes. Se guardan estadísticos suficientes (n, suma, suma de cuadrados,
+mínimo y máximo), así que media, DE, CV% y sesgo (si hay VALORES_DIANA) de
+cualquier rango de fechas salen de combinar agregados parciales sin volver a leer
+las plantillas:
+  kpi_dia  una fila por export procesado, analito y nivel (se reemplaza si el
+           archivo se reprocesa y se borra si ya no está en la carpeta)
+  kpi_mes  suma de kpi_dia por mes; se recalcula solo para los meses tocados
+Una consulta usa los meses completos de kpi_mes y los días de los bordes de kpi_dia.
+
+Extraccion.py actualiza el cubo con cada archivo procesado (ACTUALIZAR_KPI).
+
+Uso: python KPI.py [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD] [--mensual] [--reconstruir]
+'''
+import argparse
+import calendar
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Archivo del cubo (ajusta según sea necesario)
+KPI_PATH = './kpi_calidad.sqlite'
+
+# Valor diana del inserto de cada control para calcular el sesgo:
+# {(ID, nivel): valor}, p. ej. {(1, 1): 95.0} - MODIFICA SEGÚN el lote en uso.
+# Vacío: las consultas no muestran las columnas Diana y Sesgo%
+VALORES_DIANA = {}
+
+_COLUMNAS_NIVEL = {'NIVEL 1': 1, 'NIVEL 2': 2, 'NIVEL 3': 3}
+
+
+def abrir_kpi(path=KPI_PATH):
+    """Abre (o crea) el cubo y devuelve la conexión."""
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS analitos (
+            id     INTEGER PRIMARY KEY,
+            nombre TEXT    NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS kpi_dia (
+            archivo TEXT    NOT NULL,
+            id      INTEGER NOT NULL,
+            nivel   INTEGER NOT NULL,
+            fecha   TEXT    NOT NULL,
+            n       INTEGER NOT NULL,
+            suma    REAL    NOT NULL,
+            suma2   REAL    NOT NULL,
+            minimo  REAL    NOT NULL,
+            maximo  REAL    NOT NULL,
+            PRIMARY KEY (archivo, id, nivel)
+        );
+        CREATE INDEX IF NOT EXISTS kpi_dia_fecha ON kpi_dia (fecha);
+        CREATE TABLE IF NOT EXISTS kpi_mes (
+            id     INTEGER NOT NULL,
+            nivel  INTEGER NOT NULL,
+            mes    TEXT    NOT NULL,
+            n      INTEGER NOT NULL,
+            suma   REAL    NOT NULL,
+            suma2  REAL    NOT NULL,
+            minimo REAL    NOT NULL,
+            maximo REAL    NOT NULL,
+            PRIMARY KEY (id, nivel, mes)
+        );
+    """)
+    conn.commit()
+    return conn
+
+
+def _filas_dia(archivos):
+    """Filas de kpi_dia y nombres {ID: analito} para [(filename, fecha, df_res)]; los ceros no cuentan"""
+    frames, nombres_archivo, fechas = [], [], []
+    for filename, fecha, df_res in archivos:
+        try:
+            fecha_iso = datetime.strptime(fecha, '%m_%d_%Y').date().isoformat()
+        except (TypeError, ValueError):
+            continue
+        frames.append(df_res)
+        nombres_archivo.append(filename)
+        fechas.append(fecha_iso)
+    if not frames:
+        return [], {}
+
+    df = pd.concat(frames, ignore_index=True)
+    largos = [len(f) for f in frames]
+    df['_archivo'] = np.repeat(nombres_archivo, largos)
+    df['_fecha'] = np.repeat(fechas, largos)
+    niveles = [c for c in _COLUMNAS_NIVEL if c in df.columns]
+    largo = df.melt(id_vars=['_archivo', '_fecha', 'ID'], value_vars=niveles, var_name='nivel', value_name='valor')
+    largo['valor'] = pd.to_numeric(largo['valor'], errors='coerce')
+    largo = largo[largo['valor'].notna() & (largo['valor'] != 0)]
+
+    valores = largo['valor'].to_numpy(dtype='float64').tolist()
+    filas = list(zip(
+        largo['_archivo'].tolist(), largo['ID'].astype('int64').tolist(),
+        largo['nivel'].map(_COLUMNAS_NIVEL).tolist(), largo['_fecha'].tolist(),
+        [1] * len(valores), valores, [v * v for v in valores], valores, valores,
+    ))
+    analitos = df.drop_duplicates('ID')
+    return filas, dict(zip(analitos['ID'].astype('int64').tolist(), analitos['ANALITO']))
+
+
+def _inicio_mes_siguiente(dia):
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def actualizar_archivos(archivos, path=KPI_PATH, vigentes=None):
+    """Actualiza el cubo con [(filename, fecha 'MM_DD_YYYY' o None, df_res o None), ...] en una transacción.
+
+    Las filas previas de cada archivo se reemplazan (df_res None solo las borra) y
+    kpi_mes se recalcula para los meses afectados antes y después del cambio. Con
+    vigentes (exports que siguen en la carpeta) se borran además las filas de los
+    archivos que ya no están.
+    """
+    if not archivos and vigentes is None:
+        return
+    conn = abrir_kpi(path)
+    try:
+        nombres = [(filename,) for filename, _, _ in archivos]
+        meses = set()
+        for (filename,) in nombres:
+            meses.update(m for (m,) in conn.execute(
+                "SELECT DISTINCT substr(fecha, 1, 7) FROM kpi_dia WHERE archivo = ?", (filename,)))
+        conn.executemany("DELETE FROM kpi_dia WHERE archivo = ?", nombres)
+        if vigentes is not None:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS vigentes (archivo TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM vigentes")
+            conn.executemany("INSERT OR IGNORE INTO vigentes VALUES (?)", [(f,) for f in vigentes])
+            retirados = "FROM kpi_dia WHERE archivo NOT IN (SELECT archivo FROM vigentes)"
+            meses.update(m for (m,) in conn.execute(f"SELECT DISTINCT substr(fecha, 1, 7) {retirados}"))
+            conn.execute(f"DELETE {retirados}")
+
+        filas, analitos = _filas_dia([a for a in archivos if a[2] is not None])
+        conn.executemany("INSERT OR REPLACE INTO analitos (id, nombre) VALUES (?, ?)", analitos.items())
+        conn.executemany("INSERT INTO kpi_dia VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", filas)
+        meses.update(f[3][:7] for f in filas)
+
+        for mes in sorted(meses):
+            inicio = date.fromisoformat(f"{mes}-01")
+            conn.execute("DELETE FROM kpi_mes WHERE mes = ?", (mes,))
+            conn.execute("""
+                INSERT INTO kpi_mes
+                SELECT id, nivel, ?, SUM(n), SUM(suma), SUM(suma2), MIN(minimo), MAX(maximo)
+                FROM kpi_dia WHERE fecha >= ? AND fecha < ?
+                GROUP BY id, nivel
+            """, (mes, inicio.isoformat(), _inicio_mes_siguiente(inicio).isoformat()))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _meses_completos(desde, hasta):
+    """(primer mes completo, último mes completo) dentro de [desde, hasta], como fechas día 1"""
+    primero = desde if desde.day == 1 else _inicio_mes_siguiente(desde)
+    ultimo_dia = calendar.monthrange(hasta.year, hasta.month)[1]
+    ultimo = hasta.replace(day=1) if hasta.day == ultimo_dia else \
+        (hasta.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return primero, ultimo
+
+
+def _partes(desde, hasta):
+    """SQL y parámetros de los agregados parciales que cubren [desde, hasta]"""
+    campos = "id, nivel, n, suma, suma2, minimo, maximo"
+    if desde is None and hasta is None:
+        return f"SELECT {campos}, mes FROM kpi_mes", []
+    desde = desde or date(1900, 1, 1)
+    hasta = hasta or date(2999, 12, 31)
+    primero, ultimo = _meses_completos(desde, hasta)
+    if primero > ultimo:
+        return (f"SELECT {campos}, substr(fecha, 1, 7) AS mes FROM kpi_dia WHERE fecha BETWEEN ? AND ?",
+                [desde.isoformat(), hasta.isoformat()])
+    fin_ultimo = _inicio_mes_siguiente(ultimo)
+    sql = f"""
+        SELECT {campos}, mes FROM kpi_mes WHERE mes BETWEEN ? AND ?
+        UNION ALL
+        SELECT {campos}, substr(fecha, 1, 7) FROM kpi_dia WHERE fecha >= ? AND fecha < ?
+        UNION ALL
+        SELECT {campos}, substr(fecha, 1, 7) FROM kpi_dia WHERE fecha >= ? AND fecha <= ?
+    """
+    return sql, [primero.isoformat()[:7], ultimo.isoformat()[:7],
+                 desde.isoformat(), primero.isoformat(),
+                 fin_ultimo.isoformat(), hasta.isoformat()]
+
+
+def _indicadores(df):
+    """Media, DE, CV% y sesgo (solo con VALORES_DIANA) a partir de los estadísticos suficientes"""
+    n = df['n'].astype('float64')
+    media = df['suma'] / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = np.where(n > 1, (df['suma2'] - df['suma'] ** 2 / n) / (n - 1), np.nan)
+    de = np.sqrt(np.clip(var, 0, None))
+    df = df.assign(Media=media.round(4), DE=np.round(de, 4), CV=np.round(de / media * 100, 2))
+    if not VALORES_DIANA:
+        return df
+    diana = pd.Series([VALORES_DIANA.get((int(i), int(v)), np.nan) for i, v in zip(df['id'], df['nivel'])],
+                      index=df.index, dtype='float64')
+    return df.assign(Diana=diana, Sesgo=((media - diana) / diana * 100).round(2))
+
+
+def consultar(conn, desde=None, hasta=None, mensual=False):
+    """KPIs por analito y nivel (y mes si mensual) para [desde, hasta]; None = sin límite"""
+    sql, parametros = _partes(desde, hasta)
+    por = 'id, nivel, mes' if mensual else 'id, nivel'
+    df = pd.read_sql_query(f"""
+        SELECT {por}, SUM(n) AS n, SUM(suma) AS suma, SUM(suma2) AS suma2,
+               MIN(minimo) AS minimo, MAX(maximo) AS maximo
+        FROM ({sql}) GROUP BY {por} ORDER BY {por}
+    """, conn, params=parametros)
+    nombres = dict(conn.execute("SELECT id, nombre FROM analitos"))
+    df = _indicadores(df)
+    df.insert(1, 'Analito', df['id'].map(nombres))
+    return df.rename(columns={'id': 'ID', 'nivel': 'Nivel', 'mes': 'Mes', 'minimo': 'Min',
+                              'maximo': 'Max', 'CV': 'CV%', 'Sesgo': 'Sesgo%'}).drop(columns=['suma', 'suma2'])
+
+
+def reconstruir(path=KPI_PATH):
+    """Vuelve a cargar el cubo desde las plantillas registradas en el manifiesto de Extraccion.py"""
+    import Extraccion
+
+    if os.path.exists(path):
+        os.remove(path)
+    # Los exports borrados de la carpeta siguen en el manifiesto, pero ya no cuentan
+    vigentes = set(Extraccion.listar_exports(Extraccion.folder_path)) if os.path.isdir(Extraccion.folder_path) else None
+    archivos = []
+    for filename, entrada in sorted(Extraccion.cargar_manifest().items()):
+        if '/' in Extraccion.separar_miembro(filename)[0]:
+            continue  # Otro material de Configuracion.py (clave 'analizador/material/archivo')
+        if vigentes is not None and filename not in vigentes:
+            continue
+        ruta = os.path.join(Extraccion.output_folder, entrada['salida'] or '')
+        if entrada['salida'] and entrada['fecha'] and os.path.exists(ruta):
+            archivos.append((filename, entrada['fecha'], pd.read_csv(ruta, encoding='utf-8')))
+    actualizar_archivos(archivos, path)
+    print(f"Cubo reconstruido con {len(archivos)} plantilla(s) en '{path}'.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta los KPIs de control de calidad por analito y nivel.")
+    parser.add_argument('--desde', type=date.fromisoformat, default=None)
+    parser.add_argument('--hasta', type=date.fromisoformat, default=None)
+    parser.add_argument('--mensual', action='store_true', help="Un renglón por mes.")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Recarga el cubo desde las plantillas del manifiesto antes de consultar.")
+    args = parser.parse_args()
+
+    if args.reconstruir:
+        reconstruir()
+    conn = abrir_kpi()
+    try:
+        df = consultar(conn, args.desde, args.hasta, args.mensual)
+    finally:
+        conn.close()
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(df.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+'''
+Modo continuo: vigila la carpeta de exports del AU480 y sube cada archivo nuevo
+en cuanto termina de escribirse, con una sesión de subida que queda abierta
+(navegador con la sesión iniciada) entre un archivo y el siguiente.
+
+  Datos_txt (watchdog/inotify o sondeo) -> procesar_archivo_txt -> cola -> sesión de subida
+
+Cada archivo se registra en el manifiesto de Extraccion.py con el mismo nombrado
+de plantillas, así que este modo y los scripts por lotes pueden alternarse (no
+correrlos a la vez: comparten el manifiesto). Los registros que no se pudieron
+subir quedan en la plantilla: una corrida de Registro.py los completa.
+Solo se vigila la carpeta del AU480; los demás analizadores de Configuracion.py
+se procesan con Extraccion.py y Registro.py.
+
+Uso: python Pipeline.py [--motor selenium|http] [--sondeo] [--una-vez]
+'''
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+import pandas as pd
+import Extraccion
+import KPI
+import Registro
+import Trazas
+import Westgard
+from Bitacora import BITACORA_PATH, abrir_bitacora, filtrar_pendientes
+
+# ----------------------------------------
+# CONFIGURACIÓN - MODIFICA SEGÚN NECESITES
+# ----------------------------------------
+CARPETA_VIGILADA = Extraccion.folder_path
+# Segundos entre revisiones de la carpeta cuando no hay watchdog
+INTERVALO_SONDEO = 2.0
+# Un archivo se procesa cuando su tamaño y fecha de modificación no cambian durante este lapso
+ESPERA_ESTABLE = 1.0
+# Generar también la plantilla CSV en Extraccion.output_folder
+ESCRIBIR_PLANTILLAS = True
+
+
+def iniciar_vigilancia(carpeta, aviso):
+    """Activa aviso (threading.Event) ante cualquier cambio en carpeta.
+
+    Usa watchdog (inotify en Linux) si está instalado; si no, devuelve None y el
+    llamador revisa la carpeta por sondeo.
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        print("ℹ️ watchdog no está instalado (pip install watchdog): se revisa la carpeta por sondeo")
+        return None
+
+    class Manejador(FileSystemEventHandler):
+        def on_any_event(self, event):
+            aviso.set()
+
+    observador = Observer()
+    observador.schedule(Manejador(), carpeta, recursive=False)
+    observador.start()
+    return observador
+
+
+class DetectorArchivos:
+    """Exports .txt nuevos o modificados según el manifiesto que ya terminaron de escribirse"""
+
+    def __init__(self, carpeta, manifest, verificar_csv=True):
+        self.carpeta = carpeta
+        self.manifest = manifest
+        self.verificar_csv = verificar_csv
+        self.vistos = {}    # filename -> (firma, instante desde el que no cambia)
+        self.fallidos = {}  # filename -> firma con la que falló el procesamiento
+
+    def listos(self, ahora):
+        """Devuelve (archivos listos en orden alfabético, si quedan archivos todavía escribiéndose)"""
+        listos, en_espera = [], False
+        with os.scandir(self.carpeta) as entradas:
+            for entrada in entradas:
+                if not entrada.name.lower().endswith('.txt') or not entrada.is_file():
+                    continue
+                stat = entrada.stat()
+                firma = (stat.st_size, stat.st_mtime)
+                if self.fallidos.get(entrada.name) == firma or \
+                        Extraccion.archivo_sin_cambios(self.manifest.get(entrada.name), entrada.path,
+                                                       verificar_csv=self.verificar_csv):
+                    self.vistos.pop(entrada.name, None)
+                    continue
+                previa = self.vistos.get(entrada.name)
+                if previa is None or previa[0] != firma:
+                    self.vistos[entrada.name] = (firma, ahora)
+                    en_espera = True
+                elif ahora - previa[1] >= ESPERA_ESTABLE:
+                    listos.append(entrada.name)
+                    del self.vistos[entrada.name]
+                else:
+                    en_espera = True
+        return sorted(listos), en_espera
+
+
+def extraer_registros(filename, manifest):
+    """Procesa un export, lo registra en el manifiesto y devuelve sus registros a subir (o None)"""
+    file_path = os.path.join(CARPETA_VIGILADA, filename)
+    df_res, fecha = Extraccion.procesar_archivo_txt(file_path)
+
+    previa = manifest.pop(filename, None)
+    anteriores = {filename: previa} if previa else {}
+    if df_res is None:
+        # Se registra igual para no volver a leerlo mientras no cambie
+        manifest[filename] = Extraccion.entrada_manifest(file_path, fecha, None)
+        Extraccion.guardar_manifest(manifest)
+        if previa and Extraccion.ACTUALIZAR_KPI:
+            KPI.actualizar_archivos([(filename, fecha, None)])
+        return None
+
+    # Los nombres y las salidas vigentes se comparan solo con el material del AU480 (sin prefijo)
+    lab = Registro.laboratorio()
+    legado = lab.por_prefijo[''][1]
+    nombre = Extraccion.asignar_nombres(lab.entradas(legado, manifest), anteriores,
+                                        [(filename, df_res, fecha, file_path)])[0]
+    if ESCRIBIR_PLANTILLAS:
+        df_res.to_csv(os.path.join(Extraccion.output_folder, nombre), index=False, encoding='utf-8')
+        print(f"Se generó '{nombre}'.")
+    manifest[filename] = Extraccion.entrada_manifest(file_path, fecha, nombre)
+    if ESCRIBIR_PLANTILLAS:
+        Extraccion.eliminar_salidas_obsoletas(lab.entradas(legado, manifest), anteriores)
+    Extraccion.guardar_manifest(manifest)
+    if Extraccion.ACTUALIZAR_KPI:
+        KPI.actualizar_archivos([(filename, fecha, df_res)])
+
+    if not fecha:
+        print(f"ATENCIÓN: '{filename}' no tiene fecha; no se puede subir.", file=sys.stderr)
+        return None
+    largo = Extraccion.a_registros_largos(df_res, fecha, filename)
+    analitos = lab.analitos
+    if analitos is not None:
+        largo = largo[largo['Analito'].isin(analitos)]
+    records_df = pd.DataFrame({
+        'Fecha':   largo['Fecha'].to_numpy(),
+        'Nivel':   largo['Nivel'].astype('int64').to_numpy(),
+        'Analito': largo['Analito'].to_numpy(),
+        'Valor':   largo['Valor'].to_numpy(),
+    })
+    records_df.sort_values(['Nivel', 'Analito', 'Fecha'], ascending=[True, True, False], inplace=True)
+    return Registro.asignar_destinos(records_df)
+
+
+class TrabajadorSubida(threading.Thread):
+    """Sube los registros que llegan por la cola con una sesión que queda abierta.
+
+    Cada tarea es (filename, records_df, mtime del export); None termina el hilo.
+    Si la sesión expira o el navegador se cae, Registro.SupervisorSesion la
+    restablece (hasta MAX_RECUPERACIONES veces por archivo) y se sigue desde el
+    registro que falló; si aun así falla, los
+    registros del archivo se marcan fallidos y el próximo archivo abre un
+    navegador nuevo. Con el motor 'http' el cliente (y su login) se crea con el
+    primer archivo y sirve para todos los siguientes.
+    """
+
+    def __init__(self, cola, motor='selenium', anticipado=True):
+        super().__init__(name='subida', daemon=True)
+        self.cola = cola
+        self.motor = motor
+        self.anticipado = anticipado
+        self.supervisor = Registro.SupervisorSesion()
+        self.cliente_http = None
+        self.resumen = Registro.ResumenSubida()
+
+    def preparar(self):
+        """Abre el navegador e inicia sesión, si no hay uno abierto"""
+        if self.motor != 'selenium' or self.supervisor.driver is not None:
+            return
+        self.supervisor.abrir()
+
+    def cerrar_navegador(self):
+        self.supervisor.cerrar()
+
+    def subir(self, records_df, bitacora):
+        if self.motor == 'http':
+            if self.cliente_http is None:
+                import SubidaHTTP
+                self.cliente_http = SubidaHTTP.ClienteHTTP(Registro.API_URL, Registro.USUARIO, Registro.CLAVE)
+            return Registro.ejecutar_subida_http(records_df, self.cliente_http, bitacora)
+        resumen = Registro.ResumenSubida()
+        supervisor = self.supervisor
+        try:
+            self.preparar()
+            # Al terminar cada nivel el árbol queda como al inicio para el próximo archivo
+            Registro.subir_destinos(supervisor, records_df, resumen, bitacora)
+        except Exception as e:
+            print(f"❌ Error de sesión: {type(e).__name__} - {e}")
+            resumen.fallar_pendientes(records_df, f"sesión: {type(e).__name__}")
+            self.cerrar_navegador()
+        return resumen
+
+    def run(self):
+        bitacora = abrir_bitacora(BITACORA_PATH) if Registro.USAR_BITACORA else None
+        try:
+            if self.anticipado:
+                # Login antes del primer archivo: la primera subida no espera al navegador
+                try:
+                    self.preparar()
+                except Exception as e:
+                    print(f"⚠️ No se pudo abrir la sesión por adelantado: {type(e).__name__} - {e}")
+                    self.cerrar_navegador()
+
+            while True:
+                tarea = self.cola.get()
+                if tarea is None:
+                    break
+                filename, records_df, escrito = tarea
+                if bitacora is not None:
+                    records_df = filtrar_pendientes(bitacora, records_df)
+                if records_df.empty:
+                    print(f"✅ '{filename}': nada pendiente")
+                    continue
+
+                with Trazas.span('pipeline.subida', archivo=filename, registros=len(records_df)) as traza:
+                    resumen = self.subir(records_df, bitacora)
+                    traza['ok'] = not resumen.fallidos
+                latencia = time.time() - escrito
+                print(f"📤 '{filename}': {resumen.procesados} guardados, {len(resumen.fallidos)} fallidos; "
+                      f"{latencia:.1f} s desde que se escribió el archivo")
+                self.resumen = Registro.ResumenSubida.combinar([self.resumen, resumen])
+        finally:
+            self.cerrar_navegador()
+            if self.cliente_http is not None:
+                self.cliente_http.cerrar()
+            self.resumen.comandos.update(self.supervisor.comandos)
+            self.resumen.localizadores.update(self.supervisor.localizadores)
+            self.resumen.recuperaciones.update(self.supervisor.recuperaciones)
+            if bitacora is not None:
+                bitacora.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vigila la carpeta de exports y sube cada archivo nuevo.")
+    parser.add_argument('--motor', choices=['selenium', 'http'], default=Registro.MOTOR_SUBIDA,
+                        help="Formulario en el navegador o llamadas directas al backend.")
+    parser.add_argument('--sondeo', action='store_true',
+                        help="Revisar la carpeta cada INTERVALO_SONDEO segundos aunque haya watchdog.")
+    parser.add_argument('--una-vez', action='store_true',
+                        help="Procesar lo pendiente y terminar, sin quedar vigilando.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(CARPETA_VIGILADA):
+        print(f"ERROR: La ruta '{CARPETA_VIGILADA}' no existe o no es una carpeta válida.", file=sys.stderr)
+        sys.exit(1)
+    if ESCRIBIR_PLANTILLAS:
+        os.makedirs(Extraccion.output_folder, exist_ok=True)
+    if Registro.REGISTRAR_TRAZAS:
+        Trazas.iniciar(Trazas.TRAZAS_PATH)
+
+    if Registro.EVALUAR_WESTGARD and not Westgard.cargar_estado():
+        # El estado parte del historial completo: si no, cada serie empezaría con el primer archivo vigilado
+        historial = Westgard.historial_completo()
+        if not historial.empty:
+            print("🚦 Westgard sin estado guardado: se evalúa primero el historial de plantillas")
+            Westgard.revisar(historial)
+
+    manifest = Extraccion.cargar_manifest()
+    detector = DetectorArchivos(CARPETA_VIGILADA, manifest, verificar_csv=ESCRIBIR_PLANTILLAS)
+    cola = queue.Queue()
+    trabajador = TrabajadorSubida(cola, args.motor, anticipado=not args.una_vez)
+    trabajador.start()
+
+    aviso = threading.Event()
+    observador = None if (args.sondeo or args.una_vez) else iniciar_vigilancia(CARPETA_VIGILADA, aviso)
+    # Con watchdog igual se revisa cada tanto, por si se pierde algún evento
+    intervalo = INTERVALO_SONDEO if observador is None else 60
+    if not args.una_vez:
+        print(f"👀 Vigilando '{CARPETA_VIGILADA}' ({'watchdog' if observador else 'sondeo'}). Ctrl+C para terminar.")
+
+    try:
+        while True:
+            listos, en_espera = detector.listos(time.monotonic())
+            for filename in listos:
+                file_path = os.path.join(CARPETA_VIGILADA, filename)
+                try:
+                    escrito = os.path.getmtime(file_path)
+                    with Trazas.span('pipeline.extraccion', archivo=filename):
+                        records_df = extraer_registros(filename, manifest)
+                except Exception as e:
+                    print(f"ERROR al procesar '{filename}': {e}", file=sys.stderr)
+                    if os.path.exists(file_path):
+                        stat = os.stat(file_path)
+                        detector.fallidos[filename] = (stat.st_size, stat.st_mtime)
+                    continue
+                if records_df is not None and not records_df.empty:
+                    if Registro.EVALUAR_WESTGARD:
+                        Westgard.revisar(records_df.assign(Analito=Registro.clave_bitacora(records_df)))
+                    cola.put((filename, records_df, escrito))
+
+            if args.una_vez and not en_espera:
+                break
+            aviso.wait(ESPERA_ESTABLE if en_espera else intervalo)
+            aviso.clear()
+    except KeyboardInterrupt:
+        print("\n⏹️ Deteniendo: se terminan de subir los archivos en cola...")
+    finally:
+        if observador is not None:
+            observador.stop()
+            observador.join()
+        cola.put(None)
+        trabajador.join()
+        Registro.imprimir_resumen_final(trabajador.resumen)
+        if Registro.REGISTRAR_TRAZAS:
+            Trazas.imprimir_resumen(Trazas.spans_corrida())
+        Trazas.finalizar()
+
+
+if __name__ == '__main__':
+    main()
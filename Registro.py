@@ -2,17 +2,52 @@
 ==================================================IMAGEN=====================================================================.
 '''
 
+import argparse
+import io
 import os
 import sys
-import time
+import threading
 import re
+import numpy as np
 import pandas as pd
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException
+import Configuracion
+import Trazas
+import Westgard
+from Bitacora import BITACORA_PATH, abrir_bitacora, filtrar_pendientes, registrar_subida, registrar_subidas
+
+# Selenium se importa recién al abrir el navegador (_importar_selenium): el modo
+# --plan y los módulos que solo usan los cargadores no pagan ese costo
+webdriver = By = WebDriverWait = EC = None
+TimeoutException = ElementClickInterceptedException = ElementNotInteractableException = None
+StaleElementReferenceException = None
+_lock_selenium = threading.Lock()
+
+
+def _importar_selenium():
+    """Importa Selenium y publica sus nombres en este módulo (solo la primera vez).
+
+    Las sesiones paralelas abren sus navegadores a la vez: el lock hace que ninguna
+    vea webdriver publicado antes que By, EC y las excepciones.
+    """
+    global webdriver, By, WebDriverWait, EC
+    global TimeoutException, ElementClickInterceptedException, ElementNotInteractableException
+    global StaleElementReferenceException
+    with _lock_selenium:
+        if webdriver is not None:
+            return
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import (
+            TimeoutException, ElementClickInterceptedException, ElementNotInteractableException,
+            StaleElementReferenceException
+        )
+        from selenium import webdriver  # Al final: marca que ya está todo publicado
+
+
 # ----------------------------------------
 # CONFIGURACIÓN DE ANALITOS A PROCESAR
 # ----------------------------------------
@@ -60,77 +95,465 @@ ANALITO_MAPPING = {
 
 csv_folder = './Plantillas/'  # Ajusta según corresponda
 
-if not os.path.isdir(csv_folder):
-    print(f"ERROR: La ruta '{csv_folder}' no existe o no es una carpeta válida.", file=sys.stderr)
-    sys.exit(1)
+# Origen de los datos: 'csv' (plantillas en csv_folder) o 'parquet' (dataset de Extraccion.py --salida parquet)
+ORIGEN_DATOS = 'csv'
+parquet_path = './Plantillas_parquet/'
+
+# Ventana de fechas a cargar (None = sin límite), p. ej. date(2025, 1, 1)
+FECHA_DESDE = None
+FECHA_HASTA = None
+
+# Bitácora de resultados ya guardados en el portal; False para volver a subir todo
+USAR_BITACORA = True
+
+# Portal y credenciales (se pueden definir por variables de entorno)
+PORTAL_URL = os.environ.get('CCLAB_URL', "https://app.cclabcontrol.com")
+USUARIO = os.environ.get('CCLAB_USUARIO', "example.gmail.com")
+CLAVE = os.environ.get('CCLAB_CLAVE', "PASSWORD")
+
+# Motor de carga: 'selenium' (formulario en el navegador) o 'http' (backend directo, ver SubidaHTTP.py)
+MOTOR_SUBIDA = 'selenium'
+# Con el motor 'http', reintentar con Selenium los registros que fallen
+RESPALDO_SELENIUM = True
+API_URL = os.environ.get('CCLAB_API_URL', PORTAL_URL)
+
+# Sesiones de navegador en paralelo y cómo repartir el trabajo entre ellas:
+# 'nivel' (una sesión por nivel Multiqual) o 'analito' (grupos de analitos balanceados)
+NUM_SESIONES = 1
+PARTICION = 'nivel'
+
+# Perfiles de arranque de Chrome:
+#   headless          sin ventana (servidores compartidos)
+#   bloquear_recursos sin imágenes, fuentes ni analítica (URLS_BLOQUEADAS)
+#   perfil_usuario    carpeta de datos reutilizada entre corridas: las cookies de login
+#                     sobreviven y, si la sesión sigue válida, se omite el login
+#   carga_pagina      page load strategy de WebDriver: 'normal', 'eager' o 'none'
+PERFILES_NAVEGADOR = {
+    'completo': {'headless': False, 'bloquear_recursos': False, 'perfil_usuario': None,
+                 'carga_pagina': 'normal', 'argumentos': []},
+    'headless': {'headless': True,  'bloquear_recursos': False, 'perfil_usuario': None,
+                 'carga_pagina': 'normal', 'argumentos': []},
+    'ligero':   {'headless': True,  'bloquear_recursos': True,  'perfil_usuario': './perfil_chrome',
+                 'carga_pagina': 'eager',
+                 'argumentos': ['--disable-extensions', '--disable-gpu', '--disable-dev-shm-usage',
+                                '--no-first-run', '--mute-audio']},
+}
+PERFIL_NAVEGADOR = 'completo'  # MODIFICA SEGÚN el equipo donde corre
+
+URLS_BLOQUEADAS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*google-analytics.com*', '*googletagmanager.com*', '*hotjar.com*', '*doubleclick.net*',
+]
+
+# Entrada de resultados en el formulario:
+#   'lote'     cada analito se abre una vez y sus fechas se cargan seguidas, reutilizando
+#              los elementos ya localizados (menos idas y vueltas con WebDriver). Si un
+#              registro falla, se reintenta por la vía 'registro'
+#   'registro' cada resultado vuelve a localizar todos los elementos del formulario
+MODO_ENTRADA = 'lote'
+
+# Si la sesión del portal expira o el navegador se cae a mitad de la carga, se inicia
+# sesión de nuevo (o se abre otro navegador) y se sigue desde el registro que falló.
+# Tope de recuperaciones por carga (cada partición, o cada archivo en Pipeline.py); 0 = desactivado
+MAX_RECUPERACIONES = 5
+
+# Archivo con el detalle de los registros que no se pudieron subir
+FALLIDOS_PATH = './fallidos_registro.csv'
+
+# Evaluar las reglas de Westgard (Westgard.py) sobre el historial antes de subir
+EVALUAR_WESTGARD = True
+
+# Segundos por paso para estimar la duración en --plan cuando no hay trazas previas
+DURACION_ESTIMADA = {'arranque': 20, 'nivel': 3, 'analito': 2, 'registro': 4, 'registro_http': 0.05}
+
+# Trazas de latencia por paso (JSON lines en Trazas.TRAZAS_PATH) y resumen al final
+REGISTRAR_TRAZAS = True
 
 # Patrón para extraer fecha (MM_DD_YYYY) de los nombres de archivo
 fname_pattern = re.compile(r'(\d{2})_(\d{2})_(\d{4})(?:_(\d{4}))?\.csv')
-all_records = []
-
-for fname in os.listdir(csv_folder):
-    if not fname.lower().endswith('.csv'):
-        continue
-    m = fname_pattern.match(fname)
-    if not m:
-        continue
-    mm, dd, yyyy, time_part = m.groups()
-    dt = date(int(yyyy), int(mm), int(dd))
-    df = pd.read_csv(os.path.join(csv_folder, fname), encoding='utf-8')
-    for _, row in df.iterrows():
-        analito = row['ANALITO']
-        for n in (1, 2, 3):
-            valor = row.get(f'NIVEL {n}', 0)
-            try:
-                valor = float(valor)
-            except:
-                continue
-            if valor == 0:
-                continue
-            all_records.append((dt, n, analito, valor))
 
-records_df = pd.DataFrame(all_records, columns=['Fecha', 'Nivel', 'Analito', 'Valor'])
-# Filtrar solo los analitos que queremos procesar
-records_df = records_df[records_df['Analito'].isin(TARGET_ANALITOS)]
 
-# Ordenar por Nivel ascendente, luego Analito y luego Fecha descendente
-records_df.sort_values(['Nivel', 'Analito', 'Fecha'], ascending=[True, True, False], inplace=True)
+def cargar_registros_parquet(path, desde=None, hasta=None, analitos=None):
+    """Lee el dataset Parquet largo en una sola lectura columnar.
+
+    Los filtros de fecha y analito se aplican en la lectura (particiones por año
+    y estadísticas de cada fragmento). Si un archivo fuente se reprocesó, se
+    conservan solo sus registros del lote más reciente, buscado en todo el dataset
+    antes de filtrar: si ese lote cae fuera del filtro o es un marcador (sin
+    valores o retirado, ver Extraccion.escribir_parquet), el archivo no aporta filas.
+    """
+    filtros = []
+    if desde is not None:
+        filtros += [('anio', '>=', desde.year), ('Fecha', '>=', desde)]
+    if hasta is not None:
+        filtros += [('anio', '<=', hasta.year), ('Fecha', '<=', hasta)]
+    if analitos is not None:
+        filtros.append(('Analito', 'in', list(analitos)))
+
+    ultimos = pd.read_parquet(path, engine='pyarrow', columns=['Archivo', 'Lote']).groupby('Archivo')['Lote'].max()
+    df = pd.read_parquet(
+        path, engine='pyarrow',
+        columns=['Fecha', 'Nivel', 'Analito', 'Valor', 'Archivo', 'Lote'],
+        filters=filtros or None,
+    )
+    df = df[(df['Lote'].to_numpy() == df['Archivo'].map(ultimos).to_numpy()) & df['Fecha'].notna().to_numpy()]
+    df = df.astype({'Nivel': 'int64', 'Valor': 'float64'})
+    return df[['Fecha', 'Nivel', 'Analito', 'Valor']].reset_index(drop=True)
+
+
+def _leer_plantillas(rutas):
+    """Lee varias plantillas con un solo pd.read_csv por encabezado.
+
+    Los cuerpos de los archivos con el mismo encabezado se concatenan en memoria,
+    evitando construir un DataFrame por archivo. La columna '_archivo' indica la
+    posición de cada fila en `rutas`.
+    """
+    grupos = {}  # encabezado -> (cuerpos, índices de archivo, filas por archivo)
+    for i, ruta in enumerate(rutas):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            encabezado = f.readline()
+            cuerpo = f.read()
+        if cuerpo and not cuerpo.endswith('\n'):
+            cuerpo += '\n'
+        cuerpos, indices, filas = grupos.setdefault(encabezado.rstrip('\n'), ([], [], []))
+        cuerpos.append(cuerpo)
+        indices.append(i)
+        filas.append(cuerpo.count('\n'))
+
+    leer = {'ANALITO', 'NIVEL 1', 'NIVEL 2', 'NIVEL 3'}
+    frames = []
+    for encabezado, (cuerpos, indices, filas) in grupos.items():
+        df = pd.read_csv(io.StringIO(encabezado + '\n' + ''.join(cuerpos)), usecols=lambda c: c in leer)
+        if len(df) == sum(filas):
+            df['_archivo'] = np.repeat(indices, filas)
+        else:
+            # Líneas en blanco u otras rarezas: leer ese grupo archivo por archivo
+            df = pd.concat(
+                [pd.read_csv(rutas[i], encoding='utf-8', usecols=lambda c: c in leer).assign(_archivo=i)
+                 for i in indices],
+                ignore_index=True,
+            )
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def cargar_registros_csv(folder, desde=None, hasta=None, analitos=None):
+    """Carga las plantillas CSV de folder como registros largos (Fecha, Nivel, Analito, Valor).
+
+    La fecha se toma del nombre del archivo, y los archivos fuera de [desde, hasta]
+    no se leen. Los valores se convierten con pd.to_numeric; los nulos, los no
+    numéricos, los ceros y los analitos fuera de `analitos` se descartan.
+    """
+    fechas, rutas = [], []
+    for fname in sorted(os.listdir(folder)):
+        m = fname_pattern.match(fname)
+        if not m:
+            continue
+        mm, dd, yyyy, _ = m.groups()
+        dt = date(int(yyyy), int(mm), int(dd))
+        if (desde is not None and dt < desde) or (hasta is not None and dt > hasta):
+            continue
+        fechas.append(dt)
+        rutas.append(os.path.join(folder, fname))
+
+    columnas = ['Fecha', 'Nivel', 'Analito', 'Valor']
+    if not rutas:
+        # Vacío pero con los tipos de siempre, para que las operaciones de columnas sigan valiendo
+        return pd.DataFrame({'Fecha': pd.Series(dtype=object), 'Nivel': pd.Series(dtype='int64'),
+                             'Analito': pd.Series(dtype=str), 'Valor': pd.Series(dtype='float64')})
+
+    df = _leer_plantillas(rutas)
+    df['Fecha'] = np.array(fechas, dtype=object)[df['_archivo'].to_numpy()]
+
+    niveles = [c for c in ('NIVEL 1', 'NIVEL 2', 'NIVEL 3') if c in df.columns]
+    largo = df.melt(id_vars=['Fecha', 'ANALITO'], value_vars=niveles, var_name='Nivel', value_name='Valor')
+    largo['Valor'] = pd.to_numeric(largo['Valor'], errors='coerce')
+
+    mascara = largo['Valor'].notna() & (largo['Valor'] != 0)
+    if analitos is not None:
+        mascara &= largo['ANALITO'].isin(analitos)
+    largo = largo[mascara]
+
+    return pd.DataFrame({
+        'Fecha':   largo['Fecha'].to_numpy(),
+        'Nivel':   largo['Nivel'].str[-1].astype('int64').to_numpy(),
+        'Analito': largo['ANALITO'].to_numpy(),
+        'Valor':   largo['Valor'].to_numpy(),
+    }, columns=columnas)
+
+
+def cargar_registros(analitos=TARGET_ANALITOS):
+    """Carga los registros a subir según ORIGEN_DATOS, ordenados por Nivel, Analito y Fecha descendente.
+
+    Se leen las plantillas de todos los materiales de Configuracion.py (el de siempre
+    desde csv_folder / parquet_path) y cada registro queda con su destino en el portal
+    (asignar_destinos). analitos=None carga todos los analitos presentes en los datos.
+    """
+    partes = []
+    for material in laboratorio().materiales():
+        carpeta_csv, carpeta_parquet = (material.salida, material.parquet) if material.prefijo \
+            else (csv_folder, parquet_path)
+        carpeta = carpeta_parquet if ORIGEN_DATOS == 'parquet' else carpeta_csv
+        if not os.path.isdir(carpeta):
+            print(f"ERROR: La ruta '{carpeta}' no existe o no es una carpeta válida.", file=sys.stderr)
+            sys.exit(1)
+        if ORIGEN_DATOS == 'parquet':
+            parte = cargar_registros_parquet(carpeta, FECHA_DESDE, FECHA_HASTA, analitos)
+        else:
+            parte = cargar_registros_csv(carpeta, FECHA_DESDE, FECHA_HASTA, analitos)
+        partes.append(parte.assign(Fuente=material.prefijo))
+    records_df = asignar_destinos(pd.concat(partes, ignore_index=True))
+
+    # Ordenar por material, Nivel ascendente, luego Analito y luego Fecha descendente
+    records_df.sort_values(['Fuente', 'Nivel', 'Analito', 'Fecha'], ascending=[True, True, True, False],
+                           inplace=True)
+
+    print(f"📊 Analitos encontrados en los datos: {records_df['Analito'].unique().tolist()}")
+    print(f"📊 Total de registros a procesar: {len(records_df)}")
+    return records_df
+
+
+_laboratorio = None
+
+
+def laboratorio():
+    """Configuración de analizadores y materiales (Configuracion.py), compilada una sola vez"""
+    global _laboratorio
+    if _laboratorio is None:
+        _laboratorio = Configuracion.cargar()
+    return _laboratorio
+
+
+def asignar_destinos(records_df):
+    """Agrega las columnas Fuente, Analizador, Nodo y Lote que faltan en records_df.
+
+    Fuente es el prefijo del material en Configuracion.py ('' = el de siempre); el
+    nodo de cada nivel sale del lote vigente en la fecha del registro. Los registros
+    de fechas sin lote configurado se descartan con un aviso.
+    """
+    if {'Fuente', 'Analizador', 'Nodo', 'Lote'} <= set(records_df.columns):
+        return records_df
+    if 'Fuente' not in records_df:
+        records_df = records_df.assign(Fuente='')
+    lab = laboratorio()
+    analizadores = {}
+    # El nodo se decide una vez por (fuente, nivel, fecha) y se reparte a las filas
+    claves = ['Fuente', 'Nivel', 'Fecha']
+    combinaciones = records_df[claves].drop_duplicates()
+    nodos = []
+    for fuente, nivel, fecha in combinaciones.itertuples(index=False):
+        destino = lab.por_prefijo.get(fuente)
+        if destino is None:
+            # Registros que no vienen de cargar_registros: los destinos de siempre
+            analizadores[fuente] = NODO_ANALIZADOR
+            nodos.append(NIVEL_NODOS.get(nivel))
+        else:
+            analizadores[fuente] = destino[0].nodo
+            nodos.append(destino[1].nodo(nivel, fecha))
+    por_clave = pd.Series(nodos, index=pd.MultiIndex.from_frame(combinaciones), dtype=object)
+
+    records_df = records_df.assign(
+        Analizador=records_df['Fuente'].map(analizadores),
+        Nodo=por_clave.reindex(pd.MultiIndex.from_frame(records_df[claves])).to_numpy(),
+    )
+    sin_lote = records_df['Nodo'].isna() & records_df['Fuente'].isin(list(lab.por_prefijo))
+    if sin_lote.any():
+        for (fuente, nivel), n in records_df[sin_lote].groupby(['Fuente', 'Nivel']).size().items():
+            print(f"⚠️ {fuente or NODO_ANALIZADOR + '/'}nivel {nivel}: {n} registro(s) sin lote configurado "
+                  f"para su fecha; se omiten")
+        records_df = records_df[~sin_lote]
+    lotes = {nodo: nodo.split(' - ')[0] for nodo in set(nodos) if isinstance(nodo, str)}
+    return records_df.assign(Lote=records_df['Nodo'].map(lotes).astype(object).where(records_df['Nodo'].notna(), None))
+
+
+def clave_bitacora(records_df):
+    """Analito con el prefijo de su material: clave de la bitácora y de las series de Westgard"""
+    if 'Fuente' not in records_df or records_df.empty:
+        return records_df['Analito']
+    return records_df['Fuente'].astype(str) + records_df['Analito'].astype(str)
 
-print(f"📊 Analitos encontrados en los datos: {records_df['Analito'].unique().tolist()}")
-print(f"📊 Total de registros a procesar: {len(records_df)}")
 
 # ----------------------------------------
 # 2) FUNCIONES AUXILIARES
 # ----------------------------------------
 
-def wait_for_no_overlay(driver, timeout=5):
+# Perfiles de tiempo (segundos). Todas las esperas terminan en cuanto la página
+# cumple la condición; el perfil solo fija el tope y la frecuencia de sondeo.
+PERFILES_TIEMPO = {
+    'rapido': {'elemento': 5,  'overlay': 3,  'login': 15, 'guardado': 5,  'sondeo': 0.05},
+    'normal': {'elemento': 10, 'overlay': 5,  'login': 30, 'guardado': 10, 'sondeo': 0.1},
+    'lento':  {'elemento': 20, 'overlay': 15, 'login': 60, 'guardado': 20, 'sondeo': 0.25},
+}
+PERFIL_TIEMPOS = 'normal'  # MODIFICA SEGÚN la velocidad del portal
+TIEMPOS = PERFILES_TIEMPO[PERFIL_TIEMPOS]
+
+# Toasts / snackbars que el portal muestra al guardar
+XPATH_CONFIRMACION = "//*[contains(@class,'p-toast-message') or contains(@class,'mat-snack-bar-container')]"
+
+
+def _aviso_nuevo(previos):
+    """Condición: hay un aviso visible que no estaba antes de pulsar Guardar"""
+    def condicion(driver):
+        try:
+            return any(a not in previos and a.is_displayed()
+                       for a in driver.find_elements(By.XPATH, XPATH_CONFIRMACION))
+        except StaleElementReferenceException:
+            return False
+    return condicion
+
+
+def nueva_espera(driver, timeout=None):
+    """WebDriverWait con el tope y la frecuencia de sondeo del perfil activo"""
+    return WebDriverWait(driver, timeout or TIEMPOS['elemento'], poll_frequency=TIEMPOS['sondeo'])
+
+
+def angular_estable(driver):
+    """True cuando Angular no tiene peticiones HTTP ni temporizadores pendientes"""
+    return driver.execute_script(
+        "if (!window.getAllAngularTestabilities) { return document.readyState === 'complete'; }"
+        "return window.getAllAngularTestabilities().every(function (t) { return t.isStable(); });"
+    )
+
+
+def wait_for_no_overlay(driver, timeout=None):
     """Espera a que desaparezcan los overlays de carga"""
     try:
-        WebDriverWait(driver, timeout).until(
+        nueva_espera(driver, timeout or TIEMPOS['overlay']).until(
             EC.invisibility_of_element_located((By.CLASS_NAME, "cdk-overlay-backdrop"))
         )
-    except:
+    except TimeoutException:
+        pass
+
+
+def esperar_pagina_lista(driver, timeout=None):
+    """Espera red inactiva (Angular estable) y sin overlays; no falla si se agota el tope"""
+    try:
+        nueva_espera(driver, timeout or TIEMPOS['overlay']).until(angular_estable)
+    except TimeoutException:
         pass
+    wait_for_no_overlay(driver, timeout)
+
+
+# El portal vuelve al formulario de login cuando la sesión expira
+JS_ESTADO_SESION = """
+var usuario = document.querySelector("input[name='username']");
+return usuario && usuario.getClientRects().length > 0 ? 'login' : 'ok';
+"""
+
+
+def estado_sesion(driver):
+    """'ok', 'login' (la sesión expiró) o 'caido' (el navegador no responde)"""
+    try:
+        return driver.execute_script(JS_ESTADO_SESION)
+    except Exception:
+        return 'caido'
+
+
+# Comandos de WebDriver que consultan el DOM (búsquedas y scripts)
+COMANDOS_DOM = {'findElement', 'findElements', 'findChildElement', 'findChildElements',
+                'w3cExecuteScript', 'w3cExecuteScriptAsync'}
+
+
+def contar_comandos(driver):
+    """Cuenta, por tipo, cada ida y vuelta del driver con chromedriver. Devuelve el Counter."""
+    conteo = Counter()
+    ejecutar = driver.command_executor.execute
+
+    def execute(command, params):
+        conteo[command] += 1
+        return ejecutar(command, params)
+
+    driver.command_executor.execute = execute
+    return conteo
+
+
+# Nodos del árbol de analitos del nivel abierto, por texto visible (una sola consulta)
+JS_NODOS_ANALITO = """
+var nodos = {};
+document.querySelectorAll('span.ng-star-inserted').forEach(function (s) {
+    var contenedor = s.closest('div.p-tree-node-content');
+    if (s.className === 'ng-star-inserted' && contenedor) {
+        nodos[s.textContent.replace(/\\s+/g, ' ').trim()] = contenedor;
+    }
+});
+return nodos;
+"""
+
+
+class CacheLocalizadores:
+    """WebElements ya localizados, para no volver a buscarlos en cada registro.
+
+    Si el portal vuelve a pintar el panel, el elemento guardado queda obsoleto:
+    se descarta y se localiza de nuevo.
+    """
+
+    def __init__(self, driver, wait):
+        self.driver = driver
+        self.wait = wait
+        self.elementos = {}     # xpath -> WebElement
+        self.nodos = {}         # nombre visible del analito -> nodo del árbol
+        self.estadisticas = Counter()
+
+    def invalidar(self):
+        self.elementos.clear()
+        self.nodos.clear()
+
+    def indexar_analitos(self):
+        """Localiza de una vez todos los nodos de analito del nivel abierto"""
+        try:
+            self.nodos = self.driver.execute_script(JS_NODOS_ANALITO) or {}
+        except Exception:
+            self.nodos = {}
+
+    def nodo_analito(self, ui_name):
+        """Nodo indexado del analito (se entrega una sola vez), o None"""
+        return self.nodos.pop(ui_name, None)
+
+    def clic(self, xpath):
+        """Click en el elemento guardado; si quedó obsoleto u oculto, lo localiza de nuevo"""
+        elemento = self.elementos.get(xpath)
+        if elemento is not None:
+            try:
+                elemento.click()
+                self.estadisticas['reutilizados'] += 1
+                return
+            except (StaleElementReferenceException, ElementNotInteractableException):
+                del self.elementos[xpath]
+                self.estadisticas['obsoletos'] += 1
+        elemento = self.wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
+        self.estadisticas['localizados'] += 1
+        elemento.click()
+        self.elementos[xpath] = elemento
 
-def reopen_AU480(driver, wait):
-    """Función para (re)abrir AU480 nodo principal"""
+
+def xpath_nodo(etiqueta):
+    """XPath del botón que despliega el nodo del árbol con esa etiqueta"""
+    return f"//span[contains(text(), '{etiqueta}')]/preceding::button[1]"
+
+
+# Nodo del analizador bajo "Química clínica" y nodo de cada nivel Multiqual ('lote - nombre').
+# Sin config_laboratorio.json (Configuracion.py) son los únicos destinos
+NODO_ANALIZADOR = 'AU480'
+
+
+def reopen_AU480(driver, wait, nodo=NODO_ANALIZADOR):
+    """Función para (re)abrir el nodo principal del analizador (AU480 por defecto)"""
     try:
-        wait.until(EC.element_to_be_clickable((
-            By.XPATH, "//span[contains(text(), 'AU480')]/preceding::button[1]"
-        ))).click()
-        time.sleep(2)
-    except:
+        with Trazas.span('reabrir_au480', nodo=nodo):
+            wait.until(EC.element_to_be_clickable((By.XPATH, xpath_nodo(nodo)))).click()
+            esperar_pagina_lista(driver)
+    except Exception:
         pass
 
 # Al inicio del script, junto con TARGET_ANALITOS
-NIVEL_XPATHS = {
-    # 1: "//span[contains(text(), '45981 - Lyquicheck Assayed Multiqual')]/preceding::button[1]",
-    1: "//span[contains(text(), '46011 - Lyquicheck Assayed Multiqual Nivel 1')]/preceding::button[1]",
-    2: "//span[contains(text(), '46012 - Lyquicheck Assayed Multiqual Nivel 2')]/preceding::button[1]",
-    # 2: "//span[contains(text(), '45982 - Lyquicheck Assayed Multiqual')]/preceding::button[1]",
-    3: "//span[contains(text(), '46013 - Liquid Assayed Multiqual Nivel 3')]/preceding::button[1]"
-    
+NIVEL_NODOS = {
+    # 1: '45981 - Lyquicheck Assayed Multiqual',
+    1: '46011 - Lyquicheck Assayed Multiqual Nivel 1',
+    2: '46012 - Lyquicheck Assayed Multiqual Nivel 2',
+    # 2: '45982 - Lyquicheck Assayed Multiqual',
+    3: '46013 - Liquid Assayed Multiqual Nivel 3'
 }
+NIVEL_XPATHS = {nivel: xpath_nodo(etiqueta) for nivel, etiqueta in NIVEL_NODOS.items()}
 # Definir qué analitos NO existen en cada nivel
 ANALITOS_EXCLUIDOS_POR_NIVEL = {
     1: [],  # Nivel 1 tiene todos
@@ -139,9 +562,9 @@ ANALITOS_EXCLUIDOS_POR_NIVEL = {
 }
 
 
-def open_multiqual_level(driver, wait, nivel):
-    """Abre un nivel específico de Multiqual"""
-    xpath = NIVEL_XPATHS.get(nivel)
+def open_multiqual_level(driver, wait, nivel, xpath=None):
+    """Abre un nivel específico de Multiqual (xpath: el del nodo del lote vigente, si no es el de NIVEL_XPATHS)"""
+    xpath = xpath or NIVEL_XPATHS.get(nivel)
     if not xpath:
         print(f"❌ No hay XPath configurado para nivel {nivel}")
         return False
@@ -149,112 +572,161 @@ def open_multiqual_level(driver, wait, nivel):
     max_attempts = 3
     for attempt in range(max_attempts):
         try:
-            wait.until(EC.element_to_be_clickable((By.XPATH, xpath))).click()
-            time.sleep(3)
+            with Trazas.span('abrir_nivel', nivel=nivel, intento=attempt + 1):
+                wait.until(EC.element_to_be_clickable((By.XPATH, xpath))).click()
+                # Los analitos del nivel se cargan por HTTP: esperar a que termine
+                esperar_pagina_lista(driver, TIEMPOS['elemento'])
             return True
-        except:
+        except Exception:
             print(f"⚠️ Intento {attempt + 1}/{max_attempts} falló al abrir nivel {nivel}")
+            if estado_sesion(driver) != 'ok':
+                # Sin sesión los demás intentos fallarían igual
+                return False
             if attempt < max_attempts - 1:
                 reopen_AU480(driver, wait)
-                time.sleep(2)
     return False
 
-def find_and_click_analito(driver, wait, analito_name):
-    """Busca y hace click en el nodo del analito"""
-    ui_name = ANALITO_MAPPING.get(analito_name, analito_name)
+def find_and_click_analito(driver, wait, analito_name, cache=None):
+    """Busca y hace click en el nodo del analito (primero en cache, si se pasa)"""
+    ui_name = laboratorio().nombres_portal.get(analito_name, analito_name)
     
     max_attempts = 3
     for attempt in range(max_attempts):
         try:
-            wait_for_no_overlay(driver, timeout=5)
-            
-            # Opción 1: Buscar directamente el span interno y subir al contenedor clickeable
-            node_xpath = (
-                f"//span[@class='ng-star-inserted' and normalize-space()='{ui_name}']"
-                f"/ancestor::div[contains(@class,'p-tree-node-content')]"
-            )
-            
-            analito_node = wait.until(EC.element_to_be_clickable((By.XPATH, node_xpath)))
-            driver.execute_script("arguments[0].scrollIntoView(true);", analito_node)
-            time.sleep(0.3)
-            analito_node.click()
-            time.sleep(1)
-            
+            with Trazas.span('abrir_analito', analito=analito_name, intento=attempt + 1):
+                wait_for_no_overlay(driver)
+
+                # Opción 1: Buscar directamente el span interno y subir al contenedor clickeable
+                node_xpath = (
+                    f"//span[@class='ng-star-inserted' and normalize-space()='{ui_name}']"
+                    f"/ancestor::div[contains(@class,'p-tree-node-content')]"
+                )
+
+                analito_node = cache.nodo_analito(ui_name) if cache is not None else None
+                if analito_node is None:
+                    analito_node = wait.until(EC.element_to_be_clickable((By.XPATH, node_xpath)))
+                driver.execute_script("arguments[0].scrollIntoView(true);", analito_node)
+                analito_node.click()
+
+                # El panel del analito está listo cuando aparece su botón "Alta Resultado"
+                esperar_pagina_lista(driver)
+                wait.until(EC.element_to_be_clickable((
+                    By.XPATH, "//button[.//span[@class='p-button-label' and contains(text(),'Alta Resultado')]]"
+                )))
+
             print(f"✅ Click en analito: {ui_name}")
             return True
             
+        except StaleElementReferenceException:
+            # El árbol se volvió a pintar después de indexarlo: se busca por XPath
+            pass
         except TimeoutException:
             print(f"⏱️ Intento {attempt + 1}/{max_attempts}: No se encontró '{ui_name}'")
-            time.sleep(1)
         except ElementClickInterceptedException:
             print(f"🚫 Intento {attempt + 1}/{max_attempts}: Elemento bloqueado '{ui_name}'")
-            time.sleep(1)
         except Exception as e:
             print(f"❌ Intento {attempt + 1}/{max_attempts} error con '{ui_name}': {type(e).__name__}")
-            time.sleep(1)
-    
+
+        if estado_sesion(driver) != 'ok':
+            print(f"🔌 Sesión perdida al abrir '{ui_name}'")
+            return False
+        esperar_pagina_lista(driver)
+
     print(f"❌ No se pudo hacer click en '{ui_name}' después de {max_attempts} intentos")
     return False
-def should_skip_analito(analito, nivel):
+def should_skip_analito(analito, nivel, fuente=''):
     """    Determina si un analito debe ser saltado para un nivel específico
     Args:
         analito: Nombre del analito
         nivel: Número de nivel (1, 2, 3)
+        fuente: Prefijo del material en Configuracion.py ('' = el de siempre)
     Returns:
         bool: True si debe saltarse, False si debe procesarse
     """
-    excluidos = ANALITOS_EXCLUIDOS_POR_NIVEL.get(nivel, [])
-    return analito in excluidos
+    destino = laboratorio().por_prefijo.get(fuente)
+    excluidos = destino[1].excluidos if destino else ANALITOS_EXCLUIDOS_POR_NIVEL
+    return analito in excluidos.get(nivel, ())
+
+XPATH_FECHA = "//input[@matinput and @name='fecha']"
+XPATH_GUARDAR = "//button[@type='submit' and contains(normalize-space(), 'Guardar')]"
+
+
+def xpath_alta(nivel):
+    return f"//button[.//span[@class='p-button-label' and contains(text(),'Alta Resultado Nivel {nivel}')]]"
+
+
+def xpath_valor(nivel):
+    return f"//input[@matinput and @placeholder='Valor Nivel {nivel}']"
+
 
 def ingresar_resultado(driver, wait, fecha_iso, valor, nivel):
-    """Ingresa un resultado específico"""
+    """Ingresa un resultado específico.
+
+    Devuelve True si se guardó, False si falló antes de pulsar Guardar (se puede
+    reintentar) y None si se pulsó Guardar pero el portal no confirmó (el valor
+    pudo quedar guardado).
+    """
+    with Trazas.span('resultado', nivel=nivel) as traza:
+        resultado = _ingresar_resultado(driver, wait, fecha_iso, valor, nivel)
+        traza['ok'] = resultado is True
+        if resultado is None:
+            traza['sin_confirmar'] = True
+    return resultado
+
+
+def _ingresar_resultado(driver, wait, fecha_iso, valor, nivel):
+    pulsado = False  # Después del clic en Guardar un fallo ya no permite reintentar sin más
     try:
-        wait_for_no_overlay(driver, timeout=5)
-        
-        # Click "Alta Resultado Nivel X"
-        registro_btn = wait.until(EC.element_to_be_clickable((
-            By.XPATH, f"//button[.//span[@class='p-button-label' and contains(text(),'Alta Resultado Nivel {nivel}')]]"
-        )))
-        driver.execute_script("arguments[0].scrollIntoView(true);", registro_btn)
-        time.sleep(0.3)
-        registro_btn.click()
+        with Trazas.span('resultado.boton', nivel=nivel):
+            wait_for_no_overlay(driver)
+
+            # Click "Alta Resultado Nivel X"
+            registro_btn = wait.until(EC.element_to_be_clickable((By.XPATH, xpath_alta(nivel))))
+            driver.execute_script("arguments[0].scrollIntoView(true);", registro_btn)
+            registro_btn.click()
 
-        wait_for_no_overlay(driver, timeout=5)
+            wait_for_no_overlay(driver)
 
         # Ingresar fecha - CORREGIDO: usar matinput
-        fecha_input = wait.until(EC.presence_of_element_located((
-            By.XPATH, "//input[@matinput and @name='fecha']"
-        )))
-        # Esperar a que sea interactuable
-        wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@matinput and @name='fecha']")))
-        
-        fecha_input.clear()
-        fecha_input.send_keys(fecha_iso)
-        time.sleep(0.3)
+        with Trazas.span('resultado.fecha', nivel=nivel):
+            fecha_input = wait.until(EC.presence_of_element_located((By.XPATH, XPATH_FECHA)))
+            # Esperar a que sea interactuable
+            wait.until(EC.element_to_be_clickable((By.XPATH, XPATH_FECHA)))
+
+            fecha_input.clear()
+            fecha_input.send_keys(fecha_iso)
 
         # Ingresar valor de nivel - CORREGIDO: placeholder exacto
-        valor_input = wait.until(EC.element_to_be_clickable((
-            By.XPATH, f"//input[@matinput and @placeholder='Valor Nivel {nivel}']"
-        )))
-        valor_input.clear()
-        valor_input.send_keys(str(valor))
-        time.sleep(0.3)
+        with Trazas.span('resultado.valor', nivel=nivel):
+            valor_xpath = xpath_valor(nivel)
+            valor_input = wait.until(EC.element_to_be_clickable((By.XPATH, valor_xpath)))
+            valor_input.clear()
+            valor_input.send_keys(str(valor))
+            # El formulario valida al escribir: esperar a que el valor quede en el campo
+            wait.until(EC.text_to_be_present_in_element_value((By.XPATH, valor_xpath), str(valor)))
 
         # Guardar - CORREGIDO: estructura simple de button
-        guardar_btn = wait.until(EC.element_to_be_clickable((
-            By.XPATH, "//button[@type='submit' and contains(normalize-space(), 'Guardar')]"
-        )))
-        driver.execute_script("arguments[0].scrollIntoView(true);", guardar_btn)
-        time.sleep(0.3)
-        guardar_btn.click()
-
-        wait_for_no_overlay(driver, timeout=3)
-        time.sleep(0.5)
-        
+        with Trazas.span('resultado.guardar', nivel=nivel):
+            guardar_btn = wait.until(EC.element_to_be_clickable((By.XPATH, XPATH_GUARDAR)))
+            driver.execute_script("arguments[0].scrollIntoView(true);", guardar_btn)
+            avisos_previos = driver.find_elements(By.XPATH, XPATH_CONFIRMACION)
+            guardar_btn.click()
+            pulsado = True
+
+            # Confirmación del guardado: este formulario se cierra o aparece un aviso nuevo del portal
+            nueva_espera(driver, TIEMPOS['guardado']).until(EC.any_of(
+                EC.invisibility_of_element(fecha_input),
+                _aviso_nuevo(avisos_previos),
+            ))
+            wait_for_no_overlay(driver)
+
         # print(f"✅ Resultado ingresado: {valor} (Nivel {nivel}) - {fecha_iso}")
         return True
         
     except TimeoutException as e:
+        if pulsado:
+            print(f"⏱️ Timeout esperando la confirmación del guardado nivel {nivel}")
+            return None
         print(f"⏱️ Timeout al ingresar resultado nivel {nivel}: No se encontró elemento")
         # Opcional: tomar screenshot para debug
         # driver.save_screenshot(f"error_nivel_{nivel}_{int(time.time())}.png")
@@ -262,113 +734,705 @@ def ingresar_resultado(driver, wait, fecha_iso, valor, nivel):
         
     except ElementClickInterceptedException as e:
         print(f"🚫 Elemento bloqueado (overlay?) al ingresar resultado nivel {nivel}")
-        return False
+        return None if pulsado else False
         
     except Exception as e:
         print(f"❌ Error inesperado al ingresar resultado nivel {nivel}: {type(e).__name__} - {str(e)}")
-        return False
+        return None if pulsado else False
+
+
+# Modo 'lote': cada paso del formulario es una sola llamada a execute_script en vez
+# de varias búsquedas y comprobaciones por elemento.
+JS_VISIBLE = "var visible = function (e) { return !!e && e.getClientRects().length > 0; };"
+
+# Formulario abierto y sin overlay: marca el campo fecha y los avisos ya presentes
+# (para reconocer después el cierre del formulario o un aviso nuevo) y devuelve
+# [fecha, valor, guardar]; null mientras no esté listo.
+JS_FORMULARIO = JS_VISIBLE + """
+var buscar = function (xpath) {
+    return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+};
+var fecha = buscar(arguments[0]), valor = buscar(arguments[1]), guardar = buscar(arguments[2]);
+if (visible(document.querySelector('.cdk-overlay-backdrop')) || !visible(fecha) || !visible(valor) || !visible(guardar)) {
+    return null;
+}
+fecha.setAttribute('data-registro-en-curso', '1');
+var avisos = document.evaluate(arguments[3], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (var i = 0; i < avisos.snapshotLength; i++) { avisos.snapshotItem(i).setAttribute('data-visto', '1'); }
+return [fecha, valor, guardar];
+"""
+
+# El valor quedó escrito y el formulario habilita Guardar
+JS_LISTO_PARA_GUARDAR = "return arguments[0].value === arguments[2] && !arguments[1].disabled;"
+
+# Guardado confirmado: sin overlay y, o bien se cerró el formulario, o hay un aviso nuevo
+JS_GUARDADO = JS_VISIBLE + """
+if (visible(document.querySelector('.cdk-overlay-backdrop'))) { return false; }
+if (!visible(document.querySelector('[data-registro-en-curso]'))) { return true; }
+var avisos = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (var i = 0; i < avisos.snapshotLength; i++) {
+    var a = avisos.snapshotItem(i);
+    if (!a.hasAttribute('data-visto') && visible(a)) { return true; }
+}
+return false;
+"""
+
+
+def ingresar_resultado_lote(driver, cache, fecha_iso, valor, nivel):
+    """Ingresa un resultado del analito ya abierto reutilizando los elementos de cache.
+
+    No reintenta ni informa errores: si devuelve False, el llamador recurre a
+    ingresar_resultado. Como ingresar_resultado, devuelve None si se pulsó Guardar
+    pero el portal no confirmó.
+    """
+    pulsado = False
+    with Trazas.span('resultado', nivel=nivel, modo='lote') as traza:
+        try:
+            with Trazas.span('resultado.boton', nivel=nivel, modo='lote'):
+                cache.clic(xpath_alta(nivel))
+
+            with Trazas.span('resultado.fecha', nivel=nivel, modo='lote'):
+                fecha_input, valor_input, guardar_btn = nueva_espera(driver).until(
+                    lambda d: d.execute_script(JS_FORMULARIO, XPATH_FECHA, xpath_valor(nivel),
+                                               XPATH_GUARDAR, XPATH_CONFIRMACION)
+                )
+                fecha_input.clear()
+                fecha_input.send_keys(fecha_iso)
+
+            with Trazas.span('resultado.valor', nivel=nivel, modo='lote'):
+                valor_input.clear()
+                valor_input.send_keys(str(valor))
+                nueva_espera(driver).until(
+                    lambda d: d.execute_script(JS_LISTO_PARA_GUARDAR, valor_input, guardar_btn, str(valor))
+                )
+
+            with Trazas.span('resultado.guardar', nivel=nivel, modo='lote'):
+                guardar_btn.click()
+                pulsado = True
+                nueva_espera(driver, TIEMPOS['guardado']).until(
+                    lambda d: d.execute_script(JS_GUARDADO, XPATH_CONFIRMACION)
+                )
+        except Exception as e:
+            traza['ok'] = False
+            traza['error'] = type(e).__name__
+            if pulsado:
+                traza['sin_confirmar'] = True
+                return None
+    return traza['ok']
 
 # ----------------------------------------
 # 3) SESIÓN ÚNICA DE SELENIUM
 # ----------------------------------------
 
-driver = webdriver.Chrome()
-wait = WebDriverWait(driver, 10)
-
-try:
-    # 3.a) Login inicial
-    driver.get("https://app.cclabcontrol.com/#/login")
-    time.sleep(10)
+def iniciar_sesion(driver, wait, nodo=NODO_ANALIZADOR):
+    """Login y navegación hasta Control de Calidad → Química clínica → nodo del analizador (AU480)"""
+    # 3.a) Login inicial: esperar al formulario, o al menú si la sesión guardada sigue válida
+    with Trazas.span('login') as traza:
+        driver.get(f"{PORTAL_URL}/#/login")
+        listo = nueva_espera(driver, TIEMPOS['login']).until(EC.any_of(
+            EC.element_to_be_clickable((By.NAME, "username")),
+            EC.element_to_be_clickable((By.XPATH, "//img[@alt='Control de Calidad']")),
+        ))
 
-    driver.find_element(By.NAME, "username").send_keys("example.gmail.com")
-    driver.find_element(By.NAME, "password").send_keys("PASSWORD")
-    wait.until(EC.element_to_be_clickable(
-        (By.XPATH, "//button[.//strong[contains(text(), ' Entrar ')]]")
-    )).click()
+        if listo.get_attribute('name') == 'username':
+            driver.find_element(By.NAME, "username").send_keys(USUARIO)
+            driver.find_element(By.NAME, "password").send_keys(CLAVE)
+            wait.until(EC.element_to_be_clickable(
+                (By.XPATH, "//button[.//strong[contains(text(), ' Entrar ')]]")
+            )).click()
+        else:
+            traza['sesion_reutilizada'] = True
+            print("🔑 Sesión guardada válida: se omite el login")
 
     # Navegar hasta "Control de Calidad → Química clínica → AU480"
-    wait.until(EC.element_to_be_clickable((By.XPATH, "//img[@alt='Control de Calidad']"))).click()
-    wait.until(EC.element_to_be_clickable((
-        By.XPATH, "//span[contains(text(), 'Quimica clínica')]/preceding::button[1]"
-    ))).click()
-    wait.until(EC.element_to_be_clickable((
-        By.XPATH, "//span[contains(text(), 'AU480')]/preceding::button[1]"
-    ))).click()
-
-    # ----------------------------------------
-    # 4) PROCESAMIENTO POR NIVEL Y ANALITO
-    # ----------------------------------------
-    
-    total_processed = 0
-    total_errors = 0
-    
-    for nivel in (1,2,3):
-        print(f"\n🔄 Procesando NIVEL {nivel}")
-        
-        # Filtrar registros para este nivel
-        nivel_df = records_df[records_df['Nivel'] == nivel]
-        if nivel_df.empty:
-            print(f"ℹ️ No hay datos para el nivel {nivel}")
-            continue
+    with Trazas.span('navegacion'):
+        wait.until(EC.element_to_be_clickable((By.XPATH, "//img[@alt='Control de Calidad']"))).click()
+        wait.until(EC.element_to_be_clickable((By.XPATH, xpath_nodo('Quimica clínica')))).click()
+        wait.until(EC.element_to_be_clickable((By.XPATH, xpath_nodo(nodo)))).click()
+
+
+class ResumenSubida:
+    """Acumula el resultado de una o varias sesiones de carga"""
+
+    def __init__(self):
+        self.procesados = 0
+        self.exitosos = set()   # índices de records_df guardados
+        self.fallidos = []      # (nivel, analito, fecha, valor, motivo)
+        self.atendidos = set()  # índices de records_df ya resueltos (éxito o fallo)
+        self.comandos = Counter()       # comandos WebDriver enviados, por tipo
+        self.localizadores = Counter()  # uso de CacheLocalizadores
+        self.recuperaciones = Counter() # sesiones restablecidas, por motivo ('login'/'caido')
+
+    def exito(self, idx):
+        self.procesados += 1
+        self.exitosos.add(idx)
+        self.atendidos.add(idx)
+
+    def fallo(self, idx, row, motivo):
+        analito = row.get('Fuente', '') + row['Analito']
+        self.fallidos.append((int(row['Nivel']), analito, row['Fecha'].isoformat(), row['Valor'], motivo))
+        self.atendidos.add(idx)
+
+    def fallar_pendientes(self, df, motivo):
+        """Marca como fallidos los registros de df que aún no se resolvieron"""
+        for idx, row in df.iterrows():
+            if idx not in self.atendidos:
+                self.fallo(idx, row, motivo)
+
+    @classmethod
+    def combinar(cls, resumenes):
+        total = cls()
+        for r in resumenes:
+            total.procesados += r.procesados
+            total.exitosos |= r.exitosos
+            total.fallidos.extend(r.fallidos)
+            total.atendidos |= r.atendidos
+            total.comandos.update(r.comandos)
+            total.localizadores.update(r.localizadores)
+            total.recuperaciones.update(r.recuperaciones)
+        return total
+
+
+def procesar_nivel(driver, wait, nivel, nivel_df, resumen, bitacora=None, cache=None, supervisor=None,
+                   xpath_nivel=None):
+    """Sube los registros de un nivel, analito por analito, anotando cada resultado en resumen.
+
+    Con cache (modo 'lote') cada registro intenta primero la vía rápida y solo si
+    falla pasa a los reintentos de ingresar_resultado. Con supervisor, cada fallo
+    consulta si se perdió la sesión: si se restablece, se sigue con el mismo paso
+    en el navegador que entregue el supervisor. Un registro cuyo Guardar se pulsó
+    sin confirmación no se vuelve a escribir (podría duplicarse en el portal),
+    salvo que el portal haya vuelto al login, es decir, que rechazó el guardado.
+    xpath_nivel es el nodo del lote vigente (por defecto el de NIVEL_XPATHS).
+    """
+    # Material de origen (Configuracion.py): exclusiones por nivel y clave de la bitácora
+    fuente = nivel_df['Fuente'].iat[0] if 'Fuente' in nivel_df and not nivel_df.empty else ''
+
+    def recuperada(analito=None):
+        nonlocal driver, wait, cache
+        if supervisor is None or not supervisor.recuperar(nivel, analito, xpath_nivel):
+            return False
+        driver, wait, cache = supervisor.driver, supervisor.wait, supervisor.cache
+        return True
 
-        # Abrir nivel de Multiqual
-        if not open_multiqual_level(driver, wait, nivel):
-            print(f"❌ No se pudo abrir Lyquicheck 4598{nivel}. Saltando nivel.")
+    def sin_confirmar(idx, row, fecha_iso, valor, analito):
+        """Guardar pulsado sin confirmación. True si el portal lo rechazó (volvió al
+        login) y se puede reintentar; si no, el registro falla sin reescribirse."""
+        if estado_sesion(driver) == 'login':
+            return True
+        print(f"    ⚠️ {fecha_iso}: {valor}: se pulsó Guardar y el portal no confirmó; "
+              f"no se reintenta para no duplicarlo (revisar en el portal)")
+        resumen.fallo(idx, row, 'guardado sin confirmar')
+        if not recuperada(analito):
+            esperar_pagina_lista(driver)
+        return False
+
+    # Abrir nivel de Multiqual
+    if not open_multiqual_level(driver, wait, nivel, xpath_nivel) and not recuperada():
+        print(f"❌ No se pudo abrir el nivel {nivel}. Saltando nivel.")
+        resumen.fallar_pendientes(nivel_df, 'nivel no disponible')
+        return
+    if cache is not None:
+        cache.invalidar()
+        cache.indexar_analitos()
+
+    # Obtener analitos únicos para este nivel
+    analitos_nivel = nivel_df['Analito'].unique()
+    # print(f"📝 Analitos en nivel {nivel}: {analitos_nivel.tolist()}")
+
+    for analito in analitos_nivel:
+
+        # Obtener datos para este analito específico
+        analito_df = nivel_df[nivel_df['Analito'] == analito]
+
+        if should_skip_analito(analito, nivel, fuente):
+            print(f"⏭️ '{analito}' no existe en el nivel {nivel}: se omiten {len(analito_df)} registro(s)")
             continue
 
-        # Obtener analitos únicos para este nivel
-        analitos_nivel = nivel_df['Analito'].unique()
-        # print(f"📝 Analitos en nivel {nivel}: {analitos_nivel.tolist()}")
+        # Buscar y abrir nodo del analito
+        if not find_and_click_analito(driver, wait, analito, cache) and not recuperada(analito):
+            if not (analito == "Colesterol HDL (HDL-C)" and nivel == 3): # Reportar error
+                print(f"    ❌ No se pudo encontrar '{analito}' en la interfaz")
+                resumen.fallar_pendientes(analito_df, 'analito no encontrado')
+                continue
+            else:
+                print(f"'{analito}', Este analito no esta en el nivel {nivel}")
 
-        for analito in analitos_nivel:
-        
-            # Obtener datos para este analito específico
-            analito_df = nivel_df[nivel_df['Analito'] == analito]
-            
-            # Buscar y abrir nodo del analito
-            if not find_and_click_analito(driver, wait, analito):
-                if not (analito == "Colesterol HDL (HDL-C)" and nivel == 3): # Reportar error
-                    print(f"    ❌ No se pudo encontrar '{analito}' en la interfaz")
-                    total_errors += len(analito_df)
+        # Procesar cada registro de este analito
+        for idx, row in analito_df.iterrows():
+            valor = row['Valor']
+            fecha_iso = row['Fecha'].isoformat()
+
+            if cache is not None:
+                with Trazas.contexto(analito=analito, intento=0):
+                    ok = ingresar_resultado_lote(driver, cache, fecha_iso, valor, nivel)
+                if ok:
+                    resumen.exito(idx)
+                    if bitacora is not None:
+                        registrar_subida(bitacora, fuente + analito, nivel, fecha_iso, valor)
+                    continue
+                if ok is None and not sin_confirmar(idx, row, fecha_iso, valor, analito):
+                    continue
+                # Vía normal: se vuelven a localizar todos los elementos
+                recuperada(analito)
+                cache.elementos.clear()
+                esperar_pagina_lista(driver)
+
+            attempts = 0
+            while attempts < 3:
+                with Trazas.contexto(analito=analito, intento=attempts + 1):
+                    ok = ingresar_resultado(driver, wait, fecha_iso, valor, nivel)
+                if ok:
+                    resumen.exito(idx)
+                    if bitacora is not None:
+                        registrar_subida(bitacora, fuente + analito, nivel, fecha_iso, valor)
+                    # print(f"    ✅ {fecha_iso}: {valor}")
+                    break
+                elif ok is None and not sin_confirmar(idx, row, fecha_iso, valor, analito):
+                    break
+                elif recuperada(analito):
+                    # El intento no cuenta: la sesión ya está de vuelta en este analito
                     continue
                 else:
-                    print(f"'{analito}', Este analito no esta en el nivel {nivel}")
-
-          # Procesar cada registro de este analito
-            for _, row in analito_df.iterrows():
-                valor = row['Valor']
-                fecha_iso = row['Fecha'].isoformat()
-
-                attempts = 0
-                while attempts < 3:
-                    if ingresar_resultado(driver, wait, fecha_iso, valor, nivel):
-                        total_processed += 1
-                        # print(f"    ✅ {fecha_iso}: {valor}")
-                        break
-                    else:
-                        attempts += 1
-                        print(f"    ⚠️ Reintento {attempts} para {fecha_iso}")
-                        time.sleep(1)
+                    attempts += 1
+                    print(f"    ⚠️ Reintento {attempts} para {fecha_iso}")
+                    with Trazas.span('reintento', analito=analito, intento=attempts):
+                        esperar_pagina_lista(driver)
+            else:
+                # Este else se ejecuta solo si el while terminó sin break (es decir, falló todas las veces)
+                print(f"    ❌ Error {nivel}: {fecha_iso}: {valor}")
+                resumen.fallo(idx, row, 'reintentos agotados')
+
+
+def crear_driver(sesion=1):
+    """Inicia Chrome según el perfil PERFIL_NAVEGADOR"""
+    _importar_selenium()
+    perfil = PERFILES_NAVEGADOR[PERFIL_NAVEGADOR]
+    opciones = webdriver.ChromeOptions()
+    opciones.page_load_strategy = perfil['carga_pagina']
+    if perfil['headless']:
+        opciones.add_argument('--headless=new')
+        opciones.add_argument('--window-size=1920,1080')
+    if perfil['perfil_usuario']:
+        # Cada sesión en paralelo necesita su propia carpeta de datos
+        carpeta = os.path.abspath(os.path.join(perfil['perfil_usuario'], f"sesion-{sesion}"))
+        opciones.add_argument(f"--user-data-dir={carpeta}")
+    if perfil['bloquear_recursos']:
+        opciones.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    for argumento in perfil['argumentos']:
+        opciones.add_argument(argumento)
+
+    with Trazas.span('arranque_navegador', perfil=PERFIL_NAVEGADOR):
+        driver = webdriver.Chrome(options=opciones)
+        if perfil['bloquear_recursos']:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': URLS_BLOQUEADAS})
+    return driver
+
+
+class SupervisorSesion:
+    """Navegador, espera y cache de una sesión de carga, con recuperación automática.
+
+    recuperar() distingue una sesión expirada (se vuelve a iniciar sesión en el
+    mismo navegador) de un navegador caído (se abre otro) y deja la navegación
+    en el nivel y analito en curso. El tope max_recuperaciones vale para cada
+    carga (nueva_carga); los conteos de comandos, de la cache y de recuperaciones
+    se conservan entre cargas y navegadores.
+    """
+
+    def __init__(self, sesion=1, entrada=MODO_ENTRADA, max_recuperaciones=MAX_RECUPERACIONES, nodo=None):
+        self.sesion = sesion
+        self.entrada = entrada
+        self.max_recuperaciones = max_recuperaciones
+        # Analizador en el que queda la navegación al iniciar sesión (subir_destinos lo cambia)
+        self.nodo = nodo or laboratorio().analizadores[0].nodo
+        self.driver = None
+        self.wait = None
+        self.cache = None
+        self.comandos = Counter()
+        self.localizadores = Counter()
+        self.recuperaciones = Counter()
+        self._recuperaciones_carga = 0
+        self._conteo = None
+
+    def nueva_carga(self):
+        """Empieza una carga: vuelve a habilitar max_recuperaciones recuperaciones"""
+        self._recuperaciones_carga = 0
+
+    def abrir(self):
+        """Abre el navegador e inicia sesión"""
+        self.driver = crear_driver(self.sesion)
+        self._conteo = contar_comandos(self.driver)
+        self.wait = nueva_espera(self.driver)
+        if self.entrada == 'lote':
+            self.cache = CacheLocalizadores(self.driver, self.wait)
+        iniciar_sesion(self.driver, self.wait, self.nodo)
+
+    def cerrar(self):
+        """Cierra el navegador (si lo hay) y acumula sus conteos"""
+        if self._conteo is not None:
+            self.comandos.update(self._conteo)
+            self._conteo = None
+        if self.cache is not None:
+            self.localizadores.update(self.cache.estadisticas)
+            self.cache = None
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def recuperar(self, nivel=None, analito=None, xpath_nivel=None):
+        """Si la sesión se perdió, la restablece y vuelve a nivel/analito.
+
+        Devuelve True solo si hubo que recuperarla y quedó lista para seguir.
+        """
+        if self.driver is None:
+            return False
+        estado = estado_sesion(self.driver)
+        if estado == 'ok':
+            return False
+        if self._recuperaciones_carga >= self.max_recuperaciones:
+            print(f"❌ [Sesión {self.sesion}] Sesión perdida ({estado}) y sin recuperaciones disponibles")
+            return False
+        self._recuperaciones_carga += 1
+        self.recuperaciones[estado] += 1
+        if estado == 'login':
+            print(f"🔑 [Sesión {self.sesion}] La sesión expiró: se inicia sesión de nuevo")
+        else:
+            print(f"🔌 [Sesión {self.sesion}] El navegador no responde: se abre uno nuevo")
+
+        with Trazas.span('recuperar_sesion', motivo=estado) as traza:
+            try:
+                if estado == 'login':
+                    iniciar_sesion(self.driver, self.wait, self.nodo)
                 else:
-                    # Este else se ejecuta solo si el while terminó sin break (es decir, falló todas las veces)
-                    print(f"    ❌ Error {nivel}: {fecha_iso}: {valor}")
-                    total_errors += 1
+                    self.cerrar()
+                    self.abrir()
+                traza['ok'] = self._volver(nivel, analito, xpath_nivel)
+            except Exception as e:
+                print(f"❌ [Sesión {self.sesion}] No se pudo recuperar la sesión: {type(e).__name__} - {e}")
+                traza['ok'] = False
+                traza['error'] = type(e).__name__
+        return traza['ok']
 
+    def _volver(self, nivel, analito, xpath_nivel=None):
+        """Reabre el nivel y el analito en curso después de iniciar sesión"""
+        if nivel is None:
+            return True
+        if not open_multiqual_level(self.driver, self.wait, nivel, xpath_nivel):
+            return False
+        if self.cache is not None:
+            self.cache.invalidar()
+            self.cache.indexar_analitos()
+        return analito is None or find_and_click_analito(self.driver, self.wait, analito, self.cache)
 
-        # Al terminar el nivel, reabrir AU480 para el siguiente
-        reopen_AU480(driver, wait)
-        time.sleep(2)
 
-    # ----------------------------------------
-    # 5) RESUMEN FINAL
-    # ----------------------------------------
-    
+def particionar(records_df, sesiones, modo='nivel'):
+    """Reparte records_df entre las sesiones.
+
+    'nivel': una partición por nivel. 'analito': pares (nivel, analito) de cada
+    material asignados a la sesión con menos registros acumulados, para equilibrar la carga.
+    """
+    if sesiones <= 1 or records_df.empty:
+        return [records_df]
+    if modo == 'nivel':
+        return [df for _, df in records_df.groupby('Nivel', sort=True)]
+
+    columnas = [c for c in ('Fuente', 'Nivel', 'Analito') if c in records_df]
+    cargas = records_df.groupby(columnas).size().sort_values(ascending=False, kind='stable')
+    totales = [0] * sesiones
+    asignacion = {}
+    for clave, n in cargas.items():
+        sesion = totales.index(min(totales))
+        asignacion[clave] = sesion
+        totales[sesion] += n
+    sesion_por_fila = np.array([asignacion[clave] for clave in zip(*(records_df[c] for c in columnas))])
+    return [records_df[sesion_por_fila == i] for i in range(sesiones) if (sesion_por_fila == i).any()]
+
+
+def subir_destinos(supervisor, records_df, resumen, bitacora=None):
+    """Sube records_df nivel por nivel en la sesión abierta de supervisor, pasando de un
+    analizador a otro (columnas de asignar_destinos) sin volver a iniciar sesión."""
+    supervisor.nueva_carga()
+    records_df = asignar_destinos(records_df)
+    destinos = records_df.groupby(['Analizador', 'Fuente', 'Nivel', 'Nodo'], sort=True, dropna=False)
+    for (analizador, _, nivel, nodo), nivel_df in destinos:
+        if analizador != supervisor.nodo:
+            # Otro analizador: se despliega su nodo (queda como destino de las recuperaciones)
+            reopen_AU480(supervisor.driver, supervisor.wait, analizador)
+            supervisor.nodo = analizador
+        print(f"\n🔄 [Sesión {supervisor.sesion}] Procesando {analizador} NIVEL {nivel}")
+
+        with Trazas.contexto(nivel=nivel):
+            procesar_nivel(supervisor.driver, supervisor.wait, nivel, nivel_df, resumen, bitacora,
+                           supervisor.cache, supervisor, xpath_nodo(nodo) if isinstance(nodo, str) else None)
+
+            # Al terminar el nivel, reabrir AU480 para el siguiente
+            reopen_AU480(supervisor.driver, supervisor.wait, analizador)
+
+
+def subir_particion(particion_df, sesion=1, entrada=MODO_ENTRADA):
+    """Abre un navegador propio, inicia sesión y sube la partición. Devuelve un ResumenSubida."""
+    resumen = ResumenSubida()
+    bitacora = abrir_bitacora(BITACORA_PATH) if USAR_BITACORA else None
+    supervisor = SupervisorSesion(sesion, entrada)
+    try:
+        with Trazas.contexto(sesion=sesion):
+            supervisor.abrir()
+            subir_destinos(supervisor, particion_df, resumen, bitacora)
+    except Exception as e:
+        print(f"❌ [Sesión {sesion}] Error de sesión: {type(e).__name__} - {e}")
+        resumen.fallar_pendientes(particion_df, f"sesión: {type(e).__name__}")
+    finally:
+        # Cerrar navegador
+        supervisor.cerrar()
+        resumen.comandos.update(supervisor.comandos)
+        resumen.localizadores.update(supervisor.localizadores)
+        resumen.recuperaciones.update(supervisor.recuperaciones)
+        if bitacora is not None:
+            bitacora.close()
+    return resumen
+
+
+def ejecutar_subida(records_df, sesiones=1, particion='nivel', entrada=MODO_ENTRADA):
+    """Sube records_df con una o varias sesiones de navegador en paralelo"""
+    particiones = particionar(records_df, sesiones, particion)
+    if len(particiones) == 1:
+        resumenes = [subir_particion(particiones[0], 1, entrada)]
+    else:
+        print(f"🚀 {len(particiones)} particiones por {particion} en {sesiones} sesión(es)")
+        with ThreadPoolExecutor(max_workers=sesiones) as executor:
+            resumenes = list(executor.map(subir_particion, particiones, range(1, len(particiones) + 1),
+                                          [entrada] * len(particiones)))
+    return ResumenSubida.combinar(resumenes)
+
+
+def ejecutar_subida_http(records_df, cliente=None, bitacora=None):
+    """Sube records_df directamente al backend (SubidaHTTP.py). Devuelve un ResumenSubida.
+
+    cliente y bitacora permiten reutilizar una sesión HTTP y una conexión a la
+    bitácora abiertas por el llamador (Pipeline), que se encarga de cerrarlas; si
+    faltan se abren aquí y se cierran al terminar.
+    """
+    import SubidaHTTP
+
+    records_df = asignar_destinos(records_df)
+    claves = clave_bitacora(records_df)
+    propio = cliente is None
+    if propio:
+        cliente = SubidaHTTP.ClienteHTTP(API_URL, USUARIO, CLAVE)
+        bitacora = abrir_bitacora(BITACORA_PATH) if USAR_BITACORA else None
+    resumen = ResumenSubida()
+    confirmados = []
+    try:
+        with Trazas.span('subida_http', registros=len(records_df)):
+            for indices, error in SubidaHTTP.subir_registros(cliente, records_df, laboratorio().nombres_portal):
+                for idx in indices:
+                    row = records_df.loc[idx]
+                    if error is None:
+                        resumen.exito(idx)
+                        confirmados.append((claves[idx], row['Nivel'], row['Fecha'].isoformat(), row['Valor']))
+                    else:
+                        resumen.fallo(idx, row, error)
+                # La bitácora se escribe por bloques para no frenar el envío
+                if bitacora is not None and len(confirmados) >= 100:
+                    registrar_subidas(bitacora, confirmados)
+                    confirmados = []
+    except Exception as e:
+        print(f"❌ Error en la carga HTTP: {type(e).__name__} - {e}")
+        resumen.fallar_pendientes(records_df, f"http: {type(e).__name__}")
+    finally:
+        if bitacora is not None:
+            if confirmados:
+                registrar_subidas(bitacora, confirmados)
+            if propio:
+                bitacora.close()
+        if propio:
+            cliente.cerrar()
+    print(f"🌐 HTTP: {resumen.procesados} guardados, {len(resumen.fallidos)} fallidos, {cliente.logins} login(s)")
+    return resumen
+
+
+def imprimir_resumen_final(resumen):
+    """Totales de la corrida y detalle agregado de los fallos"""
+    total_processed = resumen.procesados
+    total_errors = len(resumen.fallidos)
     print(f"\n📊 RESUMEN FINAL:")
     print(f"✅ Registros procesados exitosamente: {total_processed}")
     print(f"❌ Errores encontrados: {total_errors}")
-    print(f"📈 Tasa de éxito: {(total_processed/(total_processed + total_errors)*100):.1f}%")
+    if total_processed + total_errors:
+        print(f"📈 Tasa de éxito: {(total_processed/(total_processed + total_errors)*100):.1f}%")
+    if resumen.fallidos:
+        fallidos_df = pd.DataFrame(resumen.fallidos, columns=['Nivel', 'Analito', 'Fecha', 'Valor', 'Motivo'])
+        print("❌ Fallos por nivel y motivo:")
+        print(fallidos_df.groupby(['Nivel', 'Motivo']).size().to_string())
+        fallidos_df.to_csv(FALLIDOS_PATH, index=False, encoding='utf-8')
+        print(f"📄 Detalle de fallos en '{FALLIDOS_PATH}'")
+    if resumen.comandos:
+        # Incluye login y navegación; por registro = total / registros intentados
+        intentados = max(total_processed + total_errors, 1)
+        total_comandos = sum(resumen.comandos.values())
+        consultas_dom = sum(n for c, n in resumen.comandos.items() if c in COMANDOS_DOM)
+        print(f"🔁 Idas y vueltas con WebDriver: {total_comandos} ({total_comandos / intentados:.1f} por registro)")
+        print(f"🔎 Consultas al DOM: {consultas_dom} ({consultas_dom / intentados:.1f} por registro)")
+        print("   Más frecuentes: " + ", ".join(f"{c} {n}" for c, n in resumen.comandos.most_common(5)))
+    if resumen.localizadores:
+        cache = resumen.localizadores
+        print(f"🗂️ Elementos en caché: {cache['reutilizados']} reutilizados, "
+              f"{cache['localizados']} localizados, {cache['obsoletos']} obsoletos")
+    if resumen.recuperaciones:
+        r = resumen.recuperaciones
+        print(f"🔄 Sesiones recuperadas: {r['login']} por login expirado, {r['caido']} por navegador caído")
+
+
+def duraciones_observadas(path=Trazas.TRAZAS_PATH):
+    """Segundos por paso según la mediana de las trazas previas; DURACION_ESTIMADA para lo que falte.
+
+    Devuelve (duraciones, si salieron de trazas).
+    """
+    duraciones = dict(DURACION_ESTIMADA)
+    if not path or not os.path.exists(path):
+        return duraciones, False
+    spans = pd.DataFrame(Trazas.leer_trazas(path))
+    if spans.empty:
+        return duraciones, False
+    medianas = spans.groupby('paso')['ms'].median() / 1000
+    arranque = [p for p in ('arranque_navegador', 'login', 'navegacion') if p in medianas]
+    if arranque:
+        duraciones['arranque'] = float(medianas[arranque].sum())
+    for clave, paso in (('nivel', 'abrir_nivel'), ('analito', 'abrir_analito'), ('registro', 'resultado')):
+        if paso in medianas:
+            duraciones[clave] = float(medianas[paso])
+    http = spans[spans['paso'] == 'subida_http']
+    if not http.empty and 'registros' in http and http['registros'].sum() > 0:
+        duraciones['registro_http'] = float(http['ms'].sum() / 1000 / http['registros'].sum())
+    return duraciones, True
+
+
+def imprimir_plan(records_df, todos_df, sesiones=1, particion='nivel', motor='selenium'):
+    """Plan de subida por nivel y analito, omitidos y duración estimada, sin abrir el navegador"""
+    print(f"\n🗺️ PLAN DE SUBIDA (motor {motor}, {sesiones} sesión(es), entrada {MODO_ENTRADA})")
+
+    # Una consulta por (analito, nivel, fuente), no por registro
+    claves = ['Analito', 'Nivel', 'Fuente']
+    combinaciones = records_df[claves].drop_duplicates()
+    omitir = pd.Series([should_skip_analito(a, n, f) for a, n, f in combinaciones.itertuples(index=False)],
+                       index=pd.MultiIndex.from_frame(combinaciones), dtype=bool)
+    excluido = omitir.reindex(pd.MultiIndex.from_frame(records_df[claves])).to_numpy(dtype=bool)
+    a_subir = records_df[~excluido]
+    for (analizador, _, nivel, nodo), nivel_df in a_subir.groupby(['Analizador', 'Fuente', 'Nivel', 'Nodo'],
+                                                                   sort=True, dropna=False):
+        por_analito = nivel_df.groupby('Analito', sort=True)['Fecha'].agg(['size', 'min', 'max'])
+        print(f"\n{analizador} nivel {nivel} ({nodo}): {len(nivel_df)} registro(s) en {len(por_analito)} analito(s)")
+        for analito, fila in por_analito.iterrows():
+            print(f"   {analito:<45} {fila['size']:>5}   {fila['min']} .. {fila['max']}")
+
+    if excluido.any():
+        print("\n⏭️ Se omiten (ANALITOS_EXCLUIDOS_POR_NIVEL):")
+        for (fuente, nivel, analito), n in records_df[excluido].groupby(['Fuente', 'Nivel', 'Analito']).size().items():
+            print(f"   {fuente}Nivel {nivel}: {analito} ({n} registro(s))")
+    analitos = laboratorio().analitos
+    if analitos is not None:
+        fuera = todos_df[~todos_df['Analito'].isin(analitos)]
+        if not fuera.empty:
+            print("\n🚫 En los datos pero fuera de TARGET_ANALITOS:")
+            for analito, n in fuera.groupby('Analito').size().items():
+                print(f"   {analito} ({n} registro(s))")
+        sin_datos = sorted(set(analitos) - set(todos_df['Analito'].unique()))
+        if sin_datos:
+            print("\n❔ En TARGET_ANALITOS sin datos en el rango: " + ", ".join(sin_datos))
+
+    duraciones, de_trazas = duraciones_observadas(Trazas.TRAZAS_PATH if REGISTRAR_TRAZAS else None)
+    if motor == 'http':
+        segundos = len(a_subir) * duraciones['registro_http']
+    else:
+        # Las sesiones corren en paralelo: manda la partición más larga
+        segundos = max((duraciones['arranque']
+                        + p.groupby(['Fuente', 'Nivel', 'Nodo'], dropna=False).ngroups * duraciones['nivel']
+                        + p.groupby(['Fuente', 'Nivel', 'Analito']).ngroups * duraciones['analito']
+                        + len(p) * duraciones['registro'])
+                       for p in particionar(a_subir, sesiones, particion)) if not a_subir.empty else 0
+    origen = 'mediana de trazas previas' if de_trazas else 'valores por defecto de DURACION_ESTIMADA'
+    print(f"\n📦 Total a subir: {len(a_subir)} registro(s)")
+    print(f"⏱️ Duración estimada: {segundos / 60:.1f} min ({origen})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sube los resultados de control de calidad al portal.")
+    parser.add_argument('--sesiones', type=int, default=NUM_SESIONES,
+                        help="Sesiones de navegador en paralelo, cada una con su propio login.")
+    parser.add_argument('--particion', choices=['nivel', 'analito'], default=PARTICION,
+                        help="Reparto del trabajo entre sesiones.")
+    parser.add_argument('--motor', choices=['selenium', 'http'], default=MOTOR_SUBIDA,
+                        help="Formulario en el navegador o llamadas directas al backend.")
+    parser.add_argument('--entrada', choices=['lote', 'registro'], default=MODO_ENTRADA,
+                        help="Carga por analito reutilizando elementos, o localizando todo en cada registro.")
+    parser.add_argument('--plan', action='store_true',
+                        help="Solo muestra qué se subiría y cuánto tardaría; no abre el navegador.")
+    args = parser.parse_args()
+
+    # Analitos de Configuracion.py (sin archivo: TARGET_ANALITOS)
+    analitos = laboratorio().analitos
+    if args.plan:
+        todos_df = cargar_registros(analitos=None)
+        records_df = todos_df if analitos is None else todos_df[todos_df['Analito'].isin(analitos)]
+    else:
+        records_df = cargar_registros(analitos)
+
+    if EVALUAR_WESTGARD and not args.plan:
+        # Reporte de control de calidad antes de subir nada (una serie por material)
+        Westgard.revisar(records_df.assign(Analito=clave_bitacora(records_df)))
+
+    # --plan solo lee: sin bitácora todavía, todo está pendiente
+    bitacora = abrir_bitacora(BITACORA_PATH, solo_lectura=args.plan) if USAR_BITACORA else None
+    if bitacora is not None:
+        total_inicial = len(records_df)
+        pendientes = filtrar_pendientes(bitacora, records_df.assign(Analito=clave_bitacora(records_df)))
+        records_df = records_df.loc[pendientes.index]
+        bitacora.close()
+        print(f"📒 Ya subidos según la bitácora: {total_inicial - len(records_df)}; pendientes: {len(records_df)}")
+        if records_df.empty:
+            print("✅ No hay registros pendientes. No se abre el navegador.")
+            return
+    elif USAR_BITACORA:
+        print(f"📒 Todavía no hay bitácora en '{BITACORA_PATH}': todo está pendiente")
+
+    if args.plan:
+        imprimir_plan(records_df, todos_df, args.sesiones, args.particion, args.motor)
+        return
+
+    if REGISTRAR_TRAZAS:
+        Trazas.iniciar(Trazas.TRAZAS_PATH)
+
+    try:
+        # ----------------------------------------
+        # 4) PROCESAMIENTO POR NIVEL Y ANALITO
+        # ----------------------------------------
+        if args.motor == 'http':
+            resumen = ejecutar_subida_http(records_df)
+            if resumen.fallidos and RESPALDO_SELENIUM:
+                pendientes = records_df[~records_df.index.isin(resumen.exitosos)]
+                print(f"↩️ {len(pendientes)} registro(s) fallaron por HTTP; se reintentan con Selenium")
+                resumen.fallidos = []
+                resumen = ResumenSubida.combinar(
+                    [resumen, ejecutar_subida(pendientes, args.sesiones, args.particion, args.entrada)]
+                )
+        else:
+            resumen = ejecutar_subida(records_df, args.sesiones, args.particion, args.entrada)
+
+        # ----------------------------------------
+        # 5) RESUMEN FINAL
+        # ----------------------------------------
+        imprimir_resumen_final(resumen)
+        if REGISTRAR_TRAZAS:
+            Trazas.imprimir_resumen(Trazas.spans_corrida())
+
+    finally:
+        Trazas.finalizar()
+        print("\n🔚 Proceso completado. Navegador cerrado.")
+
 
-finally:
-    # Cerrar navegador
-    driver.quit()
-    print("\n🔚 Proceso completado. Navegador cerrado.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
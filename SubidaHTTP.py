@@ -0,0 +1,174 @@
+'''
+Motor de carga sin navegador: llama directamente al backend HTTP que usa la
+aplicación Angular de CC Lab Control.
+Inicia sesión una vez, reutiliza el token y envía los resultados con sesiones
+HTTP persistentes (keep-alive) y concurrencia acotada, o en lotes si el backend
+ofrece un endpoint de lote. Registro.py lo usa con MOTOR_SUBIDA = 'http' y deja
+a Selenium como respaldo para lo que falle.
+
+Los endpoints y el formato de los mensajes se configuran abajo; deben coincidir
+con las peticiones que hace el portal (pestaña Red de las herramientas de desarrollo).
+'''
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Endpoints del backend, relativos a la URL base
+API_LOGIN = '/api/login'
+API_RESULTADOS = '/api/resultados'
+# Endpoint que acepta una lista de resultados en una sola petición (None = no disponible)
+API_RESULTADOS_LOTE = None
+TAMANO_LOTE = 50
+
+# Campo de la respuesta de login que trae el token
+CAMPO_TOKEN = 'token'
+
+# Peticiones simultáneas y tiempo máximo por petición (segundos)
+CONCURRENCIA = 8
+TIMEOUT = 15
+
+
+def payload_login(usuario, clave):
+    """Cuerpo del login; ajustar a los nombres de campo del backend"""
+    return {'usuario': usuario, 'clave': clave}
+
+
+def payload_resultado(nivel, analito, fecha_iso, valor, lote):
+    """Cuerpo de un resultado (analito con su nombre del portal); ajustar a los nombres de campo del backend"""
+    return {'nivel': int(nivel), 'lote': lote, 'analito': analito,
+            'fecha': fecha_iso, 'valor': float(valor)}
+
+
+class SesionExpirada(Exception):
+    """El backend rechazó el token (401)"""
+
+
+class ClienteHTTP:
+    """Cliente del backend con token compartido y una sesión keep-alive por hilo (cerrar() las cierra todas).
+
+    Los envíos usan un pool de hilos propio del cliente: si se reutiliza para varios
+    archivos, los hilos y sus conexiones siguen abiertos entre uno y otro.
+    """
+
+    def __init__(self, base_url, usuario, clave, concurrencia=CONCURRENCIA, timeout=TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.usuario = usuario
+        self.clave = clave
+        self.concurrencia = concurrencia
+        self.timeout = timeout
+        self.token = None
+        self.logins = 0
+        self._lock_login = threading.Lock()
+        self._local = threading.local()
+        self._sesiones = []  # Todas las sesiones creadas, de cualquier hilo
+        self._lock_sesiones = threading.Lock()
+        self._executor = None
+
+    def _sesion(self):
+        sesion = getattr(self._local, 'sesion', None)
+        if sesion is None:
+            sesion = requests.Session()
+            # Reintentos solo para errores de conexión: un POST repetido podría duplicar el resultado
+            reintentos = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+            sesion.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=reintentos))
+            sesion.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=reintentos))
+            self._local.sesion = sesion
+            with self._lock_sesiones:
+                self._sesiones.append(sesion)
+        return sesion
+
+    def login(self, token_rechazado=None):
+        """Obtiene un token nuevo; si otro hilo ya lo renovó, reutiliza ese"""
+        with self._lock_login:
+            if self.token is not None and self.token != token_rechazado:
+                return self.token
+            r = self._sesion().post(self.base_url + API_LOGIN, json=payload_login(self.usuario, self.clave),
+                                    timeout=self.timeout)
+            r.raise_for_status()
+            self.token = r.json()[CAMPO_TOKEN]
+            self.logins += 1
+            return self.token
+
+    def _post(self, ruta, cuerpo):
+        token = self.token or self.login()
+        for intento in range(2):
+            r = self._sesion().post(self.base_url + ruta, json=cuerpo, timeout=self.timeout,
+                                    headers={'Authorization': f'Bearer {token}'})
+            if r.status_code != 401:
+                r.raise_for_status()
+                return r
+            # Token vencido: renovar una vez y repetir
+            token = self.login(token_rechazado=token)
+        raise SesionExpirada("El backend rechazó el token renovado")
+
+    def subir(self, nivel, analito, fecha_iso, valor, lote):
+        self._post(API_RESULTADOS, payload_resultado(nivel, analito, fecha_iso, valor, lote))
+
+    def subir_lote(self, filas):
+        self._post(API_RESULTADOS_LOTE, [payload_resultado(*fila) for fila in filas])
+
+    def ejecutor(self):
+        """Pool de hilos de envío, creado en el primer uso"""
+        with self._lock_sesiones:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrencia, thread_name_prefix='http')
+            return self._executor
+
+    def cerrar(self):
+        with self._lock_sesiones:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock_sesiones:
+            sesiones, self._sesiones = self._sesiones, []
+            self._local = threading.local()
+        for sesion in sesiones:
+            sesion.close()
+
+
+def subir_registros(cliente, records_df, nombres_portal=None):
+    """Envía records_df (con la columna Lote de Registro.asignar_destinos) con concurrencia acotada.
+
+    Cada analito se envía con su nombre del portal (nombres_portal, nombre del CSV ->
+    nombre del portal). Genera (índices, error) a medida que terminan las peticiones:
+    error es None si el backend confirmó el guardado, o el motivo del fallo. Los
+    registros sin lote fallan sin enviarse. Con API_RESULTADOS_LOTE cada petición
+    lleva hasta TAMANO_LOTE registros.
+    """
+    nombres_portal = nombres_portal or {}
+    filas = []
+    for idx, row in zip(records_df.index, records_df.itertuples(index=False)):
+        if not isinstance(row.Lote, str):
+            yield [idx], "http: sin lote"
+            continue
+        filas.append((idx, (row.Nivel, nombres_portal.get(row.Analito, row.Analito), row.Fecha.isoformat(),
+                            row.Valor, row.Lote)))
+    if not filas:
+        return
+    if API_RESULTADOS_LOTE:
+        tareas = [filas[i:i + TAMANO_LOTE] for i in range(0, len(filas), TAMANO_LOTE)]
+        enviar = lambda tarea: cliente.subir_lote([datos for _, datos in tarea])
+    else:
+        tareas = [[fila] for fila in filas]
+        enviar = lambda tarea: cliente.subir(*tarea[0][1])
+
+    cliente.login()
+    executor = cliente.ejecutor()
+    futuros = {executor.submit(enviar, tarea): tarea for tarea in tareas}
+    try:
+        for futuro in as_completed(futuros):
+            indices = [idx for idx, _ in futuros[futuro]]
+            try:
+                futuro.result()
+            except Exception as e:
+                yield indices, f"http: {type(e).__name__}"
+            else:
+                yield indices, None
+    finally:
+        # Si el llamador abandona la carga, no quedan envíos de este archivo en vuelo
+        for futuro in futuros:
+            futuro.cancel()
+        wait(futuros)
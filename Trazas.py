@@ -0,0 +1,144 @@
+'''
+Trazas de latencia para el flujo de carga de Registro.py.
+Cada paso instrumentado (login, navegación, apertura de nivel/analito, etapas de
+ingresar_resultado, reintentos) emite una línea JSON con su duración; al final se
+resume p50/p95/máximo por paso y por nivel.
+
+Uso del resumen sobre un archivo existente:
+    python Trazas.py trazas_registro.jsonl
+'''
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Archivo JSON lines donde se acumulan las trazas (None = solo en memoria)
+TRAZAS_PATH = './trazas_registro.jsonl'
+
+# Spans que se guardan en memoria para el resumen final; en corridas largas
+# (Pipeline.py vigilando la carpeta) se descartan los más viejos
+MAX_SPANS = 50000
+
+_lock = threading.Lock()
+_local = threading.local()
+_estado = {'archivo': None, 'corrida': None, 'activa': False, 'spans': deque(maxlen=MAX_SPANS)}
+
+
+def iniciar(path=TRAZAS_PATH):
+    """Abre el archivo de trazas e identifica la corrida actual."""
+    finalizar()
+    _estado['archivo'] = open(path, 'a', encoding='utf-8') if path else None
+    _estado['corrida'] = uuid.uuid4().hex[:12]
+    _estado['spans'] = deque(maxlen=MAX_SPANS)
+    _estado['activa'] = True
+    return _estado['corrida']
+
+
+def finalizar():
+    """Cierra el archivo de trazas (las de la corrida siguen disponibles en memoria)."""
+    with _lock:
+        _estado['activa'] = False
+        if _estado['archivo'] is not None:
+            _estado['archivo'].close()
+            _estado['archivo'] = None
+
+
+@contextmanager
+def contexto(**etiquetas):
+    """Agrega etiquetas (p. ej. nivel, analito) a todos los spans del hilo actual."""
+    previas = getattr(_local, 'etiquetas', {})
+    _local.etiquetas = {**previas, **etiquetas}
+    try:
+        yield
+    finally:
+        _local.etiquetas = previas
+
+
+@contextmanager
+def span(paso, **etiquetas):
+    """Mide la duración del bloque y emite una traza.
+
+    El diccionario devuelto permite agregar etiquetas o marcar el paso como
+    fallido sin excepción (span['ok'] = False). Una excepción lo marca fallido.
+    """
+    datos = {**getattr(_local, 'etiquetas', {}), **etiquetas, 'ok': True}
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    except BaseException as e:
+        datos['ok'] = False
+        datos['error'] = type(e).__name__
+        raise
+    finally:
+        _emitir(paso, (time.perf_counter() - inicio) * 1000, datos)
+
+
+def _emitir(paso, ms, datos):
+    registro = {'ts': round(time.time(), 3), 'corrida': _estado['corrida'], 'paso': paso, 'ms': round(ms, 2), **datos}
+    with _lock:
+        # Sin iniciar() no se guarda nada: los spans se miden igual pero no se acumulan
+        if _estado['activa']:
+            _estado['spans'].append(registro)
+        if _estado['archivo'] is not None:
+            _estado['archivo'].write(json.dumps(registro, ensure_ascii=False) + '\n')
+            _estado['archivo'].flush()
+
+
+def spans_corrida():
+    """Spans emitidos en la corrida actual (los últimos MAX_SPANS)."""
+    with _lock:
+        return list(_estado['spans'])
+
+
+def resumir(spans, por=('paso',)):
+    """Tabla con n, errores, p50, p95 y máximo (ms) agrupada por las columnas `por`."""
+    df = pd.DataFrame(spans)
+    por = [c for c in por if c in df.columns]
+    if df.empty or not por:
+        return pd.DataFrame(columns=['n', 'errores', 'p50_ms', 'p95_ms', 'max_ms'])
+    df['error_paso'] = ~df['ok'].astype(bool)
+    if 'nivel' in df.columns:
+        df['nivel'] = df['nivel'].astype('Int64')
+    grupos = df.groupby(por, dropna=True)
+    return pd.DataFrame({
+        'n':       grupos['ms'].size(),
+        'errores': grupos['error_paso'].sum(),
+        'p50_ms':  grupos['ms'].quantile(0.50).round(1),
+        'p95_ms':  grupos['ms'].quantile(0.95).round(1),
+        'max_ms':  grupos['ms'].max().round(1),
+    })
+
+
+def imprimir_resumen(spans):
+    """Imprime el resumen por paso y por paso y nivel."""
+    if not spans:
+        print("⏱️ Sin trazas registradas.")
+        return
+    with pd.option_context('display.width', 140, 'display.max_rows', 200):
+        print("\n⏱️ LATENCIA POR PASO:")
+        print(resumir(spans, ('paso',)).to_string())
+        por_nivel = resumir(spans, ('nivel', 'paso'))
+        if not por_nivel.empty:
+            print("\n⏱️ LATENCIA POR NIVEL Y PASO:")
+            print(por_nivel.to_string())
+
+
+def leer_trazas(path, corrida=None):
+    """Lee un archivo de trazas, opcionalmente solo una corrida."""
+    with open(path, 'r', encoding='utf-8') as f:
+        spans = [json.loads(linea) for linea in f if linea.strip()]
+    if corrida:
+        spans = [s for s in spans if s.get('corrida') == corrida]
+    return spans
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python Trazas.py <trazas.jsonl> [corrida]", file=sys.stderr)
+        sys.exit(1)
+    imprimir_resumen(leer_trazas(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None))
@@ -0,0 +1,307 @@
+'''
+Reglas de Westgard (Levey-Jennings) sobre el historial de control de calidad.
+Cada serie (Analito, Nivel) se compara con la media y la DE de todos sus puntos
+anteriores. La primera evaluación recorre el historial completo de forma
+vectorizada; después solo se evalúan los puntos nuevos, con la media y la DE
+actualizadas en O(1) por punto (Welford) desde el estado guardado en ESTADO_PATH.
+Un punto con fecha anterior a la última evaluada de su serie (un export atrasado)
+se suma a la media y la DE y se evalúa solo con 1-2s/1-3s; las fechas ya contadas
+de cada serie quedan en el estado para no sumar dos veces un export que se repite.
+
+Reglas (por serie, en orden de fecha; z = desviaciones respecto de la media):
+  1-2s  |z| > 2 (advertencia)          1-3s  |z| > 3
+  2-2s  2 seguidos > +2 o < -2         R-4s  uno > +2 y el anterior < -2 (o al revés)
+  4-1s  4 seguidos > +1 o < -1         10x   10 seguidos del mismo lado de la media
+
+Uso: python Westgard.py [--completo]
+'''
+import argparse
+import json
+import math
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Estado por serie (n, media, M2, fechas contadas y últimos z) entre corridas
+ESTADO_PATH = './westgard_estado.json'
+# Reporte acumulado de resultados marcados
+REPORTE_PATH = './reporte_westgard.csv'
+
+# Puntos previos necesarios antes de evaluar una serie - MODIFICA SEGÚN NECESITES
+MIN_PUNTOS = 20
+
+REGLAS = ['1-2s', '1-3s', '2-2s', 'R-4s', '4-1s', '10x']
+REGLAS_ADVERTENCIA = {'1-2s'}
+# Últimos z que se conservan por serie: la regla 10x mira el punto actual y 9 anteriores
+LARGO_COLA = 9
+
+
+# Separación entre series al comparar (serie, ordinal de la fecha) como un solo entero
+_DIAS_SERIE = 10 ** 7
+
+
+def _clave(analito, nivel):
+    return f"{analito}|{int(nivel)}"
+
+
+def _racha(condicion, inicio):
+    """Largo de la racha de True que termina en cada posición, reiniciando al comenzar cada serie"""
+    idx = np.arange(len(condicion))
+    reinicio = np.where(~condicion, idx, np.where(inicio, idx - 1, -1))
+    return np.where(condicion, idx - np.maximum.accumulate(reinicio), 0)
+
+
+def evaluar_historial(records_df):
+    """Evalúa todo el historial de records_df de forma vectorizada.
+
+    Devuelve (evaluados, estado): evaluados tiene Fecha, Analito, Nivel, Valor,
+    Media, DE, Z y una columna booleana por regla; estado es el punto de partida
+    para evaluar_nuevos.
+    """
+    df = records_df[['Fecha', 'Analito', 'Nivel', 'Valor']].copy()
+    df['Nivel'] = df['Nivel'].astype('int64')
+    df['Valor'] = df['Valor'].astype('float64')
+    df = df.sort_values(['Analito', 'Nivel', 'Fecha'], kind='stable').reset_index(drop=True)
+    if df.empty:
+        return _columnas_evaluacion(df), {}
+
+    serie = df.groupby(['Analito', 'Nivel'], sort=False).ngroup().to_numpy()
+    x = df['Valor'].to_numpy()
+    idx = np.arange(len(x))
+    inicio = np.r_[True, serie[1:] != serie[:-1]]
+    primer_idx = np.maximum.accumulate(np.where(inicio, idx, 0))
+
+    # Sumas de los puntos anteriores de la serie; centrar en el primer valor mejora la precisión
+    xc = x - x[primer_idx]
+    n = (idx - primer_idx).astype('float64')
+    s1 = pd.Series(xc).groupby(serie).cumsum().to_numpy() - xc
+    s2 = pd.Series(xc * xc).groupby(serie).cumsum().to_numpy() - xc * xc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = np.where(n > 0, x[primer_idx] + s1 / n, np.nan)
+        var = np.where(n > 1, (s2 - s1 * s1 / n) / (n - 1), np.nan)
+        de = np.sqrt(np.clip(var, 0, None))
+        z = np.where((n >= MIN_PUNTOS) & (de > 0), (x - media) / de, np.nan)
+
+    z_prev = np.where(inicio, np.nan, np.r_[np.nan, z[:-1]])
+    df['Media'] = media
+    df['DE'] = de
+    df['Z'] = z
+    df['1-2s'] = np.abs(z) > 2
+    df['1-3s'] = np.abs(z) > 3
+    df['2-2s'] = (_racha(z > 2, inicio) >= 2) | (_racha(z < -2, inicio) >= 2)
+    df['R-4s'] = ((z > 2) & (z_prev < -2)) | ((z < -2) & (z_prev > 2))
+    df['4-1s'] = (_racha(z > 1, inicio) >= 4) | (_racha(z < -1, inicio) >= 4)
+    df['10x'] = (_racha(z > 0, inicio) >= 10) | (_racha(z < 0, inicio) >= 10)
+
+    # Estado final por serie, equivalente al que dejaría Welford tras recorrer cada punto
+    grupos = df.groupby(['Analito', 'Nivel'], sort=False)
+    finales = grupos.agg(n=('Valor', 'size'), media=('Valor', 'mean'),
+                         var=('Valor', lambda v: v.var(ddof=0)), ultima=('Fecha', 'max'))
+    colas = grupos['Z'].apply(lambda s: s.iloc[-LARGO_COLA:].tolist())
+    fechas = grupos['Fecha'].apply(lambda s: sorted({d.toordinal() for d in s}))
+    estado = {}
+    for (analito, nivel), fila in finales.iterrows():
+        estado[_clave(analito, nivel)] = {
+            'n': int(fila['n']),
+            'media': float(fila['media']),
+            'm2': float(fila['var'] * fila['n']),
+            'ultima_fecha': fila['ultima'].isoformat(),
+            'fechas': fechas[(analito, nivel)],
+            'cola': [None if math.isnan(v) else v for v in colas[(analito, nivel)]],
+        }
+    return df, estado
+
+
+def _reglas_ventana(ventana):
+    """Reglas que dispara el último z de ventana (los anteriores son la historia reciente)"""
+    def ultimos(k, condicion):
+        return len(ventana) >= k and all(condicion(v) for v in ventana[-k:])
+
+    z = ventana[-1]
+    previo = ventana[-2] if len(ventana) > 1 else math.nan
+    return {
+        '1-2s': abs(z) > 2,
+        '1-3s': abs(z) > 3,
+        '2-2s': ultimos(2, lambda v: v > 2) or ultimos(2, lambda v: v < -2),
+        'R-4s': (z > 2 and previo < -2) or (z < -2 and previo > 2),
+        '4-1s': ultimos(4, lambda v: v > 1) or ultimos(4, lambda v: v < -1),
+        '10x':  ultimos(10, lambda v: v > 0) or ultimos(10, lambda v: v < 0),
+    }
+
+
+def evaluar_nuevos(records_df, estado):
+    """Evalúa solo los puntos que todavía no cuentan en el estado de su serie.
+
+    Los posteriores a la última fecha se evalúan en orden con todas las reglas;
+    los atrasados (fecha anterior, todavía no contada) se suman a la media y la DE
+    y se evalúan solo con 1-2s y 1-3s. Las series que no están en estado se
+    evalúan completas con evaluar_historial. estado se actualiza en el lugar.
+    Devuelve los puntos evaluados.
+    """
+    df = records_df[['Fecha', 'Analito', 'Nivel', 'Valor']].copy()
+    df['Nivel'] = df['Nivel'].astype('int64')
+    ultimas = pd.DataFrame(
+        [(*clave.rsplit('|', 1), date.fromisoformat(e['ultima_fecha']), codigo)
+         for codigo, (clave, e) in enumerate(estado.items())],
+        columns=['Analito', 'Nivel', '_ultima', '_serie'],
+    ).astype({'Nivel': 'int64'})
+    df = df.merge(ultimas, on=['Analito', 'Nivel'], how='left')
+    conocida = df['_ultima'].notna().to_numpy()
+
+    nuevas, estado_nuevas = evaluar_historial(df[~conocida].drop(columns=['_ultima', '_serie']))
+
+    conocidos = df[conocida]
+    atrasado = conocidos['Fecha'].to_numpy() <= conocidos['_ultima'].to_numpy()
+    if atrasado.any():
+        # Los atrasados de fechas ya contadas se descartan (el mismo export procesado otra vez).
+        # Claves serie * _DIAS_SERIE + ordinal; las contadas salen ordenadas (series en orden, fechas ordenadas)
+        contadas = np.concatenate([codigo * _DIAS_SERIE + np.asarray(e['fechas'], dtype='int64')
+                                   for codigo, e in enumerate(estado.values())])
+        dias, unicos = pd.factorize(conocidos['Fecha'].to_numpy()[atrasado])
+        ordinales = np.array([fecha.toordinal() for fecha in unicos], dtype='int64')[dias]
+        claves = conocidos['_serie'].to_numpy()[atrasado].astype('int64') * _DIAS_SERIE + ordinales
+        posicion = np.minimum(np.searchsorted(contadas, claves), max(len(contadas) - 1, 0))
+        repetido = np.zeros(len(conocidos), dtype=bool)
+        if len(contadas):
+            repetido[atrasado] = contadas[posicion] == claves
+        conocidos, atrasado = conocidos[~repetido], atrasado[~repetido]
+    estado.update(estado_nuevas)
+    # Atrasados primero (no mueven la cola) y después los nuevos en orden de fecha
+    conocidos = conocidos.assign(_atrasado=atrasado).sort_values(
+        ['Analito', 'Nivel', '_atrasado', 'Fecha'], ascending=[True, True, False, True], kind='stable')
+
+    filas, atrasados = [], 0
+    for (analito, nivel), grupo in conocidos.groupby(['Analito', 'Nivel'], sort=False):
+        e = estado[_clave(analito, nivel)]
+        n, media, m2 = e['n'], e['media'], e['m2']
+        fechas = set(e['fechas'])
+        cola = [math.nan if v is None else v for v in e['cola']]
+        for fecha, valor, es_atrasado in zip(grupo['Fecha'], grupo['Valor'].astype('float64'), grupo['_atrasado']):
+            de = math.sqrt(m2 / (n - 1)) if n > 1 else math.nan
+            z = (valor - media) / de if n >= MIN_PUNTOS and de > 0 else math.nan
+            if es_atrasado:
+                atrasados += 1
+                reglas = _reglas_ventana([z])  # Sin los puntos vecinos solo pueden dispararse 1-2s y 1-3s
+            else:
+                ventana = cola + [z]
+                reglas = _reglas_ventana(ventana)
+                cola = ventana[-LARGO_COLA:]
+            filas.append({'Fecha': fecha, 'Analito': analito, 'Nivel': nivel, 'Valor': valor,
+                          'Media': media if n > 0 else math.nan, 'DE': de, 'Z': z, **reglas})
+            # Welford
+            n += 1
+            delta = valor - media
+            media += delta / n
+            m2 += delta * (valor - media)
+            fechas.add(fecha.toordinal())
+        ultima = max(date.fromisoformat(e['ultima_fecha']), max(grupo['Fecha']))
+        e.update(n=n, media=media, m2=m2, ultima_fecha=ultima.isoformat(), fechas=sorted(fechas),
+                 cola=[None if math.isnan(v) else v for v in cola])
+
+    if atrasados:
+        print(f"⚠️ Westgard: {atrasados} punto(s) con fecha anterior a la última evaluada de su serie; "
+              "se suman a la media/DE y se evalúan solo con 1-2s y 1-3s")
+    evaluados = pd.concat([nuevas, _columnas_evaluacion(pd.DataFrame(filas))], ignore_index=True)
+    return evaluados
+
+
+def _columnas_evaluacion(df):
+    columnas = ['Fecha', 'Analito', 'Nivel', 'Valor', 'Media', 'DE', 'Z'] + REGLAS
+    return df.reindex(columns=columnas)
+
+
+def evaluar(records_df, estado):
+    """Evaluación completa si estado está vacío; si no, solo los puntos nuevos. Actualiza estado."""
+    if not estado:
+        evaluados, nuevo = evaluar_historial(records_df)
+        estado.update(nuevo)
+        return evaluados
+    return evaluar_nuevos(records_df, estado)
+
+
+def reporte(evaluados):
+    """Filas que dispararon alguna regla, con la lista de reglas y el tipo (advertencia/rechazo)"""
+    if evaluados.empty:
+        return pd.DataFrame(columns=['Fecha', 'Analito', 'Nivel', 'Valor', 'Media', 'DE', 'Z', 'Reglas', 'Tipo'])
+    marcas = evaluados[REGLAS].fillna(False).astype(bool)
+    marcados = evaluados[marcas.any(axis=1)].copy()
+    marcas = marcas.loc[marcados.index]
+    marcados['Reglas'] = [', '.join(r for r, m in zip(REGLAS, fila) if m) for fila in marcas.to_numpy()]
+    rechazo = marcas[[r for r in REGLAS if r not in REGLAS_ADVERTENCIA]].any(axis=1)
+    marcados['Tipo'] = np.where(rechazo, 'rechazo', 'advertencia')
+    return marcados[['Fecha', 'Analito', 'Nivel', 'Valor', 'Media', 'DE', 'Z', 'Reglas', 'Tipo']].round(
+        {'Media': 4, 'DE': 4, 'Z': 2})
+
+
+def cargar_estado(path=ESTADO_PATH):
+    """Devuelve el estado {clave: serie}; vacío si no existe, está dañado o es de una versión anterior (se evalúa todo)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ No se pudo leer el estado de Westgard '{path}' ({e}); se evalúa todo el historial.")
+        return {}
+    if datos.get('version') != 2:
+        # Sin las fechas contadas por serie no se pueden reconocer los puntos atrasados
+        print(f"⚠️ El estado de Westgard '{path}' es de una versión anterior; se evalúa todo el historial.")
+        return {}
+    return datos.get('series', {})
+
+
+def guardar_estado(estado, path=ESTADO_PATH):
+    """Escribe el estado de forma atómica (archivo temporal + reemplazo)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 2, 'min_puntos': MIN_PUNTOS, 'series': estado}, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def imprimir_reporte(marcados, evaluados):
+    print(f"\n🚦 WESTGARD: {len(evaluados)} punto(s) evaluado(s), "
+          f"{(marcados['Tipo'] == 'rechazo').sum()} rechazo(s), {(marcados['Tipo'] == 'advertencia').sum()} advertencia(s)")
+    rechazos = marcados[marcados['Tipo'] == 'rechazo']
+    if not rechazos.empty:
+        print(rechazos.sort_values(['Fecha', 'Analito', 'Nivel']).to_string(index=False))
+
+
+def historial_completo():
+    """Registros de todas las plantillas (Registro.cargar_registros) con una serie por material"""
+    import Registro
+
+    records_df = Registro.cargar_registros(Registro.laboratorio().analitos)
+    if records_df.empty:
+        return records_df
+    return records_df.assign(Analito=Registro.clave_bitacora(records_df))
+
+
+def revisar(records_df, estado_path=ESTADO_PATH, reporte_path=REPORTE_PATH, completo=False):
+    """Evalúa los puntos nuevos de records_df, guarda el estado y agrega los marcados a reporte_path"""
+    estado = {} if completo else cargar_estado(estado_path)
+    evaluados = evaluar(records_df, estado)
+    guardar_estado(estado, estado_path)
+
+    marcados = reporte(evaluados)
+    imprimir_reporte(marcados, evaluados)
+    if not marcados.empty:
+        marcados.insert(0, 'Evaluado', datetime.now().isoformat(timespec='seconds'))
+        nuevo = completo or not os.path.exists(reporte_path)
+        marcados.to_csv(reporte_path, mode='w' if nuevo else 'a', header=nuevo, index=False, encoding='utf-8')
+        print(f"📄 Reporte de Westgard en '{reporte_path}'")
+    return marcados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evalúa las reglas de Westgard sobre el historial de control.")
+    parser.add_argument('--completo', action='store_true',
+                        help="Descarta el estado guardado y reevalúa todo el historial.")
+    args = parser.parse_args()
+    # Una serie por material de Configuracion.py, como en Registro.main
+    revisar(historial_completo(), completo=args.completo)
+
+
+if __name__ == '__main__':
+    main()
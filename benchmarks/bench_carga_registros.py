@@ -0,0 +1,94 @@
+'''
+Benchmark de la carga de plantillas en Registro.py: compara el recorrido
+anterior (iterrows + float() por celda) con cargar_registros_csv sobre
+varios años de plantillas sintéticas.
+
+Uso: python benchmarks/bench_carga_registros.py [anios]
+'''
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from Extraccion import code_mapping
+from Registro import TARGET_ANALITOS, cargar_registros_csv, fname_pattern
+
+
+def generar_plantillas(carpeta, dias, semilla=0, inicio=date(2022, 1, 1)):
+    """Escribe una plantilla ancha por día, con algunos ceros como en las reales."""
+    rng = random.Random(semilla)
+    filas = sorted(code_mapping.values())
+    for i in range(dias):
+        dia = inicio + timedelta(days=i)
+        df = pd.DataFrame({
+            'ID':      [aid for aid, _ in filas],
+            'ANALITO': [nombre for _, nombre in filas],
+            **{f'NIVEL {n}': [0.0 if rng.random() < 0.1 else round(rng.uniform(1, 500), 2) for _ in filas]
+               for n in (1, 2, 3)},
+        })
+        df.to_csv(os.path.join(carpeta, f"{dia:%m_%d_%Y}.csv"), index=False, encoding='utf-8')
+
+
+def cargar_anterior(folder):
+    """Recorrido previo, conservado solo como referencia para el benchmark."""
+    all_records = []
+    for fname in os.listdir(folder):
+        m = fname_pattern.match(fname)
+        if not m:
+            continue
+        mm, dd, yyyy, _ = m.groups()
+        dt = date(int(yyyy), int(mm), int(dd))
+        df = pd.read_csv(os.path.join(folder, fname), encoding='utf-8')
+        for _, row in df.iterrows():
+            for n in (1, 2, 3):
+                try:
+                    valor = float(row.get(f'NIVEL {n}', 0))
+                except (TypeError, ValueError):
+                    continue
+                if valor == 0:
+                    continue
+                all_records.append((dt, n, row['ANALITO'], valor))
+    records_df = pd.DataFrame(all_records, columns=['Fecha', 'Nivel', 'Analito', 'Valor'])
+    return records_df[records_df['Analito'].isin(TARGET_ANALITOS)]
+
+
+def _ordenar(df):
+    return df.sort_values(['Nivel', 'Analito', 'Fecha']).reset_index(drop=True)
+
+
+def main():
+    anios = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        generar_plantillas(carpeta, 365 * anios)
+
+        inicio = time.perf_counter()
+        ref = cargar_anterior(carpeta)
+        t_anterior = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        nuevo = cargar_registros_csv(carpeta, analitos=TARGET_ANALITOS)
+        t_nuevo = time.perf_counter() - inicio
+
+        desde = date(2022 + anios - 1, 1, 1)
+        inicio = time.perf_counter()
+        ventana = cargar_registros_csv(carpeta, desde=desde, analitos=TARGET_ANALITOS)
+        t_ventana = time.perf_counter() - inicio
+
+    pd.testing.assert_frame_equal(_ordenar(ref), _ordenar(nuevo), check_dtype=False)
+    assert ventana['Fecha'].min() >= desde
+
+    print(f"{365 * anios} plantillas, {len(nuevo)} registros")
+    print(f"iterrows:          {t_anterior:.2f} s")
+    print(f"Vectorizado:       {t_nuevo:.2f} s (x{t_anterior / t_nuevo:.1f})")
+    print(f"Último año (desde {desde}): {t_ventana:.2f} s, {len(ventana)} registros")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+'''
+Mide el cubo de KPI.py con años de plantillas diarias sintéticas: carga inicial,
+actualización de un día y consultas por rango (con bordes de mes) frente a
+recalcular desde los registros crudos con pandas.
+
+Uso: python benchmarks/bench_kpi.py [anios]
+'''
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pandas as pd
+
+import KPI
+from Extraccion import _columnas_nivel, _ids, _nombres
+
+
+def plantilla(rng):
+    valores = rng.uniform(5, 300, (len(_ids), 3)).round(2)
+    df = pd.DataFrame(valores, columns=_columnas_nivel)
+    df.insert(0, 'ANALITO', _nombres)
+    df.insert(0, 'ID', _ids)
+    return df
+
+
+def main():
+    anios = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = np.random.default_rng(3)
+    dias = [date(2020, 1, 1) + timedelta(days=i) for i in range(int(anios * 365))]
+    archivos = [(f"AU480_{d:%Y%m%d}.txt", d.strftime('%m_%d_%Y'), plantilla(rng)) for d in dias]
+
+    crudo = pd.concat([df.assign(Fecha=date(int(f[6:]), int(f[:2]), int(f[3:5]))) for _, f, df in archivos])
+    crudo = crudo.melt(id_vars=['Fecha', 'ID'], value_vars=_columnas_nivel, var_name='Nivel', value_name='Valor')
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        path = os.path.join(carpeta, 'kpi.sqlite')
+        inicio = time.perf_counter()
+        KPI.actualizar_archivos(archivos[:-1], path)
+        t_carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        KPI.actualizar_archivos(archivos[-1:], path)
+        t_dia = time.perf_counter() - inicio
+
+        desde, hasta = dias[17], dias[-40]
+        conn = KPI.abrir_kpi(path)
+        inicio = time.perf_counter()
+        kpis = KPI.consultar(conn, desde, hasta)
+        t_consulta = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        KPI.consultar(conn, desde, hasta, mensual=True)
+        t_mensual = time.perf_counter() - inicio
+        conn.close()
+
+    inicio = time.perf_counter()
+    rango = crudo[(crudo['Fecha'] >= desde) & (crudo['Fecha'] <= hasta)]
+    esperado = rango.groupby(['ID', 'Nivel'])['Valor'].agg(['size', 'mean', 'std'])
+    t_crudo = time.perf_counter() - inicio
+
+    print(f"{len(archivos)} plantillas diarias, {len(crudo)} valores")
+    print(f"Carga inicial: {t_carga:.2f} s; un día nuevo: {t_dia * 1000:.1f} ms")
+    print(f"Consulta {desde} .. {hasta}: {t_consulta * 1000:.1f} ms (mensual {t_mensual * 1000:.1f} ms); "
+          f"pandas sobre los datos crudos en memoria: {t_crudo * 1000:.1f} ms")
+    iguales = (kpis['n'].to_numpy() == esperado['size'].to_numpy()).all() and \
+        np.allclose(kpis['Media'], esperado['mean'], atol=1e-3) and np.allclose(kpis['DE'], esperado['std'], atol=1e-3)
+    print(f"Mismo resultado que recalcular: {'sí' if iguales else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+Compara los modos de entrada de Registro.py ('registro' y 'lote') contra el
+portal simulado: idas y vueltas con WebDriver, consultas al DOM y tiempo por
+registro. Requiere Chrome y chromedriver (perfil 'headless').
+
+Uso: python benchmarks/bench_modo_entrada.py [dias] [latencia]
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+import Registro
+import Trazas
+from portal_simulado import iniciar_portal
+from prueba_subida_paralela import registros_sinteticos, reiniciar
+
+
+def main():
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    servidor, url, _ = iniciar_portal(latencia=latencia)
+    Registro.PORTAL_URL = url
+    Registro.USAR_BITACORA = False
+    Registro.PERFIL_NAVEGADOR = 'headless'
+    records_df = registros_sinteticos(dias)
+
+    filas = []
+    try:
+        for modo in ('registro', 'lote'):
+            reiniciar(url)
+            Trazas.iniciar(None)
+            resumen = Registro.ejecutar_subida(records_df, 1, entrada=modo)
+            spans = pd.DataFrame(Trazas.spans_corrida())
+            intentados = max(resumen.procesados + len(resumen.fallidos), 1)
+            dom = sum(n for c, n in resumen.comandos.items() if c in Registro.COMANDOS_DOM)
+            filas.append({
+                'modo': modo,
+                'ok': resumen.procesados,
+                'fallidos': len(resumen.fallidos),
+                'comandos_por_registro': round(sum(resumen.comandos.values()) / intentados, 1),
+                'dom_por_registro': round(dom / intentados, 1),
+                'registro_p50_ms': round(spans.loc[spans['paso'] == 'resultado', 'ms'].median(), 1),
+            })
+    finally:
+        servidor.shutdown()
+        Trazas.finalizar()
+
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
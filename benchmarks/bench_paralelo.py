@@ -0,0 +1,43 @@
+'''
+Benchmark del primer pase de Extraccion.py con distintos números de procesos.
+Verifica además que los resultados llegan en el mismo orden que en serie.
+
+Uso: python benchmarks/bench_paralelo.py [n_archivos] [lineas_relleno]
+'''
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Extraccion import procesar_archivos
+from sinteticos import generar_carpeta
+
+
+def main():
+    n_archivos = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lineas_relleno = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    nucleos = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = generar_carpeta(carpeta, n_archivos, lineas_relleno)
+        referencia = None
+        t_serie = None
+        for workers in sorted({1, 2, 4, nucleos}):
+            if workers > nucleos:
+                continue
+            inicio = time.perf_counter()
+            resultados = procesar_archivos(rutas, workers)
+            transcurrido = time.perf_counter() - inicio
+
+            fechas = [fecha for _, fecha, _ in resultados]
+            if referencia is None:
+                referencia, t_serie = fechas, transcurrido
+            assert fechas == referencia, "El orden de los resultados cambió con el pool"
+            print(f"{workers:>3} procesos: {transcurrido:.2f} s "
+                  f"({n_archivos / transcurrido:.0f} archivos/s, x{t_serie / transcurrido:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+'''
+Benchmark del parser de exports del AU480: compara la versión anterior de
+procesar_archivo_txt (readlines + dos recorridos + df.at por coincidencia)
+con el parser de una sola pasada de Extraccion.py.
+
+Uso: python benchmarks/bench_parser.py [n_archivos] [lineas_relleno]
+'''
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from Extraccion import code_mapping, pattern_valores, stop_markers, procesar_archivo_txt
+from sinteticos import generar_carpeta
+
+
+def procesar_archivo_txt_anterior(file_path):
+    """Implementación previa, conservada solo como referencia para el benchmark."""
+    with open(file_path, 'r', encoding='latin-1') as f:
+        lines = f.readlines()
+
+    base_rows = []
+    for code, (aid, aname) in code_mapping.items():
+        base_rows.append({'ID': aid, 'ANALITO': aname, 'NIVEL 1': 0.0, 'NIVEL 2': 0.0, 'NIVEL 3': 0.0})
+    df = pd.DataFrame(base_rows).sort_values('ID').reset_index(drop=True)
+
+    fecha_extraida = None
+    for raw_line in lines:
+        if 'NDICE' in raw_line.upper():
+            idx = raw_line.upper().find('NDICE') + len('NDICE')
+            fecha_extraida = raw_line[idx:].strip().split(' ')[0].replace('/', '_')
+            break
+
+    procesando = False
+    for raw_line in lines:
+        line_up = raw_line.upper()
+        if 'LYPHOCHEK-ASSAYED' in line_up:
+            procesando = True
+            continue
+        if procesando and any(marker in line_up for marker in stop_markers):
+            procesando = False
+            continue
+        if not procesando:
+            continue
+        for m in pattern_valores.finditer(line_up):
+            code = m.group(1).strip().upper()
+            if code.endswith('-C'):
+                code = code[:-2]
+            code = code.replace('-', '')
+            if code not in code_mapping:
+                continue
+            analyte_id, _ = code_mapping[code]
+            fila_idx = df.index[df['ID'] == analyte_id]
+            if len(fila_idx) != 1:
+                continue
+            df.at[fila_idx[0], f'NIVEL {int(m.group(2))}'] = float(m.group(3))
+
+    totales = df[['NIVEL 1', 'NIVEL 2', 'NIVEL 3']].sum(axis=1)
+    if (totales == 0).all():
+        return None, fecha_extraida
+    return df, fecha_extraida
+
+
+def medir(funcion, rutas):
+    inicio = time.perf_counter()
+    salidas = [funcion(ruta) for ruta in rutas]
+    return time.perf_counter() - inicio, salidas
+
+
+def main():
+    n_archivos = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    lineas_relleno = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = generar_carpeta(carpeta, n_archivos, lineas_relleno)
+        megas = sum(os.path.getsize(r) for r in rutas) / 1e6
+
+        t_anterior, ref = medir(procesar_archivo_txt_anterior, rutas)
+        t_nuevo, nuevo = medir(procesar_archivo_txt, rutas)
+
+    for (df_a, fecha_a), (df_b, fecha_b) in zip(ref, nuevo):
+        assert fecha_a == fecha_b
+        # La versión anterior agregaba columnas para niveles fuera de 1-3 (el generador incluye algunos)
+        pd.testing.assert_frame_equal(df_a[df_b.columns], df_b, check_dtype=False)
+
+    print(f"{n_archivos} archivos, {megas:.1f} MB")
+    print(f"Anterior:     {t_anterior:.3f} s ({n_archivos / t_anterior:.1f} archivos/s)")
+    print(f"Una pasada:   {t_nuevo:.3f} s ({n_archivos / t_nuevo:.1f} archivos/s)")
+    print(f"Aceleración:  x{t_anterior / t_nuevo:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''
+Compara los perfiles de arranque de Chrome (PERFILES_NAVEGADOR de Registro.py)
+contra el portal simulado: tiempo de arranque en frío (Chrome + login) y tiempo
+por registro en régimen estable. Cada perfil corre dos veces para mostrar el
+efecto de reutilizar la carpeta de perfil (login omitido en la segunda corrida).
+Requiere Chrome y chromedriver; el perfil 'completo' necesita pantalla.
+
+Uso: python benchmarks/bench_perfiles_navegador.py [dias] [latencia]
+'''
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+import Registro
+import Trazas
+from portal_simulado import iniciar_portal
+from prueba_subida_paralela import registros_sinteticos
+
+
+def medir_corrida(records_df):
+    Trazas.iniciar(None)
+    resumen = Registro.ejecutar_subida(records_df, 1)
+    spans = pd.DataFrame(Trazas.spans_corrida())
+    arranque = spans.loc[spans['paso'].isin(['arranque_navegador', 'login']), 'ms'].sum()
+    por_registro = spans.loc[spans['paso'] == 'resultado', 'ms'].median()
+    return resumen, arranque, por_registro
+
+
+def main():
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    servidor, url, _ = iniciar_portal(latencia=latencia)
+    Registro.PORTAL_URL = url
+    Registro.USAR_BITACORA = False
+    records_df = registros_sinteticos(dias)
+
+    filas = []
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            for nombre, perfil in Registro.PERFILES_NAVEGADOR.items():
+                if not perfil['headless'] and sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+                    print(f"ℹ️ Se omite '{nombre}': necesita pantalla")
+                    continue
+                if perfil['perfil_usuario']:
+                    perfil = {**perfil, 'perfil_usuario': os.path.join(carpeta, nombre)}
+                    Registro.PERFILES_NAVEGADOR[nombre] = perfil
+                Registro.PERFIL_NAVEGADOR = nombre
+                for corrida in (1, 2):
+                    resumen, arranque, por_registro = medir_corrida(records_df)
+                    filas.append({'perfil': nombre, 'corrida': corrida, 'arranque_ms': round(arranque),
+                                  'registro_p50_ms': round(por_registro, 1),
+                                  'ok': resumen.procesados, 'fallidos': len(resumen.fallidos)})
+    finally:
+        servidor.shutdown()
+        Trazas.finalizar()
+
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
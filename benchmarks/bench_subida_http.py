@@ -0,0 +1,51 @@
+'''
+Benchmark del motor de carga sin navegador (SubidaHTTP.py) contra el backend
+simulado: registros por segundo y milisegundos por registro con distintas
+concurrencias, por registro y en lotes. Verifica que cada registro llegue una vez.
+
+Uso: python benchmarks/bench_subida_http.py [dias] [latencia]
+'''
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import Registro
+import SubidaHTTP
+from portal_simulado import iniciar_portal
+from prueba_subida_paralela import recibidos, registros_sinteticos, reiniciar
+
+
+def main():
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    servidor, url, _ = iniciar_portal(latencia=latencia)
+    records_df = Registro.asignar_destinos(registros_sinteticos(dias))
+    esperados = Counter((int(r.Nivel), r.Analito, r.Fecha.isoformat(), float(r.Valor))
+                        for r in records_df.itertuples())
+    print(f"{len(records_df)} registros, latencia del backend {latencia * 1000:.0f} ms")
+    try:
+        for lote, concurrencia in ((None, 1), (None, 8), (None, 32), ('/api/resultados/lote', 4)):
+            reiniciar(url)
+            SubidaHTTP.API_RESULTADOS_LOTE = lote
+            cliente = SubidaHTTP.ClienteHTTP(url, 'usuario', 'clave', concurrencia=concurrencia)
+            inicio = time.perf_counter()
+            errores = [e for _, e in SubidaHTTP.subir_registros(cliente, records_df) if e]
+            transcurrido = time.perf_counter() - inicio
+            cliente.cerrar()
+
+            obtenidos = Counter((r['nivel'], r['analito'], r['fecha'], r['valor']) for r in recibidos(url))
+            assert not errores and obtenidos == esperados, errores[:5]
+            modo = f"lotes de {SubidaHTTP.TAMANO_LOTE}" if lote else "por registro"
+            print(f"{modo:>15}, concurrencia {concurrencia:>2}: {transcurrido:.2f} s, "
+                  f"{len(records_df) / transcurrido:.0f} registros/s, "
+                  f"{transcurrido / len(records_df) * 1000:.1f} ms/registro")
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
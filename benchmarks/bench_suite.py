@@ -0,0 +1,233 @@
+'''
+Suite de benchmarks de extremo a extremo con datos sintéticos (sinteticos.py)
+y el portal simulado (portal_simulado.py), a varios tamaños:
+  parser      archivos/s y MB/s de procesar_archivos; verifica cada valor leído
+  extraccion  archivos/s y MB/s de Extraccion.py completo (plantillas, manifiesto y KPI)
+  subida_http registros/min con el motor HTTP, a partir de las plantillas generadas
+  subida_selenium  registros/min con el navegador (--selenium; requiere Chrome)
+Cada medición se agrega como una línea JSON a HISTORIAL_PATH (fecha, commit,
+equipo y parámetros) y se compara con la anterior equivalente del historial.
+
+Uso: python benchmarks/bench_suite.py [--tamanos 10,50,200] [--relleno 2000]
+                                      [--latencia 0.02] [--selenium] [--historial ruta]
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+import Extraccion
+import Registro
+from portal_simulado import iniciar_portal
+from prueba_subida_paralela import recibidos, reiniciar
+from sinteticos import generar_carpeta
+
+# Historial de mediciones (JSON lines) - MODIFICA SEGÚN NECESITES
+HISTORIAL_PATH = './historial_benchmarks.jsonl'
+
+# Archivos diarios por tamaño medido y líneas de relleno por archivo
+TAMANOS = [10, 50, 200]
+LINEAS_RELLENO = 2000
+
+# Latencia del portal simulado por petición a la API (segundos)
+LATENCIA = 0.02
+
+# El navegador es mucho más lento: archivos por tamaño medido con --selenium
+TAMANOS_SELENIUM = [1, 3]
+
+
+def entorno():
+    """Datos de la corrida para comparar mediciones entre equipos y versiones"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'equipo': platform.node(),
+        'cpus': os.cpu_count(),
+    }
+
+
+@contextlib.contextmanager
+def en_carpeta(carpeta):
+    """Corre el bloque con carpeta como directorio actual y sin la salida por consola"""
+    anterior = os.getcwd()
+    os.chdir(carpeta)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.chdir(anterior)
+
+
+def valores_distintos(rutas, resultados, esperados):
+    """Cantidad de valores leídos por el parser que no coinciden con los generados"""
+    distintos = 0
+    for ruta, (df_res, _, error) in zip(rutas, resultados):
+        if error is not None or df_res is None:
+            distintos += len(esperados[ruta])
+            continue
+        tabla = df_res[Extraccion._columnas_nivel].to_numpy()
+        distintos += int(sum(tabla[Extraccion._fila_por_codigo[code], nivel - 1] != valor
+                         for (code, nivel), valor in esperados[ruta].items()))
+    return distintos
+
+
+def medir_extraccion(carpeta, n_archivos, relleno):
+    """Genera n_archivos exports en carpeta/Datos_txt y mide el parser y Extraccion.py completo"""
+    esperados = {}
+    rutas = generar_carpeta(os.path.join(carpeta, 'Datos_txt'), n_archivos, relleno, esperados=esperados)
+    megas = sum(os.path.getsize(r) for r in rutas) / 1e6
+
+    inicio = time.perf_counter()
+    resultados = Extraccion.procesar_archivos(rutas)
+    t_parser = time.perf_counter() - inicio
+    distintos = valores_distintos(rutas, resultados, esperados)
+
+    os.makedirs(os.path.join(carpeta, 'Plantillas'), exist_ok=True)
+    argv = sys.argv
+    sys.argv = ['Extraccion.py']
+    try:
+        with en_carpeta(carpeta):
+            inicio = time.perf_counter()
+            Extraccion.main()
+            t_completo = time.perf_counter() - inicio
+    finally:
+        sys.argv = argv
+
+    comun = {'tamano': n_archivos, 'archivos': n_archivos, 'mb': round(megas, 2)}
+    return [
+        {'etapa': 'parser', **comun, 'segundos': round(t_parser, 3),
+         'archivos_s': round(n_archivos / t_parser, 1), 'mb_s': round(megas / t_parser, 2),
+         'ok': distintos == 0},
+        {'etapa': 'extraccion', **comun, 'segundos': round(t_completo, 3),
+         'archivos_s': round(n_archivos / t_completo, 1), 'mb_s': round(megas / t_completo, 2),
+         'ok': distintos == 0},
+    ]
+
+
+def medir_subida(etapa, url, records_df, n_archivos):
+    """Sube records_df al portal simulado con el motor de la etapa y mide registros/min"""
+    reiniciar(url)
+    esperados = len(records_df)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if etapa == 'subida_http':
+            resumen = Registro.ejecutar_subida_http(records_df)
+        else:
+            resumen = Registro.ejecutar_subida(records_df)
+            excluidos = [Registro.should_skip_analito(a, n) for a, n in zip(records_df['Analito'], records_df['Nivel'])]
+            esperados -= sum(excluidos)
+    transcurrido = time.perf_counter() - inicio
+    return {'etapa': etapa, 'tamano': n_archivos, 'registros': len(records_df), 'segundos': round(transcurrido, 3),
+            'registros_min': round(len(records_df) / transcurrido * 60, 1),
+            'ok': not resumen.fallidos and len(recibidos(url)) == int(esperados)}
+
+
+def navegador_disponible():
+    try:
+        Registro.crear_driver().quit()
+        return True
+    except Exception as e:
+        print(f"⚠️ Sin medición con navegador: {type(e).__name__} - {str(e).splitlines()[0] if str(e) else ''}")
+        return False
+
+
+def cargar_historial(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def comparar(medicion, historial):
+    """Texto con el cambio respecto de la última medición equivalente del historial"""
+    clave = ('etapa', 'tamano', 'relleno', 'latencia', 'equipo')
+    previas = [h for h in historial if all(h.get(c) == medicion.get(c) for c in clave)]
+    if not previas:
+        return ''
+    metrica = 'registros_min' if 'registros_min' in medicion else 'archivos_s'
+    anterior = previas[-1][metrica]
+    if not anterior:
+        return ''
+    return f"  ({(medicion[metrica] / anterior - 1) * 100:+.1f}% vs {previas[-1].get('commit') or '?'})"
+
+
+def imprimir(medicion, historial):
+    if 'registros_min' in medicion:
+        detalle = f"{medicion['registros']:>6} registros  {medicion['registros_min']:>9.0f} registros/min"
+    else:
+        detalle = f"{medicion['mb']:>7.1f} MB  {medicion['archivos_s']:>8.1f} archivos/s  {medicion['mb_s']:>7.2f} MB/s"
+    estado = '✅' if medicion['ok'] else '❌'
+    print(f"{estado} {medicion['etapa']:<16}{medicion['tamano']:>5} archivos  {detalle}"
+          f"  {medicion['segundos']:>8.2f} s{comparar(medicion, historial)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de extracción y carga con datos sintéticos.")
+    parser.add_argument('--tamanos', default=','.join(map(str, TAMANOS)),
+                        help="Archivos diarios por medición, separados por comas.")
+    parser.add_argument('--relleno', type=int, default=LINEAS_RELLENO, help="Líneas de relleno por archivo.")
+    parser.add_argument('--latencia', type=float, default=LATENCIA, help="Latencia del portal simulado (s).")
+    parser.add_argument('--selenium', action='store_true', help="Medir también la carga con el navegador.")
+    parser.add_argument('--historial', default=HISTORIAL_PATH, help="Archivo JSON lines con las mediciones.")
+    args = parser.parse_args()
+    tamanos = [int(t) for t in args.tamanos.split(',')]
+
+    datos = entorno()
+    historial = cargar_historial(args.historial)
+    parametros = {'relleno': args.relleno, 'latencia': args.latencia}
+    print(f"Commit {datos['commit']}, Python {datos['python']}, {datos['cpus']} CPU(s); "
+          f"relleno {args.relleno} líneas, latencia {args.latencia * 1000:.0f} ms")
+
+    selenium = args.selenium and navegador_disponible()
+    servidor, url, _ = iniciar_portal(latencia=args.latencia)
+    Registro.API_URL = Registro.PORTAL_URL = url
+    Registro.USAR_BITACORA = False
+    Registro.PERFIL_NAVEGADOR = 'headless'
+    Registro.TIEMPOS = Registro.PERFILES_TIEMPO['rapido']
+    mediciones = []
+    try:
+        for n_archivos in tamanos:
+            with tempfile.TemporaryDirectory() as carpeta:
+                nuevas = medir_extraccion(carpeta, n_archivos, args.relleno)
+                plantillas = os.path.join(carpeta, 'Plantillas')
+                records_df = Registro.cargar_registros_csv(plantillas, analitos=None)
+                nuevas.append(medir_subida('subida_http', url, records_df, n_archivos))
+                # Con el navegador solo los primeros días del tamaño más chico
+                if selenium and n_archivos == tamanos[0]:
+                    fechas = sorted(records_df['Fecha'].unique())
+                    for n in (t for t in TAMANOS_SELENIUM if t <= n_archivos):
+                        parte = records_df[records_df['Fecha'].isin(fechas[:n])]
+                        nuevas.append(medir_subida('subida_selenium', url, parte, n))
+            for medicion in nuevas:
+                medicion.update(parametros, equipo=datos['equipo'])
+                imprimir(medicion, historial)
+                mediciones.append({**datos, **medicion})
+    finally:
+        servidor.shutdown()
+
+    with open(args.historial, 'a', encoding='utf-8') as f:
+        for medicion in mediciones:
+            f.write(json.dumps(medicion, ensure_ascii=False) + '\n')
+    print(f"📄 {len(mediciones)} medición(es) agregadas a '{args.historial}'")
+    if not all(m['ok'] for m in mediciones):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+'''
+Mide Westgard.py sobre un historial sintético (años de datos diarios, los 27
+analitos de code_mapping en 3 niveles): primera evaluación vectorizada y
+evaluación incremental de un día nuevo. Comprueba además que evaluar el
+historial en dos partes (vectorizada + incremental) marque lo mismo que
+evaluarlo de una vez.
+
+Uso: python benchmarks/bench_westgard.py [anios]
+'''
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pandas as pd
+
+import Westgard
+from Extraccion import code_mapping
+
+
+def historial_sintetico(anios, semilla=7):
+    """Registros diarios con alguna deriva y valores atípicos para que las reglas se disparen"""
+    rng = np.random.default_rng(semilla)
+    analitos = sorted({nombre for _, nombre in code_mapping.values()})
+    dias = np.array([date(2020, 1, 1) + timedelta(days=i) for i in range(int(anios * 365))], dtype=object)
+    frames = []
+    for analito in analitos:
+        for nivel in (1, 2, 3):
+            media, de = rng.uniform(5, 300), rng.uniform(0.5, 5)
+            valores = rng.normal(media, de, len(dias))
+            valores += np.where(rng.random(len(dias)) < 0.01, rng.choice([-4, 4], len(dias)) * de, 0)
+            inicio = rng.integers(0, len(dias) - 30)
+            valores[inicio:inicio + 12] += 1.5 * de
+            frames.append(pd.DataFrame({'Fecha': dias, 'Nivel': nivel, 'Analito': analito,
+                                        'Valor': valores.round(2)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    anios = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    df = historial_sintetico(anios)
+    corte = df['Fecha'].max() - timedelta(days=30)
+    print(f"Historial: {len(df)} registros ({df.groupby(['Analito', 'Nivel']).ngroups} series)")
+
+    inicio = time.perf_counter()
+    completo, _ = Westgard.evaluar_historial(df)
+    t_completo = time.perf_counter() - inicio
+
+    estado = {}
+    Westgard.evaluar(df[df['Fecha'] <= corte], estado)
+    ultimo_dia = df[df['Fecha'] == corte + timedelta(days=1)]
+    inicio = time.perf_counter()
+    Westgard.evaluar(df[df['Fecha'] <= corte + timedelta(days=1)], estado)
+    t_dia = time.perf_counter() - inicio
+
+    # Equivalencia: los 29 días restantes por la vía incremental
+    incremental = Westgard.evaluar(df, estado)
+    esperado = completo[completo['Fecha'] > corte + timedelta(days=1)]
+    claves = ['Analito', 'Nivel', 'Fecha']
+    a = esperado.sort_values(claves)[Westgard.REGLAS].to_numpy()
+    b = incremental.sort_values(claves)[Westgard.REGLAS].astype(bool).to_numpy()
+
+    print(f"Primera evaluación (vectorizada): {t_completo * 1000:.0f} ms")
+    print(f"Día nuevo ({len(ultimo_dia)} puntos, incremental): {t_dia * 1000:.1f} ms")
+    print(f"Marcados en el historial: {int(completo[Westgard.REGLAS].any(axis=1).sum())}")
+    print(f"Incremental = vectorizada en los últimos días: {'sí' if (a == b).all() else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
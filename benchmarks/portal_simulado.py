@@ -0,0 +1,305 @@
+'''
+Portal simulado de CC Lab Control para probar Registro.py sin el sitio real.
+Sirve una página que reproduce la estructura que buscan los XPaths de Registro.py
+(login, árbol Quimica clínica → AU480 → niveles → analitos, botón "Alta Resultado
+Nivel X", formulario con fecha/valor y botón Guardar) y una API JSON que guarda
+en memoria los resultados recibidos. Cada petición a la API tarda `latencia` s,
+más/menos `variacion` s al azar; `latencias` fija el tiempo de rutas concretas
+(p. ej. {'/api/resultados': 0.3} para un guardado lento, o {'/': 0.5} para la página).
+La misma API sirve de backend simulado para el motor sin navegador (SubidaHTTP.py):
+POST /api/login, POST /api/resultados y POST /api/resultados/lote.
+POST /api/expirar invalida todas las sesiones abiertas (para probar la recuperación
+de sesión de Registro.py).
+
+Uso: python benchmarks/portal_simulado.py [--puerto 8080] [--latencia 0.05] [--variacion 0.02]
+                                          [--latencia-ruta /api/resultados=0.3 ...]
+'''
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Extraccion import code_mapping
+from Registro import ANALITO_MAPPING, ANALITOS_EXCLUIDOS_POR_NIVEL, NIVEL_NODOS
+
+# Etiquetas de los nodos de nivel
+NODOS_NIVEL = dict(NIVEL_NODOS)
+
+# Analitos bajo cada nivel, con su nombre en la interfaz
+ANALITOS_UI = sorted(ANALITO_MAPPING.get(nombre, nombre) for _, nombre in code_mapping.values())
+
+PAGINA = r'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>CC Lab Control (simulado)</title>
+<style>
+ body { font-family: sans-serif; margin: 0; }
+ #app { display: flex; gap: 24px; padding: 16px; }
+ ul { list-style: none; padding-left: 18px; margin: 0; }
+ .p-tree-node-content { display: flex; align-items: center; gap: 6px; padding: 3px 0; cursor: pointer; }
+ .p-tree-node-content.p-highlight { background: #dde; }
+ .p-tree-toggler { width: 22px; height: 22px; }
+ .cdk-overlay-backdrop { position: fixed; inset: 0; background: rgba(0,0,0,.05); }
+ .p-toast-message { position: fixed; top: 8px; right: 8px; background: #cfc; padding: 8px; }
+ img { width: 48px; height: 48px; background: #88c; display: block; }
+</style></head>
+<body><div id="overlay"></div><div id="app"></div><div id="toasts"></div>
+<script>
+var pendientes = 0, token = null, seleccionado = null;
+window.getAllAngularTestabilities = function () { return [{ isStable: function () { return pendientes === 0; } }]; };
+
+function api(metodo, ruta, cuerpo) {
+  pendientes++;
+  document.getElementById('overlay').innerHTML = '<div class="cdk-overlay-backdrop"></div>';
+  return fetch(ruta, { method: metodo, headers: { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + token },
+                       body: cuerpo ? JSON.stringify(cuerpo) : undefined })
+    .then(function (r) {
+      if (r.status === 401) { token = null; localStorage.removeItem('token'); login(); }
+      return r.json().then(function (d) { if (!r.ok) { throw d; } return d; });
+    })
+    .finally(function () { pendientes--; if (!pendientes) { document.getElementById('overlay').innerHTML = ''; } });
+}
+function el(html) { var t = document.createElement('template'); t.innerHTML = html.trim(); return t.content.firstChild; }
+function esc(s) { return s.replace(/&/g, '&amp;').replace(/</g, '&lt;'); }
+
+function login() {
+  document.getElementById('app').innerHTML =
+    '<form id="login"><input name="username"><input name="password" type="password">' +
+    '<button type="button" id="entrar"><strong> Entrar </strong></button></form>';
+  document.getElementById('entrar').onclick = function () {
+    var f = document.getElementById('login');
+    api('POST', '/api/login', { usuario: f.username.value, clave: f.password.value }).then(function (d) {
+      token = d.token; localStorage.setItem('token', token); location.hash = '#/inicio'; inicio();
+    });
+  };
+}
+
+function inicio() {
+  document.getElementById('app').innerHTML = '<div><img alt="Control de Calidad" id="cc"></div>';
+  document.getElementById('cc').onclick = function () {
+    document.getElementById('app').innerHTML = '<ul id="arbol"></ul><div id="panel"></div>';
+    agregarNodo(document.getElementById('arbol'), { id: 'quimica', etiqueta: 'Quimica clínica', hoja: false });
+  };
+}
+
+function agregarNodo(ul, nodo) {
+  var li = el('<li class="p-treenode"><div class="p-tree-node-content">' +
+              (nodo.hoja ? '' : '<button class="p-tree-toggler" type="button">▸</button>') +
+              '<span class="ng-star-inserted">' + esc(nodo.etiqueta) + '</span></div><ul></ul></li>');
+  li.nodo = nodo;
+  ul.appendChild(li);
+  var contenido = li.firstChild;
+  if (nodo.hoja) {
+    contenido.onclick = function () { seleccionar(contenido, nodo); };
+  } else {
+    contenido.firstChild.onclick = function (ev) { ev.stopPropagation(); alternar(li); };
+  }
+}
+
+function alternar(li) {
+  var hijos = li.lastChild;
+  // Como en el portal, volver a pulsar AU480 lo "reabre": los niveles quedan contraídos
+  var reabrir = li.nodo.id === 'AU480' && hijos.children.length;
+  if (hijos.children.length && !reabrir) { hijos.innerHTML = ''; return; }
+  // Acordeón: al abrir un nivel se cierran sus hermanos
+  Array.prototype.forEach.call(li.parentNode.children, function (h) { if (h !== li) { h.lastChild.innerHTML = ''; } });
+  hijos.innerHTML = '';
+  document.getElementById('panel').innerHTML = '';
+  api('GET', '/api/arbol?nodo=' + encodeURIComponent(li.nodo.id)).then(function (d) {
+    d.hijos.forEach(function (h) { agregarNodo(hijos, h); });
+  });
+}
+
+function seleccionar(contenido, nodo) {
+  if (seleccionado) { seleccionado.classList.remove('p-highlight'); }
+  seleccionado = contenido; contenido.classList.add('p-highlight');
+  var panel = document.getElementById('panel');
+  panel.innerHTML = '';
+  api('GET', '/api/analito?nivel=' + nodo.nivel + '&analito=' + encodeURIComponent(nodo.etiqueta)).then(function (d) {
+    panel.innerHTML = '<h3>' + esc(nodo.etiqueta) + ' (' + d.resultados + ')</h3>' +
+      '<button type="button" id="alta"><span class="p-button-label">Alta Resultado Nivel ' + nodo.nivel + '</span></button>' +
+      '<div id="formulario"></div>';
+    document.getElementById('alta').onclick = function () { formulario(nodo); };
+  });
+}
+
+function formulario(nodo) {
+  var cont = document.getElementById('formulario');
+  cont.innerHTML = '<form id="resultado"><input matinput name="fecha" type="text">' +
+    '<input matinput type="text" placeholder="Valor Nivel ' + nodo.nivel + '">' +
+    '<button type="submit"> Guardar </button></form>';
+  var f = document.getElementById('resultado');
+  f.onsubmit = function (ev) {
+    ev.preventDefault();
+    var campos = f.querySelectorAll('input');
+    api('POST', '/api/resultados', { nivel: nodo.nivel, analito: nodo.etiqueta, fecha: campos[0].value,
+                                      valor: parseFloat(campos[1].value) }).then(function () {
+      cont.innerHTML = '';
+      var aviso = el('<div class="p-toast-message">Resultado guardado</div>');
+      document.getElementById('toasts').appendChild(aviso);
+      setTimeout(function () { aviso.remove(); }, 1500);
+    });
+  };
+}
+
+// La sesión se guarda en localStorage: con una carpeta de perfil reutilizada sobrevive al reinicio
+token = localStorage.getItem('token');
+if (token) { api('GET', '/api/sesion').then(inicio, function () {}); } else { login(); }
+</script></body></html>
+'''
+
+
+class EstadoPortal:
+    """Estado en memoria compartido por todas las sesiones del portal simulado."""
+
+    def __init__(self, latencia=0.0, variacion=0.0, latencias=None):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.latencias = dict(latencias or {})
+        self.lock = threading.Lock()
+        self.tokens = set()
+        self.resultados = []
+        self.logins = 0
+
+    def hijos(self, nodo):
+        if nodo == 'quimica':
+            return [{'id': 'AU480', 'etiqueta': 'AU480', 'hoja': False}]
+        if nodo == 'AU480':
+            return [{'id': f'nivel-{n}', 'etiqueta': etiqueta, 'hoja': False} for n, etiqueta in NODOS_NIVEL.items()]
+        if nodo.startswith('nivel-'):
+            nivel = int(nodo.split('-')[1])
+            excluidos = set(ANALITOS_EXCLUIDOS_POR_NIVEL.get(nivel, []))
+            return [{'id': f'{nivel}:{a}', 'etiqueta': a, 'hoja': True, 'nivel': nivel}
+                    for a in ANALITOS_UI if a not in excluidos]
+        return []
+
+    def demora(self, ruta):
+        """Segundos que tarda la respuesta de ruta (solo la API tiene latencia por defecto)"""
+        base = self.latencias.get(ruta, self.latencia if ruta.startswith('/api/') else 0.0)
+        if not base:
+            return 0.0
+        return max(0.0, base + random.uniform(-self.variacion, self.variacion))
+
+
+class ManejadorPortal(BaseHTTPRequestHandler):
+    estado = None  # EstadoPortal, asignado al crear el servidor
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo, tipo='application/json'):
+        datos = cuerpo.encode('utf-8') if isinstance(cuerpo, str) else json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', f'{tipo}; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _autorizado(self):
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        with self.estado.lock:
+            return token in self.estado.tokens
+
+    def _cuerpo(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(largo) or b'{}')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        time.sleep(self.estado.demora(url.path))
+        if url.path in ('/', '/index.html'):
+            return self._responder(200, PAGINA, 'text/html')
+        if not url.path.startswith('/api/'):
+            return self._responder(404, {'error': 'no encontrado'})
+        if url.path == '/api/resultados':
+            with self.estado.lock:
+                return self._responder(200, {'resultados': list(self.estado.resultados), 'logins': self.estado.logins})
+        if not self._autorizado():
+            return self._responder(401, {'error': 'sesión expirada'})
+        consulta = parse_qs(url.query)
+        if url.path == '/api/sesion':
+            return self._responder(200, {'ok': True})
+        if url.path == '/api/arbol':
+            return self._responder(200, {'hijos': self.estado.hijos(consulta.get('nodo', [''])[0])})
+        if url.path == '/api/analito':
+            nivel, analito = int(consulta['nivel'][0]), consulta['analito'][0]
+            with self.estado.lock:
+                n = sum(1 for r in self.estado.resultados if r['nivel'] == nivel and r['analito'] == analito)
+            return self._responder(200, {'resultados': n})
+        return self._responder(404, {'error': 'no encontrado'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        time.sleep(self.estado.demora(url.path))
+        cuerpo = self._cuerpo()
+        if url.path == '/api/login':
+            token = uuid.uuid4().hex
+            with self.estado.lock:
+                self.estado.tokens.add(token)
+                self.estado.logins += 1
+            return self._responder(200, {'token': token})
+        if url.path == '/api/expirar':
+            with self.estado.lock:
+                self.estado.tokens.clear()
+            return self._responder(200, {'ok': True})
+        if url.path == '/api/reset':
+            with self.estado.lock:
+                self.estado.resultados.clear()
+                self.estado.tokens.clear()
+                self.estado.logins = 0
+            return self._responder(200, {'ok': True})
+        if not self._autorizado():
+            return self._responder(401, {'error': 'sesión expirada'})
+        if url.path in ('/api/resultados', '/api/resultados/lote'):
+            lote = cuerpo if url.path.endswith('/lote') else [cuerpo]
+            registros = [{'nivel': int(r['nivel']), 'analito': r['analito'],
+                          'fecha': r['fecha'], 'valor': float(r['valor'])} for r in lote]
+            with self.estado.lock:
+                self.estado.resultados.extend(registros)
+                total = len(self.estado.resultados)
+            return self._responder(201, {'ok': True, 'id': total})
+        return self._responder(404, {'error': 'no encontrado'})
+
+
+class ServidorPortal(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # admite ráfagas de conexiones concurrentes
+
+
+def iniciar_portal(puerto=0, latencia=0.0, variacion=0.0, latencias=None):
+    """Arranca el portal en un hilo. Devuelve (servidor, url_base, estado)."""
+    estado = EstadoPortal(latencia, variacion, latencias)
+    manejador = type('Manejador', (ManejadorPortal,), {'estado': estado})
+    servidor = ServidorPortal(('127.0.0.1', puerto), manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}", estado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal simulado de CC Lab Control.")
+    parser.add_argument('--puerto', type=int, default=8080)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Segundos de espera por petición a la API.")
+    parser.add_argument('--variacion', type=float, default=0.0, help="Más/menos segundos al azar sobre cada espera.")
+    parser.add_argument('--latencia-ruta', action='append', default=[], metavar='RUTA=SEGUNDOS',
+                        help="Espera propia de una ruta, p. ej. /api/resultados=0.3 (se puede repetir).")
+    args = parser.parse_args()
+    latencias = {}
+    for opcion in args.latencia_ruta:
+        ruta, _, segundos = opcion.partition('=')
+        latencias[ruta] = float(segundos)
+    servidor, url, _ = iniciar_portal(args.puerto, args.latencia, args.variacion, latencias)
+    print(f"Portal simulado en {url}/#/login (latencia {args.latencia}s). Ctrl+C para terminar.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+Prueba de la recuperación de sesión del pipeline contra el portal simulado
+(benchmarks/portal_simulado.py). Requiere Chrome y chromedriver.
+Antes de cada archivo invalida las sesiones del portal (POST /api/expirar) y sube
+con un mismo Pipeline.TrabajadorSubida más archivos que MAX_RECUPERACIONES:
+cada archivo debe recuperar la sesión (el tope vale por archivo) y el portal
+debe recibir cada registro exactamente una vez.
+
+Uso: python benchmarks/prueba_recuperacion_sesion.py [archivos] [max_recuperaciones]
+'''
+import os
+import queue
+import sys
+import urllib.request
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+import Pipeline
+import Registro
+from portal_simulado import iniciar_portal
+from prueba_subida_paralela import recibidos, registros_sinteticos
+
+
+def expirar(url):
+    urllib.request.urlopen(urllib.request.Request(f"{url}/api/expirar", data=b'{}', method='POST')).close()
+
+
+def main():
+    archivos = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    maximo = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    servidor, url, _ = iniciar_portal(latencia=0.01)
+    Registro.PORTAL_URL = url
+    Registro.USAR_BITACORA = False
+    Registro.PERFIL_NAVEGADOR = 'headless'
+    Registro.TIEMPOS = Registro.PERFILES_TIEMPO['rapido']
+
+    # Un día distinto por archivo, como los exports diarios
+    lotes = [registros_sinteticos(1, inicio=date(2025, 1, 1) + timedelta(days=i)) for i in range(archivos)]
+    esperados = Counter((int(r.Nivel), r.Analito, r.Fecha.isoformat(), float(r.Valor))
+                        for r in pd.concat(lotes).itertuples())
+
+    trabajador = Pipeline.TrabajadorSubida(queue.Queue())
+    trabajador.supervisor.max_recuperaciones = maximo
+    try:
+        trabajador.preparar()
+        for i, records_df in enumerate(lotes, start=1):
+            expirar(url)
+            resumen = trabajador.subir(records_df, None)
+            assert resumen.procesados == len(records_df) and not resumen.fallidos, \
+                f"Archivo {i}: {resumen.procesados} guardados, fallidos {resumen.fallidos}"
+        trabajador.cerrar_navegador()
+
+        obtenidos = Counter((r['nivel'], r['analito'], r['fecha'], r['valor']) for r in recibidos(url))
+        assert obtenidos == esperados, f"Diferencias: {(obtenidos - esperados) + (esperados - obtenidos)}"
+        recuperaciones = trabajador.supervisor.recuperaciones
+        assert recuperaciones['login'] == archivos, recuperaciones
+        print(f"✅ {archivos} archivos con la sesión expirada (tope {maximo} por archivo): "
+              f"{len(esperados)} registros, {dict(recuperaciones)} recuperaciones")
+    finally:
+        trabajador.cerrar_navegador()
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
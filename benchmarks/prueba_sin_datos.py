@@ -0,0 +1,55 @@
+'''
+Prueba de Registro.py sin datos que subir: carpeta de plantillas vacía y ventana
+de fechas (FECHA_DESDE/FECHA_HASTA) que no incluye ningún archivo. En los dos
+casos main() debe terminar avisando que no hay registros pendientes, sin errores
+y sin abrir el navegador. Corre en una carpeta temporal.
+
+Uso: python benchmarks/prueba_sin_datos.py
+'''
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+import Registro
+
+
+def correr_main():
+    salida = io.StringIO()
+    sys.argv = ['Registro.py']
+    with contextlib.redirect_stdout(salida):
+        Registro.main()
+    return salida.getvalue()
+
+
+def comprobar(nombre):
+    texto = correr_main()
+    assert "No hay registros pendientes" in texto, texto
+    print(f"✅ {nombre}: sin registros, no se abre el navegador")
+
+
+def main():
+    original = os.getcwd()
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        try:
+            os.makedirs('Plantillas')
+            comprobar('carpeta vacía')
+
+            # Una plantilla de 2025 y una ventana que no la incluye
+            pd.DataFrame({'ID': [1], 'ANALITO': ['Glucosa'], 'NIVEL 1': [95.0], 'NIVEL 2': [0], 'NIVEL 3': [0]}
+                         ).to_csv(os.path.join('Plantillas', '01_15_2025.csv'), index=False)
+            Registro.FECHA_DESDE = date(2026, 1, 1)
+            comprobar('ventana sin archivos')
+        finally:
+            os.chdir(original)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''
+Prueba de extremo a extremo de la carga con varias sesiones de navegador contra
+el portal simulado (benchmarks/portal_simulado.py). Requiere Chrome y chromedriver.
+Verifica que el portal recibió cada registro exactamente una vez y que el resumen
+agregado coincide, y muestra el tiempo con 1 y con N sesiones.
+
+Uso: python benchmarks/prueba_subida_paralela.py [sesiones] [particion] [dias]
+'''
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import json
+import urllib.request
+
+import pandas as pd
+
+import Registro
+from portal_simulado import iniciar_portal
+
+
+def registros_sinteticos(dias, analitos=('Glucosa', 'Calcio', 'Sodio', 'Potasio'), inicio=date(2025, 1, 1)):
+    filas = [(inicio + timedelta(days=d), nivel, analito, round(50 + d + nivel * 10.5, 2))
+             for d in range(dias) for nivel in (1, 2, 3) for analito in analitos]
+    return pd.DataFrame(filas, columns=['Fecha', 'Nivel', 'Analito', 'Valor'])
+
+
+def recibidos(url):
+    with urllib.request.urlopen(f"{url}/api/resultados") as r:
+        return json.load(r)['resultados']
+
+
+def reiniciar(url):
+    urllib.request.urlopen(urllib.request.Request(f"{url}/api/reset", data=b'{}', method='POST')).close()
+
+
+def main():
+    sesiones = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    particion = sys.argv[2] if len(sys.argv) > 2 else 'nivel'
+    dias = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    servidor, url, _ = iniciar_portal(latencia=0.02)
+    Registro.PORTAL_URL = url
+    Registro.USAR_BITACORA = False
+    Registro.PERFIL_NAVEGADOR = 'headless'
+    Registro.TIEMPOS = Registro.PERFILES_TIEMPO['rapido']
+
+    records_df = registros_sinteticos(dias)
+    esperados = Counter((int(r.Nivel), r.Analito, r.Fecha.isoformat(), float(r.Valor))
+                        for r in records_df.itertuples())
+    try:
+        for n in sorted({1, sesiones}):
+            reiniciar(url)
+            inicio = time.perf_counter()
+            resumen = Registro.ejecutar_subida(records_df, n, particion)
+            transcurrido = time.perf_counter() - inicio
+
+            obtenidos = Counter((r['nivel'], r['analito'], r['fecha'], r['valor']) for r in recibidos(url))
+            assert obtenidos == esperados, f"Diferencias: {(obtenidos - esperados) + (esperados - obtenidos)}"
+            assert resumen.procesados == len(records_df) and not resumen.fallidos, resumen.fallidos
+            print(f"✅ {n} sesión(es): {len(records_df)} registros en {transcurrido:.1f} s "
+                  f"({len(records_df) / transcurrido * 60:.0f} registros/min)")
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
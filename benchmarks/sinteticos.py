@@ -0,0 +1,115 @@
+'''
+Generador de exports sintéticos del AU480 para los benchmarks.
+Produce archivos .txt (latin-1) con la línea "Índice" de la fecha, el bloque
+LYPHOCHEK-ASSAYED con los códigos de code_mapping y uno de los stop_markers al
+final. Cada código se escribe en alguna de las formas que acepta pattern_valores
+(espacios alrededor del guion, sufijo "-C", guiones internos, valores enteros,
+varios niveles en la misma línea), y hay líneas que el parser debe ignorar:
+códigos desconocidos, niveles fuera de 1-3 y resultados de otros controles
+antes del bloque y después del stop_marker.
+'''
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Extraccion import code_mapping, stop_markers
+
+# Separadores entre código, nivel y valor que acepta pattern_valores
+SEPARADORES_CODIGO = [' - ', '-', ' -', '- ', '  -  ']
+SEPARADORES_VALOR = [' ', '  ', '\t']
+
+# Códigos que el analizador informa y que no están en code_mapping
+CODIGOS_DESCONOCIDOS = ['CRP', 'FERR', 'TRANSF', 'APOA', 'APOB', 'CHE']
+
+ETIQUETAS_FECHA = ['Índice', 'ÍNDICE', 'Indice']
+
+
+def variante_codigo(code, rng):
+    """Una forma de escribir code que el parser reconoce como code.
+
+    El parser quita un "-C" final y después todos los guiones; un guion interno
+    no puede quedar justo antes de una C final (TBIL-C se leería como TBIL).
+    """
+    forma = code
+    posiciones = [i for i in range(1, len(code)) if not (i == len(code) - 1 and code[-1] == 'C')]
+    if posiciones and rng.random() < 0.2:
+        i = rng.choice(posiciones)
+        forma = f"{forma[:i]}-{forma[i:]}"
+    if rng.random() < 0.3:
+        forma += '-C'
+    return forma
+
+
+def _valor_texto(valor, rng):
+    decimales = rng.choice([0, 1, 2, 2, 2])
+    return f"{valor:.{decimales}f}"
+
+
+def _resultado(codigo, nivel, texto, rng):
+    return f"{codigo}{rng.choice(SEPARADORES_CODIGO)}{nivel}{rng.choice(SEPARADORES_VALOR)}{texto}: OK"
+
+
+def generar_export(fecha, rng, lineas_relleno=200, esperados=None):
+    """Devuelve el texto de un export del AU480 para la fecha dada.
+
+    Si se pasa el diccionario esperados, se llena con {(code, nivel): valor}
+    tal como lo debe leer el parser.
+    """
+    lineas = [
+        "AU480 CHEMISTRY ANALYZER  QC DATA",
+        f"{rng.choice(ETIQUETAS_FECHA)} {fecha.strftime('%m/%d/%Y')} 07:{rng.randint(0, 59):02d}",
+    ]
+    lineas += [f"MUESTRA {i:05d}  RUTINA  {rng.random() * 100:.2f}" for i in range(lineas_relleno)]
+
+    # Otro control antes del bloque: sus resultados no se capturan
+    lineas.append("QC LIQUICHEK IMMUNOASSAY PLUS")
+    lineas += [_resultado(code, 1, f"{rng.uniform(1, 500):.2f}", rng) for code in rng.sample(list(code_mapping), 5)]
+
+    lineas.append("QC LYPHOCHEK-ASSAYED CHEMISTRY CONTROL")
+    for code in code_mapping:
+        resultados = []
+        for nivel in (1, 2, 3):
+            texto = _valor_texto(rng.uniform(1, 500), rng)
+            resultados.append(_resultado(variante_codigo(code, rng), nivel, texto, rng))
+            if esperados is not None:
+                esperados[(code, nivel)] = float(texto)
+        if rng.random() < 0.2:
+            lineas.append('   '.join(resultados))  # los tres niveles en una línea
+        else:
+            lineas += resultados
+        if rng.random() < 0.15:
+            desconocido = rng.choice(CODIGOS_DESCONOCIDOS)
+            lineas.append(_resultado(desconocido, rng.randint(1, 3), f"{rng.uniform(1, 50):.2f}", rng))
+        if rng.random() < 0.05:
+            lineas.append(_resultado(code, rng.choice([0, 4, 9]), f"{rng.uniform(1, 50):.2f}", rng))
+        if rng.random() < 0.1:
+            lineas.append(f"{code} CAL  {rng.random() * 10:.3f}  ABS")  # sin resultado
+
+    lineas.append(rng.choice(sorted(stop_markers)))
+    # Después del stop_marker los resultados ya no son de este control
+    lineas += [_resultado(code, 1, f"{rng.uniform(1, 500):.2f}", rng) for code in rng.sample(list(code_mapping), 5)]
+    lineas += [f"URINE {i:05d}  {rng.random() * 10:.2f}" for i in range(lineas_relleno // 4)]
+    return '\n'.join(lineas) + '\n'
+
+
+def generar_carpeta(carpeta, n_archivos, lineas_relleno=200, semilla=0, inicio=date(2022, 1, 1), esperados=None):
+    """Escribe n_archivos exports diarios consecutivos en carpeta y devuelve sus rutas.
+
+    Con esperados (dict) se guardan los valores de cada ruta: {ruta: {(code, nivel): valor}}.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    rng = random.Random(semilla)
+    rutas = []
+    for i in range(n_archivos):
+        fecha = inicio + timedelta(days=i)
+        ruta = os.path.join(carpeta, f"AU480_{fecha:%Y%m%d}.txt")
+        valores = {} if esperados is not None else None
+        with open(ruta, 'w', encoding='latin-1') as f:
+            f.write(generar_export(fecha, rng, lineas_relleno, valores))
+        if esperados is not None:
+            esperados[ruta] = valores
+        rutas.append(ruta)
+    return rutas